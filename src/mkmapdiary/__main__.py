@@ -7,7 +7,9 @@ from .commands.build import build
 from .commands.calibrate import calibrate
 from .commands.config import config
 from .commands.generate_demo import generate_demo
+from .commands.generate_synthetic import generate_synthetic
 from .commands.inspect import inspect
+from .commands.merge import merge
 from .util.log import StepFilter, setup_logging
 
 
@@ -61,8 +63,10 @@ def cli(ctx: Any, verbose: int, quiet: int) -> None:
 cli.add_command(build)
 cli.add_command(config)
 cli.add_command(generate_demo)
+cli.add_command(generate_synthetic)
 cli.add_command(calibrate)
 cli.add_command(inspect)
+cli.add_command(merge)
 
 
 if __name__ == "__main__":
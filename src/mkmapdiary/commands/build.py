@@ -1,32 +1,26 @@
 import gettext
 import locale
 import logging
+import multiprocessing
 import os
 import pathlib
 import queue
 import sys
 import tempfile
-from collections.abc import MutableMapping
+from collections.abc import Callable, MutableMapping
 from contextlib import nullcontext
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
 import click
-import doit.reporter
-import doit.task
-import poiidx
-import yaml
-from doit.cmd_base import ModuleTaskLoader
-from doit.doit_cmd import DoitMain
-from jsonschema.exceptions import ValidationError
-from tabulate import tabulate
 
 from .. import util
-from ..lib.cache import Cache
-from ..lib.config import load_config_file, load_config_param
 from ..lib.dirs import Dirs
-from ..taskList import TaskList
 from ..util.log import add_file_logging, current_task
 
+if TYPE_CHECKING:
+    from ..lib.shard import DateRange
+    from ..taskList import TaskList
+
 logger = logging.getLogger(__name__)
 runner_logger = logging.getLogger(__name__ + ".runner")
 
@@ -43,7 +37,29 @@ def main(
     no_cache: bool,
     profile: bool,
     debug_fast: bool,
+    offline: bool,
+    trace: bool = False,
+    metrics_file: pathlib.Path | None = None,
+    prometheus_file: pathlib.Path | None = None,
+    watch: bool = False,
+    watch_interval: float = 1.0,
+    parallel_type: str = "thread",
+    shard: "DateRange | None" = None,
 ) -> None:
+    # The task list imports all tasks and their libraries, which takes seconds.
+    # Import it here, so that other commands and --help start quickly.
+    import doit.reporter
+    import doit.task
+    from doit.cmd_base import ModuleTaskLoader
+    from doit.doit_cmd import DoitMain
+    from tabulate import tabulate
+
+    from ..lib.buildTrace import BuildTrace
+    from ..lib.cache import Cache
+    from ..lib.metrics import get_metrics
+    from ..lib.rateLimiter import get_limiter
+    from ..taskList import TaskList
+
     # Add file logging for build command (console logging already configured at CLI level)
     add_file_logging(build_dir)
 
@@ -52,6 +68,14 @@ def main(
     if not source_dir:
         raise click.BadParameter("Source directory is required.")
 
+    if parallel_type == "process" and (
+        profile or trace or metrics_file is not None or prometheus_file is not None
+    ):
+        raise click.BadParameter(
+            "Profiling, tracing and metrics only cover the main process; "
+            "use --parallel-type=thread."
+        )
+
     dirs = Dirs(source_dir, build_dir, dist_dir, create_dirs=False)
 
     logger.info("Starting mkmapdiary")
@@ -60,102 +84,7 @@ def main(
 
     logger.info("Generating configuration ...", extra={"icon": "⚙️"})
 
-    # Load config defaults
-    default_config = dirs.resources_dir / "defaults.yaml"
-    try:
-        config_data: MutableMapping[str, Any] = load_config_file(default_config)
-    except ValidationError as e:
-        logger.critical(f"Default configuration is invalid: {e.message}")
-        logger.info(f"Path: {'.'.join(str(p) for p in e.path)}")
-        sys.exit(1)
-    except ValueError as e:
-        logger.critical(f"Error loading default configuration: {e}")
-        sys.exit(1)
-
-    # Apply debug fast mode overrides
-    if debug_fast:
-        logger.info("Debug fast mode enabled.", extra={"icon": "🐇"})
-        try:
-            config_data = util.deep_update(
-                config_data,
-                load_config_file(dirs.resources_dir / "debug_fast.yaml"),
-            )
-        except ValidationError as e:
-            logger.error(f"Debug fast configuration is invalid: {e.message}")
-            logger.info(f"Path: {'.'.join(str(p) for p in e.path)}")
-            sys.exit(1)
-        except ValueError as e:
-            logger.error(f"Error loading debug fast configuration: {e}")
-            sys.exit(1)
-
-    # Load local user configuration
-    user_config_file = dirs.user_config_file
-    if user_config_file.exists():
-        try:
-            config_data = util.deep_update(
-                config_data,
-                load_config_file(user_config_file),
-            )
-        except ValidationError as e:
-            logger.error(f"User configuration is invalid: {e.message}")
-            logger.info(f"Path: {'.'.join(str(p) for p in e.path)}")
-            sys.exit(1)
-        except ValueError as e:
-            logger.error(f"Error loading user configuration: {e}")
-            sys.exit(1)
-
-    # Load project configuration file if provided
-    project_config_file = dirs.source_dir / "config.yaml"
-    if project_config_file.is_file():
-        try:
-            config_data = util.deep_update(
-                config_data,
-                load_config_file(project_config_file),
-            )
-        except ValidationError as e:
-            logger.error(f"Project configuration is invalid: {e.message}")
-            logger.info(f"Path: {'.'.join(str(p) for p in e.path)}")
-            sys.exit(1)
-        except ValueError as e:
-            logger.error(f"Error loading project configuration: {e}")
-            sys.exit(1)
-
-    # Override config with params
-    for param in params:
-        try:
-            param_config = load_config_param(param)
-            config_data = util.deep_update(config_data, param_config)
-        except ValidationError as e:
-            logger.error(f"Config parameter '{param}' is invalid: {e.message}")
-            logger.info(f"Path: {'.'.join(str(p) for p in e.path)}")
-            sys.exit(1)
-        except ValueError as e:
-            logger.error(f"Error loading config parameter '{param}': {e}")
-            sys.exit(1)
-
-    # Load gettext
-    localedir = dirs.locale_dir
-
-    language = config_data["site"]["locale"].split("_")[0]
-
-    lang = gettext.translation(
-        "messages",
-        localedir=str(localedir),
-        languages=[language],
-        fallback=False,
-    )
-    lang.install()
-    _ = lang.gettext
-
-    # Load translations
-    for key, value in config_data["strings"].items():
-        if value is None:
-            translation = _(key)
-            config_data["strings"][key] = translation
-
-    # Set locale
-    logger.debug(f"Setting locale to {config_data['site']['locale']}")
-    locale.setlocale(locale.LC_TIME, config_data["site"]["locale"])
+    config_data, lang = load_config(dirs, params, debug_fast, offline)
 
     # Feature checks
     features = config_data["features"]
@@ -171,6 +100,9 @@ def main(
     if config_data["debug"]["enable_user_cache"]:
         logger.info("User cache is enabled.", extra={"icon": "🗃️"})
 
+    if config_data["http"]["offline"]:
+        logger.info("Offline mode is enabled.", extra={"icon": "📴"})
+
     logger.info("Preparing directories ...")
     # Sanity checks
     if not source_dir.is_dir():
@@ -240,7 +172,11 @@ def main(
         cache = Cache(dirs.cache_db_path)
 
     dirs.create_dirs = True
-    taskList = TaskList(dict(config_data), dirs, cache, gettext=lang.gettext)
+    if shard is not None:
+        logger.info(f"Building the shard {shard}", extra={"icon": "🧩"})
+    taskList = TaskList(
+        dict(config_data), dirs, cache, gettext=lang.gettext, date_range=shard
+    )
 
     n_assets = taskList.db.count_assets()
 
@@ -254,6 +190,9 @@ def main(
 
     # Check if poi is enabled, if so, initialize poiidx
     if config_data["features"]["poi_detection"]["enabled"]:
+        import poiidx
+        import yaml
+
         logger.info("Initializing POI index ...", extra={"icon": "🗺️"})
         filter_config_file = dirs.resources_dir / "poi_filter_config.yaml"
         with open(filter_config_file) as f:
@@ -274,10 +213,37 @@ def main(
         proccess_args.append(f"--process={num_processes}")
     if verbose:
         proccess_args.extend(["-v", "2"])
-    proccess_args.append("--parallel-type=thread")
+    shared_state = None
+    llm_manager = None
+    if parallel_type == "process":
+        if "fork" in multiprocessing.get_all_start_methods():
+            # Workers start with a copy of the task list and its assets;
+            # the changes of the assets are shared via the build directory
+            from ..lib.llmScheduler import LlmSchedulerManager
+            from ..lib.sharedState import SharedState
+
+            shared_state = SharedState(
+                dirs.shared_state_path, processes=max(1, num_processes)
+            )
+            # A single scheduler limits the LLM requests of all workers
+            llm_manager = LlmSchedulerManager(ctx=multiprocessing.get_context("fork"))
+            llm_manager.start()
+            taskList.share(shared_state, llm_manager)
+        else:
+            logger.warning(
+                "Process-parallel builds need the fork start method, "
+                "using threads instead."
+            )
+            parallel_type = "thread"
+    proccess_args.append(f"--parallel-type={parallel_type}")
+    if shard is not None:
+        # The index page and the site are built by the merge command
+        proccess_args.append("export_shard")
 
     logger.info("Running tasks ...", extra={"icon": "🚀", "is_step": True})
 
+    build_trace = BuildTrace() if trace else None
+
     class CustomReporter(doit.reporter.ConsoleReporter):
         def execute_task(self, task: doit.task.Task) -> None:
             display_name = task.name
@@ -286,8 +252,25 @@ def main(
                     display_name.split(":")[0] + ":.../" + display_name.split("/")[-1]
                 )
             current_task.set(display_name)
+            if build_trace is not None:
+                build_trace.instrument(task)
             super().execute_task(task)
 
+        def skip_uptodate(self, task: doit.task.Task) -> None:
+            if build_trace is not None:
+                # Skipped tasks still connect the tasks depending on them
+                build_trace.add_dependencies(
+                    task.name, [*task.task_dep, *task.setup_tasks]
+                )
+            super().skip_uptodate(task)
+
+        def add_success(self, task: doit.task.Task) -> None:
+            # Tasks created afterwards must see the assets as updated by the
+            # workers; doit creates them after reporting the success
+            if shared_state is not None:
+                shared_state.merge(task.name, taskList.db)
+            super().add_success(task)
+
         def write(self, text: str) -> None:
             runner_logger.info(text.rstrip())
 
@@ -298,13 +281,85 @@ def main(
             "reporter": CustomReporter,
         },
     }
-    exitcode = DoitMain(
-        ModuleTaskLoader(taskList.toDict()),
-        config_filenames=(),
-        extra_config=doit_config,
-    ).run(proccess_args)
+
+    def run_tasks(args: list[str]) -> int:
+        workers: Any = nullcontext()
+        if shared_state is not None:
+            from ..lib.sharedState import fork_workers
+
+            shared_state.reset()
+            workers = fork_workers()
+        with workers:
+            return DoitMain(
+                ModuleTaskLoader(taskList.toDict()),
+                config_filenames=(),
+                extra_config=doit_config,
+            ).run(args)
+
+    exitcode = run_tasks(proccess_args)
     logger.info("Done.", extra={"icon": "✅"})
 
+    for model, llm_stats in taskList.llm_scheduler.stats().items():
+        if llm_stats.requests:
+            logger.info(
+                f"LLM {model}: {llm_stats.requests} requests, "
+                f"{llm_stats.latency:.1f}s generating, "
+                f"{llm_stats.wait_time:.1f}s queued "
+                f"(max. queue depth {llm_stats.max_queue_depth})",
+                extra={"icon": "🤖"},
+            )
+
+    for host, stats in get_limiter().stats().items():
+        if stats.delayed:
+            logger.info(
+                f"Rate limit of {host}: waited {stats.wait_time:.1f}s "
+                f"for {stats.delayed} of {stats.requests} requests",
+                extra={"icon": "⏳"},
+            )
+
+    metrics = get_metrics()
+    counters = metrics.counter_totals()
+    # The counters of worker processes are not collected
+    if counters and shared_state is None:
+        logger.info(
+            "Metrics:\n"
+            + tabulate(
+                [(name + labels, f"{value:g}") for name, labels, value in counters],
+                headers=["Counter", "Value"],
+            ),
+            extra={"icon": "📈"},
+        )
+    if metrics_file is not None:
+        metrics.save_json(metrics_file)
+        logger.info(f"Metrics saved to {metrics_file}", extra={"icon": "📊"})
+    if prometheus_file is not None:
+        metrics.save_prometheus(prometheus_file)
+        logger.info(f"Metrics saved to {prometheus_file}", extra={"icon": "📊"})
+
+    if build_trace is not None:
+        build_trace.save(pathlib.Path("mkmapdiary_trace.json"))
+        logger.info(
+            "Build trace:\n" + build_trace.summary(),
+            extra={"icon": "⏱️"},
+        )
+        logger.info(
+            "Trace saved to mkmapdiary_trace.json",
+            extra={"icon": "📊"},
+        )
+
+    if watch:
+        exitcode = watch_sources(
+            taskList,
+            dirs,
+            watch_interval,
+            lambda: run_tasks(
+                [arg for arg in proccess_args if arg != "--always-execute"]
+            ),
+        )
+
+    if llm_manager is not None:
+        llm_manager.shutdown()
+
     if profile:
         import yappi
         from doit.runner import MThreadRunner
@@ -321,6 +376,195 @@ def main(
     sys.exit(exitcode)
 
 
+def load_config(
+    dirs: Dirs, params: tuple[str, ...], debug_fast: bool, offline: bool
+) -> tuple[MutableMapping[str, Any], gettext.NullTranslations]:
+    """Load the configuration of a project and install its translations.
+
+    Exits if a configuration is invalid.
+    """
+    from jsonschema.exceptions import ValidationError
+
+    from ..lib.config import load_config_file, load_config_param
+
+    # Load config defaults
+    default_config = dirs.resources_dir / "defaults.yaml"
+    try:
+        config_data: MutableMapping[str, Any] = load_config_file(default_config)
+    except ValidationError as e:
+        logger.critical(f"Default configuration is invalid: {e.message}")
+        logger.info(f"Path: {'.'.join(str(p) for p in e.path)}")
+        sys.exit(1)
+    except ValueError as e:
+        logger.critical(f"Error loading default configuration: {e}")
+        sys.exit(1)
+
+    # Apply debug fast mode overrides
+    if debug_fast:
+        logger.info("Debug fast mode enabled.", extra={"icon": "🐇"})
+        try:
+            config_data = util.deep_update(
+                config_data,
+                load_config_file(dirs.resources_dir / "debug_fast.yaml"),
+            )
+        except ValidationError as e:
+            logger.error(f"Debug fast configuration is invalid: {e.message}")
+            logger.info(f"Path: {'.'.join(str(p) for p in e.path)}")
+            sys.exit(1)
+        except ValueError as e:
+            logger.error(f"Error loading debug fast configuration: {e}")
+            sys.exit(1)
+
+    # Load local user configuration
+    user_config_file = dirs.user_config_file
+    if user_config_file.exists():
+        try:
+            config_data = util.deep_update(
+                config_data,
+                load_config_file(user_config_file),
+            )
+        except ValidationError as e:
+            logger.error(f"User configuration is invalid: {e.message}")
+            logger.info(f"Path: {'.'.join(str(p) for p in e.path)}")
+            sys.exit(1)
+        except ValueError as e:
+            logger.error(f"Error loading user configuration: {e}")
+            sys.exit(1)
+
+    # Load project configuration file if provided
+    project_config_file = dirs.source_dir / "config.yaml"
+    if project_config_file.is_file():
+        try:
+            config_data = util.deep_update(
+                config_data,
+                load_config_file(project_config_file),
+            )
+        except ValidationError as e:
+            logger.error(f"Project configuration is invalid: {e.message}")
+            logger.info(f"Path: {'.'.join(str(p) for p in e.path)}")
+            sys.exit(1)
+        except ValueError as e:
+            logger.error(f"Error loading project configuration: {e}")
+            sys.exit(1)
+
+    # Override config with params
+    for param in params:
+        try:
+            param_config = load_config_param(param)
+            config_data = util.deep_update(config_data, param_config)
+        except ValidationError as e:
+            logger.error(f"Config parameter '{param}' is invalid: {e.message}")
+            logger.info(f"Path: {'.'.join(str(p) for p in e.path)}")
+            sys.exit(1)
+        except ValueError as e:
+            logger.error(f"Error loading config parameter '{param}': {e}")
+            sys.exit(1)
+
+    if offline:
+        config_data["http"]["offline"] = True
+
+    # Load gettext
+    localedir = dirs.locale_dir
+
+    language = config_data["site"]["locale"].split("_")[0]
+
+    lang = gettext.translation(
+        "messages",
+        localedir=str(localedir),
+        languages=[language],
+        fallback=False,
+    )
+    lang.install()
+    _ = lang.gettext
+
+    # Load translations
+    for key, value in config_data["strings"].items():
+        if value is None:
+            translation = _(key)
+            config_data["strings"][key] = translation
+
+    # Set locale
+    logger.debug(f"Setting locale to {config_data['site']['locale']}")
+    locale.setlocale(locale.LC_TIME, config_data["site"]["locale"])
+
+    return config_data, lang
+
+
+def watch_sources(
+    taskList: "TaskList",
+    dirs: Dirs,
+    interval: float,
+    run_tasks: Callable[[], int],
+) -> int:
+    """Rebuild after changes of the source directory until interrupted.
+
+    The task list with its assets, models and caches stays in memory. Only
+    the changed files are handled again; doit then runs the tasks that are
+    not up to date, i.e. the conversions of the changed files and the pages
+    of the affected dates.
+    """
+    from ..lib.sourceWatcher import SourceWatcher
+
+    watcher = SourceWatcher(dirs.source_dir, interval)
+    logger.info("Watching for changes, press Ctrl+C to stop ...", extra={"icon": "👀"})
+    exitcode = 0
+    try:
+        while True:
+            changes = watcher.wait()
+            config_file = dirs.source_dir / "config.yaml"
+            if config_file in changes.paths:
+                logger.warning(
+                    "The configuration changed; restart the build to apply it."
+                )
+            changed = [path for path in changes.changed if path != config_file]
+            removed = [path for path in changes.removed if path != config_file]
+            if not changed and not removed:
+                continue
+
+            logger.info(
+                f"{len(changed) + len(removed)} files changed, rebuilding ...",
+                extra={"icon": "🔄", "is_step": True},
+            )
+            previous = taskList.update_sources(changed, removed)
+
+            # Outputs of removed files are not overwritten by any task
+            current = {asset.path for asset in taskList.db.assets}
+            for asset in previous:
+                if asset.path not in current:
+                    asset.path.unlink(missing_ok=True)
+
+            exitcode = run_tasks()
+
+            dates = sorted(
+                {
+                    asset.display_date
+                    for asset in previous + taskList.assets_of(changed)
+                    if asset.display_date is not None
+                }
+            )
+            logger.info(
+                "Done. Affected dates: "
+                + (", ".join(str(date) for date in dates) or "none"),
+                extra={"icon": "✅"},
+            )
+    except KeyboardInterrupt:
+        logger.info("Stopped watching.")
+    return exitcode
+
+
+def parse_shard(
+    ctx: click.Context, param: click.Parameter, value: str | None
+) -> "DateRange | None":
+    if value is None:
+        return None
+    from ..lib.shard import DateRange
+
+    try:
+        return DateRange.parse(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e)) from e
+
+
 def validate_param(
     ctx: click.Context, param: click.Parameter, value: tuple[str, ...]
 ) -> tuple[str, ...]:
@@ -364,6 +608,13 @@ def validate_param(
     type=int,
     help="Number of parallel processes to use",
 )
+@click.option(
+    "--parallel-type",
+    type=click.Choice(["thread", "process"]),
+    default="thread",
+    show_default=True,
+    help="Run the tasks in threads or in worker processes. Processes use all CPU cores for image processing and page generation, but need more memory.",
+)
 @click.option(
     "--no-cache",
     is_flag=True,
@@ -374,6 +625,46 @@ def validate_param(
     is_flag=True,
     help="Enable profiling of the build process",
 )
+@click.option(
+    "--trace",
+    is_flag=True,
+    help="Record the timings of all tasks, save them as Chrome trace and show the slowest tasks and the critical path",
+)
+@click.option(
+    "--metrics",
+    "metrics_file",
+    type=click.Path(path_type=pathlib.Path),
+    help="Write counters and timings of the build (cache hits, decoded files, model calls, written bytes) as JSON to this file",
+)
+@click.option(
+    "--metrics-prometheus",
+    "prometheus_file",
+    type=click.Path(path_type=pathlib.Path),
+    help="Write the build metrics in the Prometheus text format to this file",
+)
+@click.option(
+    "--watch",
+    is_flag=True,
+    help="Stay running after the build and rebuild the parts affected by changes of the source directory",
+)
+@click.option(
+    "--watch-interval",
+    default=1.0,
+    type=float,
+    show_default=True,
+    help="Seconds between checks of the source directory in watch mode",
+)
+@click.option(
+    "--shard",
+    callback=parse_shard,
+    metavar="START:END",
+    help="Only build the dates from START to END (YYYY-MM-DD, both included) into the build directory; combine the shards with the merge command",
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    help="Only use cached web responses and fail if a request is not cached",
+)
 @click.option(
     "--debug-fast",
     is_flag=True,
@@ -402,6 +693,14 @@ def build(
     no_cache: bool,
     profile: bool,
     debug_fast: bool,
+    offline: bool,
+    trace: bool,
+    metrics_file: pathlib.Path | None,
+    prometheus_file: pathlib.Path | None,
+    watch: bool,
+    watch_interval: float,
+    parallel_type: str,
+    shard: "DateRange | None",
 ) -> None:
     """Build the map diary from source directory to distribution directory."""
     # Get verbosity settings from CLI group context
@@ -414,6 +713,12 @@ def build(
     if dist_dir is None:
         dist_dir = source_dir.with_name(source_dir.name + "_dist")
 
+    if shard is not None and build_dir is None and not persistent_build:
+        raise click.BadParameter(
+            "The outputs of a shard are merged from its build directory; "
+            "use --build-dir or --persistent-build."
+        )
+
     if persistent_build and build_dir is None:
         build_dir = source_dir.with_name(source_dir.name + "_build")
 
@@ -445,5 +750,13 @@ def build(
             no_cache=no_cache,
             profile=profile,
             debug_fast=debug_fast,
+            offline=offline,
+            trace=trace,
+            metrics_file=metrics_file,
+            prometheus_file=prometheus_file,
+            watch=watch,
+            watch_interval=watch_interval,
+            parallel_type=parallel_type,
+            shard=shard,
         )
     # Note: main() will call sys.exit()
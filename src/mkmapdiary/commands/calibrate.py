@@ -1,7 +1,7 @@
 import logging
 import tempfile
 from pathlib import Path
-from typing import Any
+from typing import TYPE_CHECKING, Any
 from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
 
 import click
@@ -10,10 +10,11 @@ import jsonschema
 import whenever
 import yaml
 
-from mkmapdiary.lib.asset import AssetRecord
 from mkmapdiary.lib.config import load_config_param
 from mkmapdiary.lib.dirs import Dirs
-from mkmapdiary.taskList import TaskList
+
+if TYPE_CHECKING:
+    from mkmapdiary.lib.asset import AssetRecord
 
 logger = logging.getLogger(__name__)
 
@@ -70,6 +71,8 @@ def file(
         tempdir_path = Path(tempdir)
         dirs = Dirs(tempdir_path, tempdir_path, tempdir_path, False)
 
+        from mkmapdiary.taskList import TaskList
+
         config = load_config_param("site.timezone=UTC")
         taskList = TaskList(config, dirs, dict(), scan=False)
         assets = list(taskList.handle_path(image))
@@ -5,8 +5,6 @@ import subprocess
 import sys
 
 import click
-import ollama
-import requests
 
 
 def generate_demo_data(demo_data_dir: pathlib.Path) -> None:
@@ -66,6 +64,8 @@ def create_demo_audio_files(demo_data_dir: pathlib.Path) -> None:
 
 
 def create_demo_image_files(demo_data_dir: pathlib.Path) -> None:
+    import requests
+
     for _ in range(0, random.randint(3, 6)):
         timestamp = random_datetime().strftime("%Y%m%d_%H%M%S")
         file_path = demo_data_dir / f"photo_{timestamp}.jpg"
@@ -130,6 +130,8 @@ def random_text(
     Do not explain. Do not include phrases like "Here is" etc.
     {additional_instructions}
     """
+    import ollama
+
     response = ollama.chat(
         model="llama3:8b",
         messages=[{"role": "user", "content": prompt}],
@@ -0,0 +1,407 @@
+"""Offline generation of synthetic trips for scale testing.
+
+Unlike ``generate-demo``, no network or language model is needed and the
+output only depends on the options and the seed, so scaling problems can be
+reproduced exactly. Every day of the trip consists of a GPS track alternating
+between stays, walks and drives with occasional recording gaps, photos taken
+along the track with EXIF timestamps and positions, text and markdown notes,
+and short audio recordings.
+"""
+
+import datetime
+import pathlib
+import sys
+import wave
+import zoneinfo
+from collections.abc import Iterator
+from typing import IO, Literal, NamedTuple
+
+import click
+import numpy as np
+from PIL import ExifTags, Image
+
+# Recording hours of a day, local time
+DAY_START = 8
+DAY_END = 20
+# Segment kinds with their probability, speed in m/s and mean duration in s
+SEGMENTS = {
+    "stay": (0.35, 0.0, 2700),
+    "walk": (0.4, 1.4, 2400),
+    "drive": (0.2, 15.0, 1800),
+    "gap": (0.05, 1.4, 900),
+}
+GPS_NOISE = 4.0  # meters
+METERS_PER_DEGREE = 111320.0
+AUDIO_RATE = 16000
+WORDS = (
+    "morning evening river mountain village market bridge harbour castle "
+    "forest lake coffee bread path rain sun wind station train bus museum "
+    "garden tower street square church old new small quiet busy long short "
+    "walked visited found watched tasted climbed crossed waited met saw"
+).split()
+
+
+class DayTrack(NamedTuple):
+    times: np.ndarray  # seconds since the epoch, UTC
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+    elevations: np.ndarray
+    segment_starts: np.ndarray  # indices where a new track segment begins
+
+
+def generate_day_track(
+    rng: np.random.Generator,
+    start: datetime.datetime,
+    end: datetime.datetime,
+    n_points: int,
+    origin: tuple[float, float],
+) -> DayTrack:
+    """Random track between two instants, starting at the origin."""
+    kinds = list(SEGMENTS)
+    probabilities = [SEGMENTS[kind][0] for kind in kinds]
+    times = np.linspace(start.timestamp(), end.timestamp(), n_points, endpoint=False)
+    dt = (end - start).total_seconds() / max(n_points, 1)
+
+    # Assign every point to a segment of random kind and duration
+    speed = np.empty(n_points)
+    recorded = np.ones(n_points, dtype=bool)
+    moving = np.zeros(n_points, dtype=bool)
+    position = 0
+    while position < n_points:
+        kind = kinds[rng.choice(len(kinds), p=probabilities)]
+        _, segment_speed, mean_duration = SEGMENTS[kind]
+        length = max(1, int(rng.exponential(mean_duration) / dt))
+        segment = slice(position, position + length)
+        speed[segment] = segment_speed * rng.uniform(0.7, 1.3)
+        moving[segment] = segment_speed > 0
+        recorded[segment] = kind != "gap"
+        position += length
+
+    heading = rng.uniform(0, 2 * np.pi) + np.cumsum(rng.normal(0, 0.05, n_points))
+    distance = speed * dt
+    north = np.cumsum(distance * np.cos(heading))
+    east = np.cumsum(distance * np.sin(heading))
+
+    # Measurement noise does not accumulate
+    north_noise = north + rng.normal(0, GPS_NOISE, n_points)
+    east_noise = east + rng.normal(0, GPS_NOISE, n_points)
+    latitudes = origin[0] + north_noise / METERS_PER_DEGREE
+    longitudes = origin[1] + east_noise / (
+        METERS_PER_DEGREE * np.cos(np.radians(origin[0]))
+    )
+    elevations = 400 + np.cumsum(rng.normal(0, 0.2, n_points) * moving)
+
+    # Gaps split the track into segments
+    indices = np.flatnonzero(recorded)
+    breaks = np.flatnonzero(np.diff(indices) > 1) + 1
+    return DayTrack(
+        times[indices],
+        latitudes[indices],
+        longitudes[indices],
+        elevations[indices],
+        np.concatenate(([0], breaks)) if len(indices) else np.array([], dtype=int),
+    )
+
+
+def write_gpx_header(f: IO[str]) -> None:
+    f.write(
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<gpx version="1.1" creator="mkmapdiary generate-synthetic" '
+        'xmlns="http://www.topografix.com/GPX/1/1">\n'
+    )
+
+
+def write_gpx_track(f: IO[str], name: str, track: DayTrack) -> None:
+    f.write(f"<trk><name>{name}</name>\n")
+    bounds = [*track.segment_starts.tolist(), len(track.times)]
+    # Dense tracks need fractional seconds to keep timestamps distinct
+    dense = len(track.times) > 1 and np.min(np.diff(track.times)) < 1
+    unit: Literal["ms", "s"] = "ms" if dense else "s"
+    for start, end in zip(bounds[:-1], bounds[1:], strict=True):
+        f.write("<trkseg>\n")
+        times = np.datetime_as_string(
+            (track.times[start:end] * 1000).astype("datetime64[ms]"), unit=unit
+        )
+        f.writelines(
+            f'<trkpt lat="{lat:.7f}" lon="{lon:.7f}"><ele>{ele:.1f}</ele>'
+            f"<time>{time}Z</time></trkpt>\n"
+            for lat, lon, ele, time in zip(
+                track.latitudes[start:end],
+                track.longitudes[start:end],
+                track.elevations[start:end],
+                times,
+                strict=True,
+            )
+        )
+        f.write("</trkseg>\n")
+    f.write("</trk>\n")
+
+
+def random_text(rng: np.random.Generator, n_words: int) -> str:
+    words = rng.choice(WORDS, n_words)
+    return " ".join(words).capitalize() + "."
+
+
+def pick_moments(
+    rng: np.random.Generator, track: DayTrack, count: int
+) -> Iterator[int]:
+    """Indices of distinct seconds of a track, in chronological order."""
+    if len(track.times) == 0 or count == 0:
+        return
+    candidates = rng.choice(len(track.times), min(count, len(track.times)), False)
+    seen = set()
+    for index in sorted(candidates):
+        second = int(track.times[index])
+        if second not in seen:
+            seen.add(second)
+            yield int(index)
+
+
+def local_time(track: DayTrack, index: int, tz: datetime.tzinfo) -> datetime.datetime:
+    return datetime.datetime.fromtimestamp(int(track.times[index]), tz)
+
+
+def to_dms(value: float) -> tuple[float, float, float]:
+    value = abs(value)
+    degrees = int(value)
+    minutes = int((value - degrees) * 60)
+    seconds = round((value - degrees - minutes / 60) * 3600, 4)
+    return (float(degrees), float(minutes), seconds)
+
+
+def write_photo(
+    path: pathlib.Path,
+    rng: np.random.Generator,
+    size: tuple[int, int],
+    local_time: datetime.datetime,
+    position: tuple[float, float] | None,
+) -> None:
+    width, height = size
+    # Smooth gradient with noise, so that images compress realistically
+    gradient = np.linspace(0, 1, width)[None, :, None] * rng.uniform(0, 255, 3)
+    noise = rng.normal(0, 12, (height, width, 3))
+    pixels = np.clip(gradient + rng.uniform(0, 128, 3) + noise, 0, 255)
+
+    exif = Image.Exif()
+    exif[ExifTags.Base.Make] = "mkmapdiary"
+    exif[ExifTags.Base.Model] = "synthetic"
+    exif.get_ifd(ExifTags.IFD.Exif)[ExifTags.Base.DateTimeOriginal] = (
+        local_time.strftime("%Y:%m:%d %H:%M:%S")
+    )
+    if position is not None:
+        gps = exif.get_ifd(ExifTags.IFD.GPSInfo)
+        gps[ExifTags.GPS.GPSLatitudeRef] = "N" if position[0] >= 0 else "S"
+        gps[ExifTags.GPS.GPSLatitude] = to_dms(position[0])
+        gps[ExifTags.GPS.GPSLongitudeRef] = "E" if position[1] >= 0 else "W"
+        gps[ExifTags.GPS.GPSLongitude] = to_dms(position[1])
+
+    Image.fromarray(pixels.astype(np.uint8)).save(path, quality=85, exif=exif)
+
+
+def write_wav(path: pathlib.Path, rng: np.random.Generator, duration: float) -> None:
+    t = np.arange(int(duration * AUDIO_RATE)) / AUDIO_RATE
+    tone = np.sin(2 * np.pi * rng.uniform(150, 400) * t) * (np.sin(np.pi * t) ** 2)
+    samples = (tone * 8000 + rng.normal(0, 300, len(t))).astype(np.int16)
+    with wave.open(str(path), "wb") as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(AUDIO_RATE)
+        f.writeframes(samples.tobytes())
+
+
+def generate_synthetic_data(
+    target_dir: pathlib.Path,
+    days: int = 3,
+    photos: int = 20,
+    points: int = 20000,
+    notes: int = 2,
+    recordings: int = 1,
+    seed: int = 0,
+    start_date: datetime.date = datetime.date(2020, 6, 1),
+    timezone: str = "UTC",
+    origin: tuple[float, float] = (47.3769, 8.5417),
+    photo_size: tuple[int, int] = (320, 240),
+) -> None:
+    """Generate a synthetic trip; counts are per day."""
+    rng = np.random.default_rng(seed)
+    tz = zoneinfo.ZoneInfo(timezone)
+
+    with open(target_dir / "calibration.yaml", "w") as f:
+        f.write(f"calibration:\n  timezone: {timezone}\n  offset: 0\n")
+
+    with open(target_dir / "track.gpx", "w") as gpx:
+        write_gpx_header(gpx)
+        for day in range(days):
+            date = start_date + datetime.timedelta(days=day)
+            start = datetime.datetime.combine(date, datetime.time(DAY_START), tz)
+            end = datetime.datetime.combine(date, datetime.time(DAY_END), tz)
+            track = generate_day_track(rng, start, end, points, origin)
+            click.echo(f"  {date}: {len(track.times)} track points")
+            write_gpx_track(gpx, str(date), track)
+            if len(track.times):
+                origin = (float(track.latitudes[-1]), float(track.longitudes[-1]))
+
+            for index in pick_moments(rng, track, photos):
+                # Some cameras have no GPS; their photos are geo-correlated
+                position = (
+                    None
+                    if rng.random() < 0.1
+                    else (float(track.latitudes[index]), float(track.longitudes[index]))
+                )
+                name = f"photo_{local_time(track, index, tz):%Y%m%d_%H%M%S}.jpg"
+                write_photo(
+                    target_dir / name,
+                    rng,
+                    photo_size,
+                    local_time(track, index, tz),
+                    position,
+                )
+
+            for index in pick_moments(rng, track, notes):
+                if rng.random() < 0.5:
+                    path = (
+                        target_dir
+                        / f"note_{local_time(track, index, tz):%Y%m%d_%H%M%S}.md"
+                    )
+                    content = (
+                        f"# {random_text(rng, 3)}\n\n{random_text(rng, 60)}\n\n"
+                        f"- {random_text(rng, 5)}\n- {random_text(rng, 5)}\n"
+                    )
+                else:
+                    path = (
+                        target_dir
+                        / f"note_{local_time(track, index, tz):%Y%m%d_%H%M%S}.txt"
+                    )
+                    content = random_text(rng, 80) + "\n"
+                path.write_text(content)
+
+            for index in pick_moments(rng, track, recordings):
+                name = f"audio_{local_time(track, index, tz):%Y%m%d_%H%M%S}.wav"
+                write_wav(target_dir / name, rng, rng.uniform(2, 5))
+        gpx.write("</gpx>\n")
+
+
+def parse_position(
+    ctx: click.Context, param: click.Parameter, value: str
+) -> tuple[float, float]:
+    try:
+        latitude, longitude = value.split(",")
+        return (float(latitude), float(longitude))
+    except ValueError as e:
+        raise click.BadParameter(f"Expected 'LAT,LON', got '{value}'") from e
+
+
+def parse_size(
+    ctx: click.Context, param: click.Parameter, value: str
+) -> tuple[int, int]:
+    try:
+        width, height = value.split("x")
+        return (int(width), int(height))
+    except ValueError as e:
+        raise click.BadParameter(f"Expected 'WIDTHxHEIGHT', got '{value}'") from e
+
+
+@click.command()
+@click.option("--days", default=3, show_default=True, help="Number of days")
+@click.option(
+    "--photos", default=20, show_default=True, help="Number of photos per day"
+)
+@click.option(
+    "--points",
+    default=20000,
+    show_default=True,
+    help="Number of GPS track points per day, including gaps",
+)
+@click.option(
+    "--notes",
+    default=2,
+    show_default=True,
+    help="Number of text and markdown notes per day",
+)
+@click.option(
+    "--recordings",
+    default=1,
+    show_default=True,
+    help="Number of audio recordings per day",
+)
+@click.option("--seed", default=0, show_default=True, help="Random seed")
+@click.option(
+    "--start-date",
+    type=click.DateTime(formats=["%Y-%m-%d"]),
+    default="2020-06-01",
+    show_default=True,
+    help="Date of the first day",
+)
+@click.option(
+    "--timezone",
+    default="UTC",
+    show_default=True,
+    help="Timezone of the trip, used for camera and file name timestamps",
+)
+@click.option(
+    "--origin",
+    default="47.3769,8.5417",
+    show_default=True,
+    callback=parse_position,
+    help="Latitude and longitude of the start of the trip",
+)
+@click.option(
+    "--photo-size",
+    default="320x240",
+    show_default=True,
+    callback=parse_size,
+    help="Width and height of the photos in pixels",
+)
+@click.argument(
+    "source_dir",
+    type=click.Path(path_type=pathlib.Path),
+    required=True,
+)
+def generate_synthetic(
+    source_dir: pathlib.Path,
+    days: int,
+    photos: int,
+    points: int,
+    notes: int,
+    recordings: int,
+    seed: int,
+    start_date: datetime.datetime,
+    timezone: str,
+    origin: tuple[float, float],
+    photo_size: tuple[int, int],
+) -> None:
+    """Generate a synthetic trip in the source directory without network access.
+
+    The same options and seed always produce the same files. The target
+    directory must be empty.
+
+    SOURCE_DIR: Directory where the trip will be generated (must be empty)
+    """
+    if not source_dir.exists():
+        source_dir.mkdir(parents=True, exist_ok=True)
+    elif any(source_dir.iterdir()):
+        click.echo(
+            f"Source directory '{source_dir}' must be empty to generate a trip.",
+        )
+        sys.exit(1)
+
+    try:
+        zoneinfo.ZoneInfo(timezone)
+    except (zoneinfo.ZoneInfoNotFoundError, ValueError) as e:
+        raise click.BadParameter(f"Unknown timezone '{timezone}'") from e
+
+    click.echo(f"Generating synthetic trip in '{source_dir}' ...")
+    generate_synthetic_data(
+        source_dir,
+        days=days,
+        photos=photos,
+        points=points,
+        notes=notes,
+        recordings=recordings,
+        seed=seed,
+        start_date=start_date.date(),
+        timezone=timezone,
+        origin=origin,
+        photo_size=photo_size,
+    )
+    click.echo("Synthetic trip generation complete.")
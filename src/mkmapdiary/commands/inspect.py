@@ -8,7 +8,6 @@ from tabulate import tabulate
 
 from mkmapdiary.lib.config import load_config_param
 from mkmapdiary.lib.dirs import Dirs
-from mkmapdiary.taskList import TaskList
 
 logger = logging.getLogger(__name__)
 
@@ -34,6 +33,8 @@ def inspect(source: Path, tz: str) -> None:
         tempdir_path = Path(tempdir)
         dirs = Dirs(tempdir_path, tempdir_path, tempdir_path, False)
 
+        from mkmapdiary.taskList import TaskList
+
         config = load_config_param(f"site.timezone={tz}")
         taskList = TaskList(config, dirs, dict(), scan=False)
         assets = list(taskList.handle_path(source))
@@ -0,0 +1,260 @@
+import itertools
+import json
+import logging
+import pathlib
+import shutil
+import subprocess
+import sys
+import tempfile
+from collections.abc import Callable
+from contextlib import nullcontext
+from typing import Any
+
+import click
+
+from ..lib.dirs import Dirs
+from ..util.log import add_file_logging, current_task
+from .build import load_config, validate_param
+
+logger = logging.getLogger(__name__)
+
+# Files of a shard that the merge writes for all shards
+MERGED_DOCS = ("assets/index.z*.js", "index.md")
+MERGED_FILES = ("overview.json", "statistics.json", "overview_lines.npz")
+
+
+def run_task(creator: Callable[[], Any]) -> None:
+    """Run the actions of the tasks of a task creator, in order."""
+    result = creator()
+    tasks = [result] if isinstance(result, dict) else list(result)
+    for task in tasks:
+        for action in task.get("actions") or []:
+            if isinstance(action, str):
+                subprocess.run(action, shell=True, check=True)
+            elif isinstance(action, tuple):
+                function, args, *kwargs = action
+                function(*args, **(kwargs[0] if kwargs else {}))
+            else:
+                action()
+
+
+def main(
+    source_dir: pathlib.Path,
+    shard_dirs: tuple[pathlib.Path, ...],
+    build_dir: pathlib.Path,
+    dist_dir: pathlib.Path,
+    params: tuple[str, ...],
+    no_cache: bool,
+    debug_fast: bool,
+    offline: bool,
+) -> None:
+    from ..lib.cache import Cache
+    from ..lib.shard import (
+        ShardManifest,
+        link_tree,
+        merge_overviews,
+        merge_statistics,
+    )
+    from ..taskList import TaskList
+
+    add_file_logging(build_dir)
+
+    current_task.set("main")
+
+    dirs = Dirs(source_dir, build_dir, dist_dir, create_dirs=False)
+
+    logger.info("Starting mkmapdiary")
+    logger.info("Generating configuration ...", extra={"icon": "⚙️"})
+
+    config_data, lang = load_config(dirs, params, debug_fast, offline)
+
+    logger.info("Reading shards ...", extra={"icon": "🧩", "is_step": True})
+    shards: list[tuple[Dirs, ShardManifest]] = []
+    for shard_dir in shard_dirs:
+        if shard_dir.resolve() == build_dir.resolve():
+            logger.error(f"Error: '{shard_dir}' is the build directory of the merge.")
+            sys.exit(1)
+        try:
+            manifest = ShardManifest.load(shard_dir)
+        except ValueError as e:
+            logger.error(f"Error: {e}")
+            sys.exit(1)
+        shards.append(
+            (Dirs(source_dir, shard_dir, dist_dir, create_dirs=False), manifest)
+        )
+    shards.sort(key=lambda shard: shard[1].date_range.start)
+
+    for (dirs_a, shard_a), (dirs_b, shard_b) in itertools.pairwise(shards):
+        if shard_a.date_range.overlaps(shard_b.date_range):
+            logger.error(
+                f"Error: The shards '{dirs_a.build_dir}' ({shard_a.date_range}) "
+                f"and '{dirs_b.build_dir}' ({shard_b.date_range}) overlap."
+            )
+            sys.exit(1)
+
+    if build_dir.is_file() or dist_dir.is_file():
+        logger.error("Error: Build and distribution directories must not be files.")
+        sys.exit(1)
+    if (
+        build_dir.is_dir()
+        and any(x for x in build_dir.iterdir() if x.name != "mkmapdiary.log")
+        and not dirs.build_dir_marker_file.is_file()
+    ):
+        logger.error(
+            f"Error: Build directory '{build_dir}' is not empty and does not contain a .mkmapdiary_build_dir file.",
+        )
+        sys.exit(1)
+    if (
+        dist_dir.is_dir()
+        and any(dist_dir.iterdir())
+        and not (dist_dir / "index.html").is_file()
+    ):
+        logger.error(
+            f"Error: Distribution directory '{dist_dir}' is not empty and does not contain an index.html file.",
+        )
+        sys.exit(1)
+
+    dist_dir.mkdir(parents=True, exist_ok=True)
+    build_dir.mkdir(parents=True, exist_ok=True)
+    dirs.build_dir_marker_file.touch()
+
+    # Pages and files of a previous merge; shards may have been built again
+    shutil.rmtree(dirs.docs_dir, ignore_errors=True)
+    shutil.rmtree(dirs.files_dir, ignore_errors=True)
+
+    if no_cache:
+        with tempfile.NamedTemporaryFile(suffix=".db", delete=False) as temp_cache:
+            cache = Cache(pathlib.Path(temp_cache.name))
+    else:
+        cache = Cache(dirs.cache_db_path)
+
+    dirs.create_dirs = True
+    taskList = TaskList(
+        dict(config_data), dirs, cache, scan=False, gettext=lang.gettext
+    )
+
+    logger.info(
+        "Linking the outputs of the shards ...", extra={"icon": "🔗", "is_step": True}
+    )
+    for shard_dirs_, manifest in shards:
+        count = link_tree(shard_dirs_.docs_dir, dirs.docs_dir, exclude=MERGED_DOCS)
+        count += link_tree(shard_dirs_.files_dir, dirs.files_dir, exclude=MERGED_FILES)
+        for asset in manifest.rebased_assets(shard_dirs_.build_dir, dirs.build_dir):
+            taskList.db.add_asset(asset)
+        logger.info(
+            f"Shard {manifest.date_range}: {len(manifest.dates)} dates, "
+            f"{len(manifest.assets)} assets, {count} files"
+        )
+    taskList.db.has_display_date = True
+
+    shard_files_dirs = [shard_dirs_.files_dir for shard_dirs_, _ in shards]
+    with open(dirs.files_dir / "statistics.json", "w", encoding="utf-8") as f:
+        json.dump(merge_statistics(shard_files_dirs), f)
+    with open(dirs.files_dir / "overview.json", "w", encoding="utf-8") as f:
+        json.dump(merge_overviews(shard_files_dirs, dirs.assets_dir), f)
+
+    logger.info(
+        "Building the index page and the site ...",
+        extra={"icon": "🚀", "is_step": True},
+    )
+    for creator in (
+        taskList.task_create_directory,
+        taskList.task_generate_mkdocs_config,
+        taskList.task_compile_css,
+        taskList.task_copy_simple_asset,
+        taskList.task_build_index_page,
+        taskList.task_build_site,
+    ):
+        name = creator.__name__.removeprefix("task_")
+        current_task.set(name)
+        try:
+            run_task(creator)
+        except Exception:
+            logger.exception(f"Error: Task {name} failed.")
+            sys.exit(1)
+
+    current_task.set("main")
+    logger.info("Done.", extra={"icon": "✅"})
+
+
+@click.command()
+@click.option(
+    "-x",
+    "--params",
+    multiple=True,
+    callback=validate_param,
+    type=str,
+    help="Add additional configuration parameter, as passed to the shards. Format: key=value.",
+)
+@click.option(
+    "-b",
+    "--build-dir",
+    type=click.Path(path_type=pathlib.Path),
+    help="Path to the build directory of the merged site (defaults to a temporary directory)",
+)
+@click.option(
+    "-o",
+    "--dist-dir",
+    type=click.Path(path_type=pathlib.Path),
+    help="Output directory for the generated website (defaults to SOURCE_DIR_dist)",
+)
+@click.option(
+    "--no-cache",
+    is_flag=True,
+    help="Disable cache in the home directory (not recommended)",
+)
+@click.option(
+    "--offline",
+    is_flag=True,
+    help="Only use cached web responses and fail if a request is not cached",
+)
+@click.option(
+    "--debug-fast",
+    is_flag=True,
+    help="Enable fast debug mode (for development purposes only).",
+)
+@click.argument(
+    "source_dir",
+    type=click.Path(path_type=pathlib.Path),
+    required=True,
+)
+@click.argument(
+    "shard_dirs",
+    nargs=-1,
+    required=True,
+    type=click.Path(exists=True, file_okay=False, path_type=pathlib.Path),
+)
+def merge(
+    source_dir: pathlib.Path,
+    shard_dirs: tuple[pathlib.Path, ...],
+    params: tuple[str, ...],
+    build_dir: pathlib.Path | None,
+    dist_dir: pathlib.Path | None,
+    no_cache: bool,
+    offline: bool,
+    debug_fast: bool,
+) -> None:
+    """Merge the build directories of shards into one site.
+
+    The shards are built with `build --shard` from the same source directory.
+    """
+    if dist_dir is None:
+        dist_dir = source_dir.with_name(source_dir.name + "_dist")
+
+    build_dir_context: Any
+    if build_dir is None:
+        build_dir_context = tempfile.TemporaryDirectory()
+    else:
+        build_dir_context = nullcontext(build_dir)
+
+    with build_dir_context as tmpdirname:
+        main(
+            source_dir=source_dir,
+            shard_dirs=shard_dirs,
+            build_dir=pathlib.Path(tmpdirname),
+            dist_dir=dist_dir,
+            params=params,
+            no_cache=no_cache,
+            debug_fast=debug_fast,
+            offline=offline,
+        )
@@ -0,0 +1,97 @@
+"""Memoized lookup of administrative hierarchy strings.
+
+Coordinates are snapped to a grid of about ten metres, so that the many
+assets taken at the same place share one lookup. Results are kept in memory
+and persisted in the user cache; concurrent requests for the same grid cell
+wait for the first one instead of querying the database again.
+"""
+
+import logging
+import threading
+from collections.abc import MutableMapping
+from concurrent.futures import Future
+from typing import Any
+
+from shapely.geometry import Point
+
+from mkmapdiary.lib.poiLookup import PoiBackend, PoiidxBackend
+from mkmapdiary.util.cache import with_cache
+
+logger = logging.getLogger(__name__)
+
+CacheKey = tuple[float, float, str | None, int | None]
+
+
+class AdminLookup:
+    def __init__(
+        self,
+        cache: MutableMapping | None = None,
+        backend: PoiBackend | None = None,
+        precision: int = 4,
+    ) -> None:
+        """Create a lookup.
+
+        Args:
+            cache: Persistent cache, e.g. the user cache of the build.
+            backend: Source of administrative boundaries; defaults to poiidx.
+            precision: Number of decimals coordinates are rounded to.
+        """
+        self.__cache = cache if cache is not None else {}
+        self.__backend = backend or PoiidxBackend()
+        self.__precision = precision
+        self.__results: dict[CacheKey, Future[str]] = {}
+        self.__lock = threading.Lock()
+
+    def __lookup(
+        self, lon: float, lat: float, lang: str | None, max_admin_level: int | None
+    ) -> str:
+        return self.__backend.get_administrative_hierarchy_string(
+            Point(lon, lat), lang, max_admin_level=max_admin_level
+        )
+
+    def get(
+        self,
+        lon: float,
+        lat: float,
+        lang: str | None = None,
+        max_admin_level: int | None = None,
+    ) -> str:
+        """Administrative hierarchy string for a (lon, lat) coordinate."""
+        key: CacheKey = (
+            round(lon, self.__precision),
+            round(lat, self.__precision),
+            lang,
+            max_admin_level,
+        )
+
+        with self.__lock:
+            future = self.__results.get(key)
+            owner = future is None
+            if future is None:
+                future = self.__results[key] = Future()
+
+        if not owner:
+            return future.result()
+
+        try:
+            result = with_cache(
+                self.__cache,
+                "admin_hierarchy",
+                self.__lookup,
+                *key,
+            )
+        except BaseException as e:
+            # Do not memoize failures; the next request tries again
+            with self.__lock:
+                del self.__results[key]
+            future.set_exception(e)
+            raise
+
+        future.set_result(result)
+        return result
+
+    def get_for_asset(self, asset: Any, lang: str | None = None) -> str | None:
+        """Hierarchy string for an asset, or None if it has no position."""
+        if asset.latitude is None or asset.longitude is None:
+            return None
+        return self.get(asset.longitude, asset.latitude, lang)
@@ -2,6 +2,7 @@ import dataclasses
 import datetime
 import pathlib
 import threading
+from collections.abc import Iterable
 from typing import Any
 
 import whenever
@@ -11,8 +12,10 @@ from mkmapdiary.lib.asset import AssetRecord
 
 class AssetRegistry:
     def __init__(self) -> None:
-        # Note: Asset list is append/update only; no delete!
+        # Note: Asset list is append/update only; assets are only removed
+        # when their source is removed while watching.
         self.__assets: list[AssetRecord] = []
+        self.__last_id = 0
         self.lock = threading.RLock()
 
         self.has_display_date = False
@@ -20,7 +23,7 @@ class AssetRegistry:
     @property
     def next_id(self) -> int:
         with self.lock:
-            return len(self.__assets) + 1
+            return self.__last_id + 1
 
     @property
     def assets(self) -> list[AssetRecord]:
@@ -37,9 +40,30 @@ class AssetRegistry:
                 "AssetRecord id must be None when adding a new asset"
             )
             asset_record.id = self.next_id
+            self.__last_id = asset_record.id
 
             self.__assets.append(asset_record)
 
+    def restore_asset(self, asset_record: AssetRecord) -> None:
+        """Add an asset record with an id assigned by another registry.
+
+        Used to merge assets added in a worker process of a parallel build."""
+        with self.lock:
+            assert asset_record.id is not None, (
+                "AssetRecord id must be set when restoring an asset"
+            )
+            assert self.get_asset_by_id(asset_record.id) is None, (
+                f"Asset with id {asset_record.id} already exists"
+            )
+            self.__last_id = max(self.__last_id, asset_record.id)
+            self.__assets.append(asset_record)
+
+    def remove_assets(self, asset_ids: Iterable[int | None]) -> None:
+        """Remove asset records; their ids are not reused."""
+        ids = set(asset_ids)
+        with self.lock:
+            self.__assets = [asset for asset in self.__assets if asset.id not in ids]
+
     def update_asset(self, asset_record: AssetRecord | dict[str, Any]) -> None:
         """Update an existing asset record.
         If a record is provided, only non-None fields in asset_record will be updated."""
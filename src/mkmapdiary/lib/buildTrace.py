@@ -0,0 +1,226 @@
+"""Timings of the tasks and actions of a build.
+
+Spans are recorded with their thread, so that the build can be inspected as
+Chrome trace (``chrome://tracing``, Perfetto). The summary lists the slowest
+tasks, the totals per task family (e.g. all ``convert_image:*`` tasks) and the
+critical path: the chain of dependent tasks with the longest total duration,
+which bounds the wall-clock time of the build regardless of parallelism.
+"""
+
+import dataclasses
+import json
+import os
+import pathlib
+import threading
+import time
+from collections.abc import Callable, Iterable, Iterator
+from contextlib import contextmanager
+from typing import Any
+
+import doit.task
+from tabulate import tabulate
+
+
+@dataclasses.dataclass
+class Span:
+    name: str
+    category: str
+    start: float
+    end: float
+    thread: int
+    thread_name: str
+
+    @property
+    def duration(self) -> float:
+        return self.end - self.start
+
+
+def task_family(name: str) -> str:
+    """Task name without the name of the subtask."""
+    return name.split(":", 1)[0]
+
+
+class BuildTrace:
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.__clock = clock
+        self.__lock = threading.Lock()
+        self.__origin = clock()
+        self.__spans: list[Span] = []
+        self.__dependencies: dict[str, list[str]] = {}
+
+    def now(self) -> float:
+        """Seconds since the start of the trace."""
+        return self.__clock() - self.__origin
+
+    def add_dependencies(self, name: str, dependencies: Iterable[str]) -> None:
+        """Record the tasks a task depends on."""
+        with self.__lock:
+            self.__dependencies[name] = list(dependencies)
+
+    def add_span(self, name: str, category: str, start: float, end: float) -> None:
+        """Record a span that ran in the current thread."""
+        thread = threading.current_thread()
+        span = Span(name, category, start, end, thread.ident or 0, thread.name)
+        with self.__lock:
+            self.__spans.append(span)
+
+    def instrument(self, task: doit.task.Task) -> None:
+        """Record the dependencies of a task and trace it and its actions."""
+        self.add_dependencies(task.name, [*task.task_dep, *task.setup_tasks])
+
+        execute_task = task.execute
+
+        def _execute_task(stream: Any) -> Any:
+            with self.span(task.name, "task"):
+                return execute_task(stream)
+
+        task.execute = _execute_task  # type: ignore[method-assign]
+
+        for action in task.actions:
+            callable_ = getattr(action, "py_callable", None)
+            label = getattr(callable_, "__name__", None) or str(action)
+            self.__instrument_action(action, f"{task.name} {label}")
+
+    def __instrument_action(self, action: Any, name: str) -> None:
+        execute_action = action.execute
+
+        def _execute_action(*args: Any, **kwargs: Any) -> Any:
+            with self.span(name, "action"):
+                return execute_action(*args, **kwargs)
+
+        action.execute = _execute_action
+
+    @contextmanager
+    def span(self, name: str, category: str) -> Iterator[None]:
+        start = self.now()
+        try:
+            yield
+        finally:
+            self.add_span(name, category, start, self.now())
+
+    def spans(self, category: str | None = None) -> list[Span]:
+        with self.__lock:
+            return [
+                span
+                for span in self.__spans
+                if category is None or span.category == category
+            ]
+
+    def slowest(self, count: int = 10) -> list[Span]:
+        """The longest running tasks."""
+        return sorted(self.spans("task"), key=lambda s: s.duration, reverse=True)[
+            :count
+        ]
+
+    def family_totals(self) -> list[tuple[str, int, float]]:
+        """Number and total duration of the tasks of every family, longest first."""
+        totals: dict[str, tuple[int, float]] = {}
+        for span in self.spans("task"):
+            family = task_family(span.name)
+            count, total = totals.get(family, (0, 0.0))
+            totals[family] = (count + 1, total + span.duration)
+        return sorted(
+            ((family, count, total) for family, (count, total) in totals.items()),
+            key=lambda item: item[2],
+            reverse=True,
+        )
+
+    def critical_path(self) -> list[Span]:
+        """Chain of dependent tasks with the longest total duration.
+
+        Tasks that did not run (e.g. because they were up to date) take no
+        time, but still connect the tasks depending on them.
+        """
+        durations = {span.name: span.duration for span in self.spans("task")}
+        spans = {span.name: span for span in self.spans("task")}
+        with self.__lock:
+            dependencies = dict(self.__dependencies)
+
+        # Longest path ending in every task, computed iteratively as the
+        # dependency graph can be deep.
+        longest: dict[str, tuple[float, str | None]] = {}
+        for root in list(dependencies) + list(durations):
+            stack = [(root, False)]
+            while stack:
+                name, expanded = stack.pop()
+                if name in longest:
+                    continue
+                deps = dependencies.get(name, [])
+                if not expanded:
+                    stack.append((name, True))
+                    stack.extend((dep, False) for dep in deps if dep not in longest)
+                    continue
+                best: tuple[float, str | None] = (0.0, None)
+                for dep in deps:
+                    length = longest.get(dep, (0.0, None))[0]
+                    if length > best[0]:
+                        best = (length, dep)
+                longest[name] = (best[0] + durations.get(name, 0.0), best[1])
+
+        if not longest:
+            return []
+        current: str | None = max(longest, key=lambda name: longest[name][0])
+        path = []
+        while current is not None:
+            if current in spans:
+                path.append(spans[current])
+            current = longest[current][1]
+        return list(reversed(path))
+
+    def chrome_trace(self) -> dict[str, Any]:
+        """Trace in the Chrome trace event format."""
+        pid = os.getpid()
+        events: list[dict[str, Any]] = []
+        threads: dict[int, str] = {}
+        for span in self.spans():
+            threads[span.thread] = span.thread_name
+            events.append(
+                {
+                    "name": span.name,
+                    "cat": span.category,
+                    "ph": "X",
+                    "ts": span.start * 1e6,
+                    "dur": span.duration * 1e6,
+                    "pid": pid,
+                    "tid": span.thread,
+                }
+            )
+        for thread, thread_name in threads.items():
+            events.append(
+                {
+                    "name": "thread_name",
+                    "ph": "M",
+                    "pid": pid,
+                    "tid": thread,
+                    "args": {"name": thread_name},
+                }
+            )
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def save(self, path: pathlib.Path) -> None:
+        with open(path, "w") as f:
+            json.dump(self.chrome_trace(), f)
+
+    def summary(self, count: int = 10) -> str:
+        """Tables of the slowest tasks, the task families and the critical path."""
+        slowest = tabulate(
+            [(span.name, f"{span.duration:.2f}") for span in self.slowest(count)],
+            headers=["Slowest tasks", "Seconds"],
+        )
+        families = tabulate(
+            [
+                (family, tasks, f"{total:.2f}")
+                for family, tasks, total in self.family_totals()
+            ],
+            headers=["Task family", "Tasks", "Seconds"],
+        )
+        path = self.critical_path()
+        critical = tabulate(
+            [(span.name, f"{span.start:.2f}", f"{span.duration:.2f}") for span in path],
+            headers=["Critical path", "Start", "Seconds"],
+        )
+        total = sum(span.duration for span in path)
+        return (
+            f"{slowest}\n\n{families}\n\n{critical}\n"
+            f"Critical path: {total:.2f}s in {len(path)} tasks"
+        )
@@ -1,6 +1,7 @@
 import collections
 import collections.abc
 import json
+import os
 import pathlib
 import sqlite3
 import threading
@@ -13,9 +14,20 @@ lock = threading.Lock()
 class Cache(collections.abc.MutableMapping):
     def __init__(self, cache_file: pathlib.Path):
         cache_file.parent.mkdir(parents=True, exist_ok=True)
-        self.__conn = sqlite3.connect(cache_file, check_same_thread=False)
+        self.path = cache_file
+        self.__pid: int | None = None
         self.__initialize_db()
 
+    @property
+    def __conn(self) -> sqlite3.Connection:
+        # A connection must not be used after a fork; worker processes of a
+        # parallel build open their own one
+        pid = os.getpid()
+        if self.__pid != pid:
+            self.__connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.__pid = pid
+        return self.__connection
+
     def __initialize_db(self) -> None:
         with lock:
             cursor = self.__conn.cursor()
@@ -124,6 +124,10 @@ class Dirs:
         db_path = self.build_dir / "doit.db"
         return db_path
 
+    @property
+    def shared_state_path(self) -> pathlib.Path:
+        return self.build_dir / "shared_state.db"
+
     @property
     def build_dir_marker_file(
         self,
@@ -0,0 +1,46 @@
+"""Fingerprints of the inputs of generated pages.
+
+A page only needs to be generated again if anything it is built from has
+changed. The fingerprint is a digest of exactly these inputs: the records of
+the assets shown on the page, derived data such as map overlays, the relevant
+configuration and the template. It is passed to doit as ``uptodate`` check,
+while the asset files themselves remain ``file_dep``.
+"""
+
+import dataclasses
+import hashlib
+import json
+from collections.abc import Iterable
+from typing import Any
+
+from mkmapdiary.lib.asset import AssetRecord
+
+# Fields that do not influence any page
+IGNORED_FIELDS = frozenset({"embedding"})
+
+
+def _default(value: Any) -> Any:
+    if dataclasses.is_dataclass(value) and not isinstance(value, type):
+        return dataclasses.asdict(value)
+    if hasattr(value, "to_dict"):
+        return value.to_dict()
+    return str(value)
+
+
+def asset_state(asset: AssetRecord) -> dict[str, Any]:
+    """The fields of an asset relevant for pages."""
+    return {
+        field.name: getattr(asset, field.name)
+        for field in dataclasses.fields(asset)
+        if field.name not in IGNORED_FIELDS
+    }
+
+
+def fingerprint(*parts: Any) -> str:
+    """Digest of JSON-like data; dataclasses and other values are supported."""
+    serialized = json.dumps(parts, sort_keys=True, default=_default)
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+def assets_fingerprint(assets: Iterable[AssetRecord]) -> str:
+    return fingerprint([asset_state(asset) for asset in assets])
@@ -1,6 +1,7 @@
 import whenever
 
 from .asset import AssetRecord
+from .timezones import get_resolver
 
 
 def time_string(
@@ -8,7 +9,17 @@ def time_string(
 ) -> tuple[str, str]:
     """Convert asset_time to a formatted time string in the local timezone of current_date."""
     # Use timestamp_geo if available, fall back to timestamp_utc
-    timestamp_obj = asset_data.timestamp_geo or asset_data.timestamp_utc
+    timestamp_geo = asset_data.timestamp_geo
+    if (
+        timestamp_geo is None
+        and asset_data.timestamp_utc is not None
+        and asset_data.latitude is not None
+        and asset_data.longitude is not None
+    ):
+        timestamp_geo = asset_data.timestamp_utc.to_tz(
+            get_resolver().get_tz(asset_data.longitude, asset_data.latitude)
+        )
+    timestamp_obj = timestamp_geo or asset_data.timestamp_utc
 
     if timestamp_obj:
         # Format time
@@ -26,8 +37,8 @@ def time_string(
             time_str = obj_dt.strftime("%X")
 
         # Extract timezone info
-        if asset_data.timestamp_geo and hasattr(asset_data.timestamp_geo, "tz"):
-            timezone_str = str(asset_data.timestamp_geo.tz)
+        if timestamp_geo and hasattr(timestamp_geo, "tz"):
+            timezone_str = str(timestamp_geo.tz)
         else:
             timezone_str = "UTC"
     else:
@@ -1,8 +1,6 @@
 import copy
 
 import numpy as np
-from scipy import stats
-from scipy.spatial import ConvexHull
 from shapely.geometry import MultiPoint
 
 from mkmapdiary.util.projection import LocalProjection
@@ -24,6 +22,8 @@ class GeoCluster:
         if len(self.__locations) < 4:
             return  # Not enough points to determine outliers
 
+        from scipy import stats
+
         proj = LocalProjection(self.shape)
         local_locations = proj.to_local_np(np.array(self.__locations))
 
@@ -157,6 +157,8 @@ class GeoCluster:
                 ((np.degrees(mid_lon) + 540) % 360 - 180, np.degrees(mid_lat)),
             )
 
+        from scipy.spatial import ConvexHull
+
         # Step 1: Convex hull to reduce comparisons
         try:
             hull = ConvexHull(pts)
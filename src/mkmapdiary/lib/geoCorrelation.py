@@ -0,0 +1,124 @@
+"""Correlation of timestamps with positions from GPS fixes.
+
+Times are represented as int64 microseconds since the Unix epoch, so that all
+assets can be correlated at once with ``np.searchsorted``.
+"""
+
+import dataclasses
+import datetime
+
+import numpy as np
+import whenever
+
+EPOCH = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+MICROSECOND = datetime.timedelta(microseconds=1)
+
+
+def epoch_us(time: datetime.datetime | whenever.Instant) -> int:
+    """Convert an aware datetime or an Instant to epoch microseconds."""
+    if isinstance(time, whenever.Instant):
+        return time.timestamp_nanos() // 1000
+    return (time - EPOCH) // MICROSECOND
+
+
+@dataclasses.dataclass
+class Correlation:
+    """Result of a correlation; one entry per queried time."""
+
+    longitude: np.ndarray
+    latitude: np.ndarray
+    time_diff: np.ndarray  # Microseconds to the used fix (0 for exact matches)
+    valid: np.ndarray  # False where no fix was close enough
+
+
+class GeoCorrelator:
+    """Look up positions for timestamps in a set of GPS fixes."""
+
+    def __init__(
+        self,
+        times: np.ndarray,
+        longitudes: np.ndarray,
+        latitudes: np.ndarray,
+    ) -> None:
+        order = np.argsort(times, kind="stable")
+        self.times = np.asarray(times, dtype=np.int64)[order]
+        self.longitudes = np.asarray(longitudes, dtype=float)[order]
+        self.latitudes = np.asarray(latitudes, dtype=float)[order]
+
+    def __len__(self) -> int:
+        return len(self.times)
+
+    def correlate(
+        self,
+        times: np.ndarray,
+        max_time_diff: float,
+        interpolate: bool = False,
+    ) -> Correlation:
+        """Find positions for the given epoch microsecond times.
+
+        By default, the position of the closest fix is used if it is less than
+        ``max_time_diff`` seconds away. With ``interpolate``, the position is
+        interpolated linearly between the two bracketing fixes if both are
+        within ``max_time_diff``; otherwise the closest fix is used.
+        """
+        times = np.asarray(times, dtype=np.int64)
+        n = len(self.times)
+        m = len(times)
+        if n == 0 or m == 0:
+            return Correlation(
+                longitude=np.full(m, np.nan),
+                latitude=np.full(m, np.nan),
+                time_diff=np.zeros(m, dtype=np.int64),
+                valid=np.zeros(m, dtype=bool),
+            )
+
+        max_diff = int(max_time_diff * 1_000_000)
+
+        pos = np.searchsorted(self.times, times, side="left")
+        left = np.clip(pos - 1, 0, n - 1)
+        right = np.clip(pos, 0, n - 1)
+        has_left = pos > 0
+        has_right = pos < n
+
+        left_diff = np.where(has_left, times - self.times[left], np.iinfo(np.int64).max)
+        right_diff = np.where(
+            has_right, self.times[right] - times, np.iinfo(np.int64).max
+        )
+
+        # Prefer the earlier fix on ties
+        use_right = right_diff < left_diff
+        closest = np.where(use_right, right, left)
+        time_diff = np.minimum(left_diff, right_diff)
+
+        longitude = self.longitudes[closest]
+        latitude = self.latitudes[closest]
+        valid = time_diff < max_diff
+
+        if interpolate:
+            between = (
+                has_left
+                & has_right
+                & (left_diff < max_diff)
+                & (right_diff < max_diff)
+                & (right_diff > 0)
+            )
+            span = (self.times[right] - self.times[left]).astype(float)
+            fraction = np.where(between, left_diff / np.where(span > 0, span, 1), 0)
+
+            # Interpolate longitudes across the antimeridian
+            d_lon = self.longitudes[right] - self.longitudes[left]
+            d_lon = (d_lon + 180) % 360 - 180
+            d_lat = self.latitudes[right] - self.latitudes[left]
+            lon_i = self.longitudes[left] + fraction * d_lon
+            lon_i = (lon_i + 180) % 360 - 180
+            lat_i = self.latitudes[left] + fraction * d_lat
+
+            longitude = np.where(between, lon_i, longitude)
+            latitude = np.where(between, lat_i, latitude)
+
+        return Correlation(
+            longitude=longitude,
+            latitude=latitude,
+            time_diff=time_diff,
+            valid=valid,
+        )
@@ -1,27 +1,42 @@
+import dataclasses
 import logging
 import warnings
 from collections import defaultdict
-from collections.abc import Callable, Sequence
+from collections.abc import Callable, Iterable, Sequence
 from pathlib import Path, PosixPath
 from typing import Any
 
 import gpxpy
 import gpxpy.gpx
-import hdbscan
 import numpy as np
-import poiidx
 import shapely
 from shapely.geometry import Point
 from whenever import Date, Instant
 
+from mkmapdiary.lib import trackProcessing
 from mkmapdiary.lib.assetRegistry import AssetRegistry
 from mkmapdiary.lib.geoCluster import GeoCluster
+from mkmapdiary.lib.poiLookup import PoiLookup, PoiQuery
 from mkmapdiary.lib.statistics import Statistics
 from mkmapdiary.util.log import ThisMayTakeAWhile
 from mkmapdiary.util.projection import LocalProjection
 
 logger = logging.getLogger(__name__)
 
+# Track points further apart in time are not connected on the map
+MAX_POINT_INTERVAL = 15  # seconds
+
+
+@dataclasses.dataclass
+class TrackOverview:
+    """Data of all dates combined, as shown on the index page."""
+
+    lines: list[np.ndarray]
+    statistics: Statistics
+    gpx_data: str
+    start: Instant | None = None
+    end: Instant | None = None
+
 
 class GpxCreator:
     def __init__(
@@ -35,6 +50,7 @@ class GpxCreator:
         simplification_tolerance: float = 0.0,
         gettext: Callable = lambda x: x,
         language: str = "en",
+        poi_lookup: PoiLookup | None = None,
     ) -> None:
         self.__sources = sources
         self.__db = db
@@ -45,6 +61,7 @@ class GpxCreator:
         self.__simplification_tolerance = simplification_tolerance
         self.__gettext = gettext
         self.__language = language
+        self.__poi_lookup = poi_lookup or PoiLookup()
 
         # Data structures organized by date - using defaultdict for lazy initialization
         self.__coords_by_date: defaultdict[Date, list[list[float]]] = defaultdict(list)
@@ -94,8 +111,7 @@ class GpxCreator:
                 track_points_by_date: dict[Date, list[gpxpy.gpx.GPXTrackPoint]] = {}
 
                 # Apply smoothing to the elevation data to reduce noise
-                seg.smooth(horizontal=True, vertical=True, remove_extremes=True)
-                seg.smooth(horizontal=True, vertical=True)
+                self.__smooth_segment(seg)
 
                 last_time = Instant.MAX
                 for pt in seg.points:
@@ -161,6 +177,43 @@ class GpxCreator:
                     new_rte.points.append(point)  # type: ignore
                 self.__gpx_data_by_date[pt_date]["routes"].append(new_rte)
 
+    @staticmethod
+    def __segment_columns(
+        seg: gpxpy.gpx.GPXTrackSegment,
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        lon = np.fromiter((pt.longitude for pt in seg.points), dtype=float)
+        lat = np.fromiter((pt.latitude for pt in seg.points), dtype=float)
+        ele = np.fromiter(
+            (np.nan if pt.elevation is None else pt.elevation for pt in seg.points),
+            dtype=float,
+        )
+        return lon, lat, ele
+
+    @classmethod
+    def __smooth_segment(cls, seg: gpxpy.gpx.GPXTrackSegment) -> None:
+        """Remove extremes and smooth a segment in place (like gpxpy's smooth)."""
+        lon, lat, ele = cls.__segment_columns(seg)
+
+        keep = trackProcessing.remove_extremes(lon, lat, ele)
+        points = [pt for pt, kept in zip(seg.points, keep, strict=True) if kept]
+        lon, lat, ele = trackProcessing.smooth(lon[keep], lat[keep], ele[keep])
+
+        for pt, x, y, z in zip(points, lon, lat, ele, strict=True):
+            pt.longitude = float(x)
+            pt.latitude = float(y)
+            if pt.elevation is not None:
+                pt.elevation = float(z)
+        seg.points = points
+
+    @classmethod
+    def __simplify_segment(
+        cls, seg: gpxpy.gpx.GPXTrackSegment, max_distance: float
+    ) -> None:
+        """Simplify a segment in place using RDP on projected coordinates."""
+        lon, lat, _ = cls.__segment_columns(seg)
+        indices = trackProcessing.simplify_lonlat(lon, lat, max_distance)
+        seg.points = [seg.points[i] for i in indices]
+
     def __compute_clusters(self) -> None:
         logger.debug("Computing geospatial clusters for all dates")
 
@@ -178,8 +231,8 @@ class GpxCreator:
             clusters_for_date = self.__compute_clusters_for_date(date)
             all_clusters.extend(clusters_for_date)
 
-        # Second pass: process clusters in index key order for optimal performance
-        logger.debug(f"Processing {len(all_clusters)} clusters grouped by index key")
+        # Second pass: look up POIs for all clusters in batches
+        logger.debug(f"Processing {len(all_clusters)} clusters")
         self.__process_clusters(all_clusters)
 
     def __compute_clusters_for_date(self, date: Date) -> list[dict]:
@@ -189,6 +242,8 @@ class GpxCreator:
         if len(coords) < 10:
             return []
 
+        import hdbscan
+
         coords_array = np.array(coords)
 
         # Fit HDBSCAN
@@ -241,7 +296,11 @@ class GpxCreator:
         return clusters_data
 
     def __process_clusters(self, all_clusters: list[dict]) -> None:
-        """Process clusters sorted by index key for optimal performance."""
+        """Add cluster waypoints and the most important POI near each cluster.
+
+        POIs for all clusters are looked up in batches, see PoiLookup.
+        """
+        searches: list[tuple[Date, Point, PoiQuery]] = []
 
         for cluster_data in all_clusters:
             date: Date = cluster_data["date"]
@@ -273,96 +332,82 @@ class GpxCreator:
             )
             self.__gpx_data_by_date[date]["waypoints"].append(cwpt)
 
-            # Add a POI for each cluster center
-            logger.info(
-                f"Searching POIs near cluster {label} at {clat},{clon} for date {date}",
-                extra={"icon": "📍"},
+            # Convert mass_point (lon, lat) to shapely.Point
+            mass_lon, mass_lat = cluster.mass_point
+            if mass_lon is None or mass_lat is None:
+                continue
+            mass_point = Point(mass_lon, mass_lat)  # Point expects (x=lon, y=lat)
+
+            # Create convex hull and bounding circle; the geocluster performs outlier removal,
+            # so we use the original cluster coordinates
+            logger.debug("Creating cluster envelope for POI intersection test")
+            cluster_envelope = shapely.MultiPoint(cluster_coords).convex_hull
+            local_projection = LocalProjection(mass_point)
+            local_envelope = local_projection.to_local(cluster_envelope)
+            local_bounding_circle = shapely.minimum_bounding_circle(local_envelope)
+            local_center = local_bounding_circle.centroid
+            radius = local_bounding_circle.boundary.distance(local_center)
+            center = local_projection.to_wgs(local_center)
+
+            logger.debug(
+                f"Cluster bounding circle center: {center}, radius: {radius} m"
             )
+            searches.append((date, mass_point, PoiQuery(center, radius)))
 
-            # Load regions with potential reuse of existing proxy
-            logger.debug("Loading regions (with potential reuse of existing proxy)")
+        if not searches:
+            return
 
-            logger.debug("Index proxy loaded, querying nearest POI")
-            # Convert mass_point (lon, lat) to shapely.Point for proxy.get_nearest
-            mass_lon, mass_lat = cluster.mass_point
-            if mass_lon is not None and mass_lat is not None:
-                logger.debug("Get nearest POI to cluster mass point")
-                mass_point = Point(mass_lon, mass_lat)  # Point expects (x=lon, y=lat)
-
-                # Create convex hull and bounding circle; the geocluster performs outlier removal,
-                # so we use the original cluster coordinates
-                logger.debug("Creating cluster envelope for POI intersection test")
-                cluster_envelope = shapely.MultiPoint(cluster_coords).convex_hull
-                local_projection = LocalProjection(mass_point)
-                local_envelope = local_projection.to_local(cluster_envelope)
-                local_bounding_circle = shapely.minimum_bounding_circle(local_envelope)
-                local_center = local_bounding_circle.centroid
-                radius = local_bounding_circle.boundary.distance(local_center)
-                center = local_projection.to_wgs(local_center)
-                local_mass_point = local_projection.to_local(mass_point)
-
-                logger.debug(
-                    f"Cluster bounding circle center: {center}, radius: {radius} m"
-                )
+        logger.info(
+            f"Searching POIs near {len(searches)} clusters",
+            extra={"icon": "📍"},
+        )
+        results = self.__poi_lookup.nearby_pois([query for _, _, query in searches])
 
-                if self.__skip_poi_detection:
-                    nearby_pois = []
-                else:
-                    nearby_pois = poiidx.get_nearest_pois(center, max_distance=radius)
-
-                logger.debug(f"Found {len(nearby_pois)} nearby POIs")
-
-                nearby_pois = [
-                    poi
-                    for poi in nearby_pois
-                    if self.__priorities.get(poi["symbol"], 0) is not None
-                ]
-
-                # Compute center points
-                for poi in nearby_pois:
-                    shape = poi["coordinates"]
-                    local_center = local_projection.to_local(shape).centroid
-                    poi["center"] = local_projection.to_wgs(local_center)
-
-                nearby_pois.sort(
-                    key=lambda poi: (
-                        -(self.__priorities.get(poi["symbol"], 0) or 0),
-                        local_projection.to_local(
-                            Point(poi["center"].x, poi["center"].y)
-                        ).distance(local_mass_point),
-                    )
-                )
+        # Pick the highest priority POI, closest to the mass point, per cluster
+        best_pois: list[tuple[Date, dict[str, Any]]] = []
+        for (date, mass_point, query), nearby_pois in zip(
+            searches, results, strict=True
+        ):
+            nearby_pois = [
+                poi
+                for poi in nearby_pois
+                if self.__priorities.get(poi["symbol"], 0) is not None
+            ]
+            logger.debug(f"Found {len(nearby_pois)} nearby POIs")
+            if not nearby_pois:
+                continue
 
-                for poi in nearby_pois:
-                    logger.debug(
-                        f"Nearest POI: {poi}" if nearby_pois else "None",
-                        extra={"icon": "⭐"},
-                    )
-
-                    max_admin_level = None
-                    if poi["admin_level"] is not None:
-                        max_admin_level = poi["admin_level"] - 1
-
-                    if self.__skip_poi_detection:
-                        admin = ""
-                    else:
-                        admin = poiidx.get_administrative_hierarchy_string(
-                            poi["center"],
-                            self.__language,
-                            max_admin_level=max_admin_level,
-                        )
+            local_mass_point = query.projection.to_local(mass_point)
+            poi = min(
+                nearby_pois,
+                key=lambda poi: (
+                    -(self.__priorities.get(poi["symbol"], 0) or 0),
+                    poi["local_center"].distance(local_mass_point),
+                ),
+            )
+            logger.debug(f"Nearest POI: {poi}", extra={"icon": "⭐"})
+            best_pois.append((date, poi))
+
+        admins = self.__poi_lookup.administrative_hierarchy_strings(
+            [poi["center"] for _, poi in best_pois],
+            self.__language,
+            [
+                poi["admin_level"] - 1 if poi["admin_level"] is not None else None
+                for _, poi in best_pois
+            ],
+        )
 
-                    pwpt = gpxpy.gpx.GPXWaypoint(
-                        latitude=poi["center"].y,
-                        longitude=poi["center"].x,
-                        name=poi["name"],
-                        description=self.__gettext(
-                            f"A {poi['symbol']} in {{admin}} (rank {{rank}})"
-                        ).format(admin=admin, rank=poi["rank"]),
-                        symbol=f"mkmapdiary|poi|{poi['symbol']}",
-                    )
-                    self.__gpx_data_by_date[date]["waypoints"].append(pwpt)
-                    break  # Only add the highest priority POI
+        for (date, poi), admin in zip(best_pois, admins, strict=True):
+            pwpt = gpxpy.gpx.GPXWaypoint(
+                latitude=poi["center"].y,
+                longitude=poi["center"].x,
+                name=poi["name"],
+                description=self.__gettext(
+                    f"A {poi['symbol']} in {{admin}} (rank {{rank}})"
+                ).format(admin=admin, rank=poi["rank"]),
+                symbol=f"mkmapdiary|poi|{poi['symbol']}",
+            )
+            self.__gpx_data_by_date[date]["waypoints"].append(pwpt)
 
     def __add_journal_markers(self) -> None:
         logger.debug("Adding journal markers for all dates")
@@ -405,8 +450,11 @@ class GpxCreator:
             )
             self.__gpx_data_by_date[date]["waypoints"].append(wpt)
 
-    def to_xml(self, date: Date) -> str:
-        """Generate GPX XML for a specific date."""
+    def to_xml(self, date: Date, include_tracks: bool = True) -> str:
+        """Generate GPX XML for a specific date.
+
+        With include_tracks=False, only waypoints and routes are included;
+        the map front end loads the tracks from separate level files."""
         if date not in self.__gpx_data_by_date:
             raise ValueError(
                 f"Date {date} was not processed by this GpxCreator instance"
@@ -420,11 +468,12 @@ class GpxCreator:
             gpx_out.waypoints.append(waypoint)
 
         # Add tracks for this date
-        for track in self.__gpx_data_by_date[date]["tracks"]:
+        tracks = self.__gpx_data_by_date[date]["tracks"] if include_tracks else []
+        for track in tracks:
             # Apply simplification to each track segment if tolerance > 0
             if self.__simplification_tolerance > 0:
                 for segment in track.segments:
-                    segment.simplify(max_distance=self.__simplification_tolerance)
+                    self.__simplify_segment(segment, self.__simplification_tolerance)
             gpx_out.tracks.append(track)
 
         # Add routes for this date
@@ -433,6 +482,80 @@ class GpxCreator:
 
         return gpx_out.to_xml()
 
+    def get_track_lines(self, date: Date) -> list[np.ndarray]:
+        """Return the tracks of a date as (lon, lat) arrays, split at time gaps."""
+        if date not in self.__gpx_data_by_date:
+            raise ValueError(
+                f"Date {date} was not processed by this GpxCreator instance"
+            )
+        return self.track_lines(self.__gpx_data_by_date[date]["tracks"])
+
+    @classmethod
+    def track_lines(cls, tracks: Sequence[gpxpy.gpx.GPXTrack]) -> list[np.ndarray]:
+        """Convert tracks to (lon, lat) arrays, split at time gaps."""
+        lines = []
+        for track in tracks:
+            for segment in track.segments:
+                if not segment.points:
+                    continue
+                lon, lat, _ = cls.__segment_columns(segment)
+                times = np.fromiter(
+                    (
+                        np.nan if pt.time is None else pt.time.timestamp()
+                        for pt in segment.points
+                    ),
+                    dtype=float,
+                )
+                gaps = np.flatnonzero(np.diff(times) > MAX_POINT_INTERVAL) + 1
+                coords = np.column_stack((lon, lat))
+                lines.extend(np.split(coords, gaps))
+        return lines
+
+    def get_overview(self, dates: Iterable[Date]) -> TrackOverview:
+        """Combine the data of the given dates into one overview.
+
+        Must be called before to_xml, since to_xml simplifies tracks in place.
+        """
+        lines: list[np.ndarray] = []
+        statistics = Statistics()
+        gpx_out = gpxpy.gpx.GPX()
+        first: float | None = None
+        last: float | None = None
+
+        for date in sorted(set(dates) & self.get_available_dates()):
+            data = self.__gpx_data_by_date[date]
+            lines.extend(self.track_lines(data["tracks"]))
+            gpx_out.waypoints.extend(data["waypoints"])
+            gpx_out.routes.extend(data["routes"])
+
+            if date in self.__statistics_by_date:
+                statistics.add(self.__statistics_by_date[date])
+
+            times = np.fromiter(
+                (
+                    pt.time.timestamp()
+                    for track in data["tracks"]
+                    for segment in track.segments
+                    for pt in segment.points
+                    if pt.time is not None
+                ),
+                dtype=float,
+            )
+            if len(times):
+                first = min(first, times.min()) if first is not None else times.min()
+                last = max(last, times.max()) if last is not None else times.max()
+
+        overview = TrackOverview(
+            lines=lines,
+            statistics=statistics,
+            gpx_data=gpx_out.to_xml(),
+        )
+        if first is not None and last is not None:
+            overview.start = Instant.from_timestamp(first)
+            overview.end = Instant.from_timestamp(last)
+            statistics.total_time = last - first
+        return overview
+
     def get_available_dates(self) -> set[Date]:
         """Return all dates that are available in this GpxCreator instance."""
         return set(self.__gpx_data_by_date.keys())
@@ -2,9 +2,6 @@ import logging
 import math
 
 import numpy as np
-import sklearn.cluster
-import sklearn.metrics.pairwise
-from scipy.optimize import dual_annealing
 
 from mkmapdiary.lib.asset import AssetRecord
 
@@ -160,6 +157,8 @@ class Highlights:
         if bucket_size == 0:
             return []
 
+        import sklearn.cluster
+
         clustering = sklearn.cluster.AgglomerativeClustering(
             n_clusters=bucket_size, metric="precomputed", linkage="average"
         )
@@ -186,6 +185,8 @@ class Highlights:
             "All assets must have a valid timestamp_utc for time distance matrix calculation."
         )
 
+        import sklearn.metrics.pairwise
+
         # Extract timestamps (we've already asserted they are not None)
         timestamps = np.array(
             [asset.timestamp_utc.timestamp() for asset in assets]  # type: ignore
@@ -209,6 +210,8 @@ class Highlights:
             "All assets must have valid latitude and longitude for geo distance matrix calculation."
         )
 
+        import sklearn.metrics.pairwise
+
         coords = np.array(
             [
                 [np.radians(asset.latitude), np.radians(asset.longitude)]  # type: ignore
@@ -270,6 +273,8 @@ class Highlights:
         if len(gallery_assets) <= 2:
             return
 
+        from scipy.optimize import dual_annealing
+
         distance_matrix = cls._calculate_distance_matrix(
             gallery_assets, with_geo=False, with_non_geo=True
         )
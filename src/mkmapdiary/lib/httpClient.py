@@ -0,0 +1,182 @@
+"""Cached HTTP GET requests over a shared connection pool.
+
+Responses are stored in the cache together with their ETag and Last-Modified
+headers. Within its freshness lifetime a cached response is used as is; after
+that it is revalidated with a conditional request, so unchanged resources are
+not downloaded again. If the revalidation fails due to a network or server
+error, the stale response is used. In offline mode only cached responses are
+served and a cache miss fails immediately.
+"""
+
+import logging
+import threading
+import time
+from collections.abc import Callable, Mapping, MutableMapping
+from typing import Any
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from mkmapdiary.lib.metrics import get_metrics
+from mkmapdiary.lib.rateLimiter import RateLimiter, get_limiter
+
+logger = logging.getLogger(__name__)
+
+CACHE_SECTION = "http-response"
+# Section of responses cached without validators by earlier versions
+LEGACY_CACHE_SECTION = "http-request"
+DEFAULT_FRESHNESS = 86400  # seconds
+TIMEOUT = 5  # seconds
+POOL_SIZE = 16
+
+_session: requests.Session | None = None
+_session_lock = threading.Lock()
+
+
+class OfflineError(RuntimeError):
+    """Raised in offline mode if a response is not in the cache."""
+
+
+def get_session() -> requests.Session:
+    """Process-wide session keeping connections alive between requests."""
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=POOL_SIZE, pool_maxsize=POOL_SIZE)
+            _session.mount("https://", adapter)
+            _session.mount("http://", adapter)
+        return _session
+
+
+class HttpClient:
+    def __init__(
+        self,
+        cache: MutableMapping,
+        freshness: int = DEFAULT_FRESHNESS,
+        url_freshness: Mapping[str, int] | None = None,
+        offline: bool = False,
+        session: requests.Session | None = None,
+        limiter: RateLimiter | None = None,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        """Create a client.
+
+        Args:
+            cache: Cache for response bodies and validators.
+            freshness: Seconds a cached response is used without revalidation.
+            url_freshness: Freshness per URL prefix; the longest match wins.
+            offline: Only serve cached responses, never access the network.
+            session: Session to send requests with; defaults to the shared one.
+            limiter: Rate limiter for network requests; defaults to the shared one.
+            clock: Wall clock, replaceable for tests.
+        """
+        self.cache = cache
+        self.freshness = freshness
+        self.url_freshness = dict(url_freshness or {})
+        self.offline = offline
+        self.__session = session
+        self.__limiter = limiter or get_limiter()
+        self.__clock = clock
+
+    def freshness_for(self, url: str) -> int:
+        """Freshness lifetime in seconds for a URL."""
+        prefixes = [prefix for prefix in self.url_freshness if url.startswith(prefix)]
+        if not prefixes:
+            return self.freshness
+        return self.url_freshness[max(prefixes, key=len)]
+
+    def get(
+        self,
+        url: str,
+        headers: Mapping[str, str] | None = None,
+        json: bool = True,
+    ) -> dict[str, Any] | str:
+        """GET a fully prepared URL, returning the parsed JSON or the text."""
+        key = (CACHE_SECTION, (url, json))
+        try:
+            entry: dict[str, Any] | None = self.cache[key]
+        except KeyError:
+            entry = self.__migrate_legacy(key)
+
+        now = self.__clock()
+        if entry is not None and (
+            self.offline or now - entry["fetched"] < self.freshness_for(url)
+        ):
+            logger.debug(f"Using cached response for {url}")
+            _count_response("cache")
+            return entry["body"]
+
+        if self.offline:
+            raise OfflineError(f"No cached response for {url} in offline mode")
+
+        request_headers = dict(headers or {})
+        if entry is not None:
+            if entry.get("etag"):
+                request_headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                request_headers["If-Modified-Since"] = entry["last_modified"]
+
+        # Only actual network sends are rate limited
+        waited = self.__limiter.acquire(url)
+        if waited > 0:
+            logger.debug(f"Waited {waited:.2f}s for rate limit of {url}")
+
+        session = self.__session or get_session()
+        try:
+            response = session.get(url, headers=request_headers, timeout=TIMEOUT)
+        except requests.RequestException as e:
+            if entry is None:
+                raise
+            return _stale(url, entry, e)
+        get_metrics().counter(
+            "http_received_bytes_total", "Bytes of HTTP responses"
+        ).inc(len(response.content))
+
+        if response.status_code == 304 and entry is not None:
+            logger.debug(f"Cached response for {url} is still valid")
+            _count_response("revalidated")
+            entry["fetched"] = now
+            self.cache[key] = entry
+            return entry["body"]
+
+        if response.status_code >= 500 and entry is not None:
+            return _stale(url, entry, f"HTTP {response.status_code}")
+
+        response.raise_for_status()
+        _count_response("network")
+        body = response.json() if json else response.text
+        self.cache[key] = {
+            "body": body,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "fetched": now,
+        }
+        return body
+
+    def __migrate_legacy(self, key: tuple[str, Any]) -> dict[str, Any] | None:
+        """Move a response cached by an earlier version into the current section.
+
+        Its age is unknown, so it is revalidated when the network is used.
+        """
+        legacy_key = (LEGACY_CACHE_SECTION, key[1])
+        try:
+            body = self.cache[legacy_key]
+        except KeyError:
+            return None
+        entry = {"body": body, "etag": None, "last_modified": None, "fetched": 0.0}
+        self.cache[key] = entry
+        del self.cache[legacy_key]
+        return entry
+
+
+def _stale(url: str, entry: dict[str, Any], error: object) -> Any:
+    logger.warning(f"Could not revalidate {url} ({error}), using the cached response")
+    _count_response("stale")
+    return entry["body"]
+
+
+def _count_response(source: str) -> None:
+    get_metrics().counter(
+        "http_responses_total", "Sources of HTTP responses", source=source
+    ).inc()
@@ -1,14 +1,55 @@
 import dataclasses
-import itertools
 import logging
+import math
 import random
-from collections.abc import Callable
+from collections.abc import Callable, Sequence
+from concurrent.futures import Executor
 from typing import Any
 
 import llm_dataclass
 
 logger = logging.getLogger(__name__)
 
+# Rough number of characters per token of common tokenizers
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate the number of tokens of a text from its length."""
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def pack_batches(sizes: Sequence[int], capacity: int) -> list[list[int]]:
+    """Pack items into as few, evenly filled batches as possible.
+
+    Items keep their order, so that neighbouring items (e.g. in time) end up
+    in the same batch. Items larger than the capacity get a batch of their own.
+
+    Args:
+        sizes: Size of every item.
+        capacity: Maximum total size of a batch.
+
+    Returns:
+        Lists of item indices, one per batch.
+    """
+    if not sizes:
+        return []
+
+    n_batches = max(1, math.ceil(sum(sizes) / capacity))
+    target = sum(sizes) / n_batches
+
+    batches: list[list[int]] = [[]]
+    filled = 0
+    for index, size in enumerate(sizes):
+        current = batches[-1]
+        if current and (filled + size > capacity or filled >= target):
+            batches.append([])
+            current = batches[-1]
+            filled = 0
+        current.append(index)
+        filled += size
+    return batches
+
 
 def batch_reduce(
     count: int,
@@ -17,18 +58,36 @@ def batch_reduce(
     input_data: list[Any],
     selector_type: Any,
     context: int = 128000,
-    estimate: int = 250,
+    estimate: int | None = None,
     max_iter: int = 5,
+    reserve: int = 1000,
+    executor: Executor | None = None,
+    token_counter: Callable[[str], int] = estimate_tokens,
 ) -> list[Any]:
     """Reduce a data using a prompt in batches to fit within context limits.
 
+    The items are serialized once and packed into batches that fill the
+    context. Every batch is reduced by the LLM, and the selected items are
+    reduced again until at most `count` items are left.
+
     Args:
-        prompt (str): The input prompt to be reduced.
-        llm_callback (callable): A function that takes a prompt and returns the reduced text.
-        batch_size (int, optional): The number of items to process in each batch. Defaults to 5.
+        count: Maximum number of items to return.
+        prompt: Instructions preceding the serialized items of each batch.
+        llm_callback: Function that takes a prompt and returns the selection.
+        input_data: Dataclass instances to select from.
+        selector_type: Dataclass whose first field lists the selected ids.
+        context: Context size of the model in tokens.
+        estimate: Fixed number of tokens per item, also reserved for the
+            prompt and the response. If None, the tokens of every item and
+            the prompt are measured with `token_counter`.
+        max_iter: Maximum number of reduction rounds.
+        reserve: Tokens reserved for the response if `estimate` is None.
+        executor: Executor to reduce independent batches concurrently;
+            batches are reduced one after another if None.
+        token_counter: Function estimating the tokens of a text.
 
     Returns:
-        str: The reduced prompt after processing all batches.
+        The selected items.
     """
     assert dataclasses.is_dataclass(selector_type), "Output type must be a dataclass"
     assert count >= 0, "Count must be greater than 0"
@@ -49,54 +108,72 @@ def batch_reduce(
     output_schema: llm_dataclass.Schema = llm_dataclass.Schema(selector_type)
     id_attribute = selector_type.__dataclass_fields__.keys().__iter__().__next__()  # type: ignore
 
-    # Determine max items per batch
-    max_input_tokens = context - estimate
-    max_input_items = max_input_tokens // estimate
+    # Determine the tokens available for items per batch
+    if estimate is not None:
+        capacity = context - estimate
+        response_limit = estimate
+    else:
+        capacity = context - reserve - token_counter(prompt + "\n\n")
+        response_limit = reserve
+    assert capacity > 0, "Context is too small for the prompt"
+
+    # Serialize every item only once; later rounds reuse the results
+    serialized: dict[Any, tuple[str, int]] = {}
+    lookup: dict[Any, Any] = {}
+    for item in input_data:
+        item_id = getattr(item, id_attribute)
+        text = input_schema.dumps(item)
+        tokens = estimate if estimate is not None else token_counter(text + "\n")
+        if len(text) > capacity * CHARS_PER_TOKEN:
+            logger.warning(
+                "Input item exceeds the context size, consider increasing the context."
+            )
+        serialized[item_id] = (text, tokens)
+        lookup[item_id] = item
+
+    def reduce_batch(batch_prompt: str) -> list[Any]:
+        reduced_text = llm_callback(batch_prompt)
+
+        if len(reduced_text) > response_limit * CHARS_PER_TOKEN:
+            logger.warning(
+                "Reduced text exceeds the reserved response size, consider increasing it."
+            )
+
+        # Deserialize reduced text
+        reduced_items = output_schema.loads(reduced_text)
+        return list(getattr(reduced_items, id_attribute))
 
-    # If input size is already within count, return as is
     for _ in range(max_iter):
+        # If input size is already within count, return as is
         if len(input_data) <= count:
             return input_data
 
-        # Serialize input
-        serialized_input = []
-        lookup = {}
-
-        # Verify that input can fit in the estimated context
-        for item in input_data:
-            serialized_item = input_schema.dumps(item)
-            serialized_input.append(serialized_item)
-            if len(serialized_item) > estimate * 4:
-                logger.warning(
-                    "Input item exceeds estimated context size, consider increasing estimate."
-                )
-            lookup[getattr(item, id_attribute)] = item
-
-        batches = itertools.batched(serialized_input, max_input_items)
-        next_data = []
-        for batch in batches:
-            batch_prompt = prompt + "\n\n" + "\n".join(batch)
-            reduced_text = llm_callback(batch_prompt)
-
-            if len(reduced_text) > estimate * 4:
-                logger.warning(
-                    "Reduced text exceeds estimated context size, consider increasing estimate."
-                )
+        ids = [getattr(item, id_attribute) for item in input_data]
+        batches = pack_batches([serialized[i][1] for i in ids], capacity)
+        batch_prompts = [
+            prompt + "\n\n" + "\n".join(serialized[ids[i]][0] for i in batch)
+            for batch in batches
+        ]
+        logger.debug(f"Reducing {len(ids)} items in {len(batches)} batches")
 
-            # Deserialize reduced text
-            reduced_items = output_schema.loads(reduced_text)
+        if executor is None:
+            results = [reduce_batch(batch_prompt) for batch_prompt in batch_prompts]
+        else:
+            results = list(executor.map(reduce_batch, batch_prompts))
 
-            # Select items
-            output_items = []
-            for item in getattr(reduced_items, id_attribute):
+        # Select items, keeping the order of the batches
+        next_data = []
+        selected = set()
+        for selected_ids in results:
+            for item_id in selected_ids:
+                if item_id in selected:
+                    continue
                 try:
-                    output_items.append(lookup[item])
+                    next_data.append(lookup[item_id])
                 except KeyError:
-                    logger.warning(
-                        f"Item with id {getattr(item, id_attribute)} not found during lookup."
-                    )
-
-            next_data.extend(output_items)
+                    logger.warning(f"Item with id {item_id} not found during lookup.")
+                else:
+                    selected.add(item_id)
         input_data = next_data
 
     if len(input_data) <= count:
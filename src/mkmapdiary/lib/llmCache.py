@@ -0,0 +1,117 @@
+"""Persistent cache for LLM responses.
+
+Responses are keyed on everything that determines the model output: the
+model, its options, the rendered prompt and further message parameters.
+Images are represented by a digest of their content, so a changed image at
+the same path is not answered from the cache. The cache lives in its own
+table of the user cache database and keeps at most a fixed number of
+entries, evicting the least recently used ones.
+"""
+
+import hashlib
+import json
+import pathlib
+import sqlite3
+import threading
+import time
+from collections.abc import Mapping
+from typing import Any
+
+
+def _digest_image(image: Any) -> str:
+    if isinstance(image, bytes):
+        data = image
+    else:
+        data = pathlib.Path(image).read_bytes()
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+def cache_key(
+    model: str,
+    options: Mapping[str, Any] | None,
+    prompt: str,
+    message_params: Mapping[str, Any] | None = None,
+) -> str:
+    """Stable key for a chat request."""
+    params = dict(message_params or {})
+    if "images" in params:
+        params["images"] = [_digest_image(image) for image in params["images"]]
+    serialized = json.dumps(
+        {
+            "model": model,
+            "options": options or {},
+            "prompt": prompt,
+            "message_params": params,
+        },
+        sort_keys=True,
+        default=str,
+    )
+    return hashlib.sha256(serialized.encode()).hexdigest()
+
+
+class LlmCache:
+    def __init__(
+        self, db_path: pathlib.Path | str = ":memory:", max_entries: int = 10000
+    ) -> None:
+        """Open the cache.
+
+        Args:
+            db_path: SQLite database, usually the user cache database.
+            max_entries: Eviction budget; least recently used entries beyond
+                this number are removed.
+        """
+        self.max_entries = max_entries
+        self.__lock = threading.Lock()
+        self.__conn = sqlite3.connect(db_path, check_same_thread=False)
+        with self.__lock:
+            self.__conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS llm_responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    last_used REAL NOT NULL
+                )
+                """
+            )
+            self.__conn.execute(
+                "CREATE INDEX IF NOT EXISTS llm_responses_last_used "
+                "ON llm_responses (last_used)"
+            )
+            self.__conn.commit()
+
+    def get(self, key: str) -> str | None:
+        """Cached response for a key, or None."""
+        with self.__lock:
+            row = self.__conn.execute(
+                "SELECT response FROM llm_responses WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            self.__conn.execute(
+                "UPDATE llm_responses SET last_used = ? WHERE key = ?",
+                (time.time(), key),
+            )
+            self.__conn.commit()
+            return row[0]
+
+    def put(self, key: str, response: str) -> None:
+        """Store a response and evict entries beyond the budget."""
+        with self.__lock:
+            self.__conn.execute(
+                "REPLACE INTO llm_responses (key, response, last_used) "
+                "VALUES (?, ?, ?)",
+                (key, response, time.time()),
+            )
+            self.__conn.execute(
+                "DELETE FROM llm_responses WHERE key IN ("
+                "SELECT key FROM llm_responses ORDER BY last_used DESC "
+                "LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+            self.__conn.commit()
+
+    def __len__(self) -> int:
+        with self.__lock:
+            return self.__conn.execute("SELECT COUNT(*) FROM llm_responses").fetchone()[
+                0
+            ]
@@ -0,0 +1,170 @@
+"""Scheduling of LLM requests from concurrently running tasks.
+
+Every request waits in the queue of its model until one of the model's slots
+is free. Waiting requests are served by priority (higher first) and then in
+submission order. As long as further requests for a model are waiting or
+running, the model is kept loaded; only the last request of a queue lets the
+model server unload it soon after.
+
+In the process-parallel mode, a :class:`LlmSchedulerManager` runs one
+scheduler in a server process for all worker processes, so that the limits
+and priorities apply to the whole build.
+"""
+
+import dataclasses
+import heapq
+import itertools
+import logging
+import threading
+import time
+from collections.abc import Callable, Mapping
+from multiprocessing.managers import BaseManager
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+@dataclasses.dataclass
+class ModelStats:
+    requests: int = 0
+    queued: int = 0
+    running: int = 0
+    max_queue_depth: int = 0
+    wait_time: float = 0.0
+    max_wait: float = 0.0
+    latency: float = 0.0
+    max_latency: float = 0.0
+
+
+class LlmScheduler:
+    def __init__(
+        self,
+        concurrency: int = 1,
+        model_concurrency: Mapping[str, int] | None = None,
+        keep_alive: str | float = "5m",
+        idle_keep_alive: str | float = "15s",
+        chat: Callable[..., Any] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create a scheduler.
+
+        Args:
+            concurrency: Concurrent requests per model.
+            model_concurrency: Concurrent requests for individual models.
+            keep_alive: Keep-alive passed while more requests are queued.
+            idle_keep_alive: Keep-alive passed with the last queued request.
+            chat: Function sending a chat request, ``ollama.chat`` by default.
+            clock: Monotonic clock used for the statistics.
+        """
+        self.concurrency = concurrency
+        self.model_concurrency = dict(model_concurrency or {})
+        self.keep_alive = keep_alive
+        self.idle_keep_alive = idle_keep_alive
+        self.__chat: Callable[..., Any] | None = chat
+        self.__clock = clock
+        self.__condition = threading.Condition()
+        self.__queues: dict[str, list[tuple[int, int]]] = {}
+        self.__stats: dict[str, ModelStats] = {}
+        self.__counter = itertools.count()
+
+    def limit(self, model: str) -> int:
+        """Number of concurrent requests allowed for a model."""
+        return max(1, self.model_concurrency.get(model, self.concurrency))
+
+    def __acquire(self, model: str, priority: int) -> float:
+        entry = (-priority, next(self.__counter))
+        start = self.__clock()
+        with self.__condition:
+            queue = self.__queues.setdefault(model, [])
+            stats = self.__stats.setdefault(model, ModelStats())
+            heapq.heappush(queue, entry)
+            stats.queued += 1
+            stats.max_queue_depth = max(stats.max_queue_depth, stats.queued)
+
+            self.__condition.wait_for(
+                lambda: queue[0] == entry and stats.running < self.limit(model)
+            )
+
+            heapq.heappop(queue)
+            stats.queued -= 1
+            stats.running += 1
+            # The next request of the queue may be able to start as well
+            self.__condition.notify_all()
+
+        waited = self.__clock() - start
+        return waited
+
+    def __release(self, model: str, waited: float, latency: float) -> None:
+        with self.__condition:
+            stats = self.__stats[model]
+            stats.running -= 1
+            stats.requests += 1
+            stats.wait_time += waited
+            stats.max_wait = max(stats.max_wait, waited)
+            stats.latency += latency
+            stats.max_latency = max(stats.max_latency, latency)
+            self.__condition.notify_all()
+
+    def __keep_alive(self, model: str) -> str | float:
+        with self.__condition:
+            stats = self.__stats[model]
+            busy = stats.queued > 0 or stats.running > 1
+        return self.keep_alive if busy else self.idle_keep_alive
+
+    def chat(
+        self,
+        model: str,
+        messages: list[dict[str, Any]],
+        priority: int = 0,
+        **params: Any,
+    ) -> Any:
+        """Send a chat request once the model has a free slot."""
+        if self.__chat is None:
+            import ollama
+
+            self.__chat = ollama.chat
+        waited = self.__acquire(model, priority)
+        start = self.__clock()
+        try:
+            return self.__chat(
+                model=model,
+                messages=messages,
+                keep_alive=self.__keep_alive(model),
+                **params,
+            )
+        finally:
+            latency = self.__clock() - start
+            self.__release(model, waited, latency)
+            logger.debug(
+                f"LLM request for {model} waited {waited:.2f}s, took {latency:.2f}s"
+            )
+
+    def queue_depth(self, model: str | None = None) -> int:
+        """Number of waiting requests for a model or for all models."""
+        with self.__condition:
+            if model is not None:
+                return len(self.__queues.get(model, []))
+            return sum(len(queue) for queue in self.__queues.values())
+
+    def stats(self) -> dict[str, ModelStats]:
+        """Copy of the statistics per model."""
+        with self.__condition:
+            return {
+                model: dataclasses.replace(stats)
+                for model, stats in self.__stats.items()
+            }
+
+
+class LlmSchedulerManager(BaseManager):
+    """Server process running a scheduler shared by several processes.
+
+    Start the manager before forking the processes; the requests sent
+    through the proxy returned by :meth:`scheduler` are run by the server.
+    """
+
+    def scheduler(self, **kwargs: Any) -> LlmScheduler:
+        """Create the scheduler in the server and return a proxy for it."""
+        return self._LlmScheduler(**kwargs)  # type: ignore[attr-defined]
+
+
+LlmSchedulerManager.register("_LlmScheduler", LlmScheduler)
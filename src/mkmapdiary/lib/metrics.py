@@ -0,0 +1,204 @@
+"""Metrics of a build.
+
+A small registry of counters, histograms and timers, shared by all tasks of
+the process. Metrics are identified by their name and labels, e.g.
+``cache_requests_total{result="hit"}``. At the end of a build they can be
+written as JSON or in the Prometheus text format.
+"""
+
+import bisect
+import json
+import math
+import pathlib
+import threading
+import time
+from collections.abc import Callable, Iterator, Sequence
+from contextlib import contextmanager
+from typing import Any
+
+# Upper bounds of the histogram buckets for durations in seconds
+TIME_BUCKETS = (0.001, 0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 60.0, 300.0)
+# Upper bounds of the histogram buckets for sizes in bytes
+SIZE_BUCKETS = (2**10, 2**14, 2**17, 2**20, 2**23, 2**26, 2**30)
+
+Labels = tuple[tuple[str, str], ...]
+
+
+class Counter:
+    def __init__(self) -> None:
+        self.__lock = threading.Lock()
+        self.value = 0.0
+
+    def inc(self, amount: float = 1) -> None:
+        with self.__lock:
+            self.value += amount
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.__lock = threading.Lock()
+        self.buckets = tuple(sorted(buckets))
+        self.bucket_counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def observe(self, value: float) -> None:
+        with self.__lock:
+            self.bucket_counts[bisect.bisect_left(self.buckets, value)] += 1
+            self.count += 1
+            self.sum += value
+            self.min = min(self.min, value)
+            self.max = max(self.max, value)
+
+
+class Timer(Histogram):
+    def __init__(
+        self,
+        buckets: Sequence[float] = TIME_BUCKETS,
+        clock: Callable[[], float] = time.perf_counter,
+    ) -> None:
+        super().__init__(buckets)
+        self.__clock = clock
+
+    @contextmanager
+    def time(self) -> Iterator[None]:
+        """Observe the duration of a block in seconds."""
+        start = self.__clock()
+        try:
+            yield
+        finally:
+            self.observe(self.__clock() - start)
+
+
+class MetricsRegistry:
+    def __init__(self, clock: Callable[[], float] = time.perf_counter) -> None:
+        self.__clock = clock
+        self.__lock = threading.Lock()
+        self.__metrics: dict[tuple[str, Labels], Counter | Histogram] = {}
+        self.__descriptions: dict[str, str] = {}
+
+    def __get(
+        self,
+        kind: type[Any],
+        name: str,
+        description: str,
+        labels: dict[str, Any],
+        factory: Callable[[], Any],
+    ) -> Any:
+        key = (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+        with self.__lock:
+            metric = self.__metrics.get(key)
+            if metric is None:
+                metric = self.__metrics[key] = factory()
+                if description:
+                    self.__descriptions.setdefault(name, description)
+        assert type(metric) is kind, f"Metric {name} is a {type(metric).__name__}"
+        return metric
+
+    def counter(self, name: str, description: str = "", **labels: Any) -> Counter:
+        return self.__get(Counter, name, description, labels, Counter)
+
+    def histogram(
+        self,
+        name: str,
+        description: str = "",
+        buckets: Sequence[float] = SIZE_BUCKETS,
+        **labels: Any,
+    ) -> Histogram:
+        return self.__get(
+            Histogram, name, description, labels, lambda: Histogram(buckets)
+        )
+
+    def timer(self, name: str, description: str = "", **labels: Any) -> Timer:
+        return self.__get(
+            Timer, name, description, labels, lambda: Timer(clock=self.__clock)
+        )
+
+    def __items(self) -> list[tuple[str, Labels, Counter | Histogram]]:
+        with self.__lock:
+            return sorted(
+                (
+                    (name, labels, metric)
+                    for (name, labels), metric in self.__metrics.items()
+                ),
+                key=lambda item: (item[0], item[1]),
+            )
+
+    def to_dict(self) -> dict[str, list[dict[str, Any]]]:
+        """Values of all metrics, grouped by name."""
+        result: dict[str, list[dict[str, Any]]] = {}
+        for name, labels, metric in self.__items():
+            entry: dict[str, Any] = {"labels": dict(labels)}
+            if isinstance(metric, Counter):
+                entry["value"] = metric.value
+            else:
+                entry.update(
+                    count=metric.count,
+                    sum=metric.sum,
+                    min=metric.min if metric.count else None,
+                    max=metric.max if metric.count else None,
+                )
+            result.setdefault(name, []).append(entry)
+        return result
+
+    def to_prometheus(self) -> str:
+        """All metrics in the Prometheus text exposition format."""
+        lines = []
+        previous = None
+        for name, labels, metric in self.__items():
+            if name != previous:
+                if name in self.__descriptions:
+                    lines.append(f"# HELP {name} {self.__descriptions[name]}")
+                kind = "counter" if isinstance(metric, Counter) else "histogram"
+                lines.append(f"# TYPE {name} {kind}")
+                previous = name
+            if isinstance(metric, Counter):
+                lines.append(f"{name}{_format_labels(labels)} {metric.value:g}")
+                continue
+            cumulative = 0
+            for bound, count in zip(
+                (*metric.buckets, math.inf), metric.bucket_counts, strict=True
+            ):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else f"{bound:g}"
+                bucket_labels = _format_labels((*labels, ("le", le)))
+                lines.append(f"{name}_bucket{bucket_labels} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {metric.sum:g}")
+            lines.append(f"{name}_count{_format_labels(labels)} {metric.count}")
+        return "\n".join(lines) + "\n"
+
+    def counter_totals(self) -> list[tuple[str, str, float]]:
+        """Name, labels and value of every counter."""
+        return [
+            (name, _format_labels(labels), metric.value)
+            for name, labels, metric in self.__items()
+            if isinstance(metric, Counter)
+        ]
+
+    def save_json(self, path: pathlib.Path) -> None:
+        with open(path, "w") as f:
+            json.dump(self.to_dict(), f, indent=2)
+
+    def save_prometheus(self, path: pathlib.Path) -> None:
+        with open(path, "w") as f:
+            f.write(self.to_prometheus())
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (
+        (key, value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n"))
+        for key, value in labels
+    )
+    return "{" + ",".join(f'{key}="{value}"' for key, value in escaped) + "}"
+
+
+_metrics = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Process-wide shared registry."""
+    return _metrics
@@ -0,0 +1,242 @@
+"""Batched lookups of points of interest for many search areas at once.
+
+Search areas (a center and a radius) are grouped by spatial locality. Each
+group is resolved with a single query for all POIs within the union of its
+areas, and the results are then assigned to the individual areas locally.
+Independent groups and administrative hierarchy lookups run concurrently.
+"""
+
+import copy
+import dataclasses
+import logging
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from collections.abc import Sequence
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+import shapely
+from shapely.geometry import Point
+from shapely.geometry.base import BaseGeometry
+
+from mkmapdiary.util.projection import LocalProjection
+
+logger = logging.getLogger(__name__)
+
+
+class PoiBackend(ABC):
+    """Source of POIs and administrative boundaries."""
+
+    @abstractmethod
+    def get_pois_within(self, shape: BaseGeometry) -> list[dict[str, Any]]:
+        """Return all POIs intersecting a WGS84 shape."""
+
+    @abstractmethod
+    def get_administrative_hierarchy_string(
+        self,
+        shape: BaseGeometry,
+        lang: str | None = None,
+        max_admin_level: int | None = None,
+    ) -> str:
+        """Return the names of the administrative areas containing a shape."""
+
+
+class PoiidxBackend(PoiBackend):
+    """POI database backed by poiidx (PostGIS)."""
+
+    def get_pois_within(self, shape: BaseGeometry) -> list[dict[str, Any]]:
+        import poiidx
+
+        return poiidx.get_nearest_pois(shape, max_distance=0)
+
+    def get_administrative_hierarchy_string(
+        self,
+        shape: BaseGeometry,
+        lang: str | None = None,
+        max_admin_level: int | None = None,
+    ) -> str:
+        import poiidx
+
+        return poiidx.get_administrative_hierarchy_string(
+            shape, lang, max_admin_level=max_admin_level
+        )
+
+
+class MemoryPoiBackend(PoiBackend):
+    """In-memory POI database, e.g. for tests or small offline data sets.
+
+    POIs are dictionaries like those returned by poiidx, with at least
+    ``name``, ``symbol``, ``rank``, ``admin_level`` and ``coordinates``
+    (a shapely geometry). Boundaries have ``name``, ``admin_level``,
+    ``coordinates`` and optionally ``localized_names``.
+    """
+
+    def __init__(
+        self,
+        pois: Sequence[dict[str, Any]],
+        boundaries: Sequence[dict[str, Any]] = (),
+    ) -> None:
+        self.pois = list(pois)
+        self.boundaries = list(boundaries)
+        self.__poi_tree = shapely.STRtree([poi["coordinates"] for poi in self.pois])
+        self.queries: list[BaseGeometry] = []
+
+    def get_pois_within(self, shape: BaseGeometry) -> list[dict[str, Any]]:
+        self.queries.append(shape)
+        indices = self.__poi_tree.query(shape, predicate="intersects")
+        return [copy.deepcopy(self.pois[i]) for i in sorted(indices)]
+
+    def get_administrative_hierarchy_string(
+        self,
+        shape: BaseGeometry,
+        lang: str | None = None,
+        max_admin_level: int | None = None,
+    ) -> str:
+        boundaries = sorted(
+            (
+                boundary
+                for boundary in self.boundaries
+                if boundary["coordinates"].covers(shape)
+                and (
+                    max_admin_level is None
+                    or boundary["admin_level"] <= max_admin_level
+                )
+            ),
+            key=lambda boundary: -boundary["admin_level"],
+        )
+        items: list[str] = []
+        for boundary in boundaries:
+            localized = boundary.get("localized_names") or {}
+            name = localized.get(lang, boundary["name"]) if lang else boundary["name"]
+            if not items or items[-1] != name:
+                items.append(name)
+        return ", ".join(items)
+
+
+@dataclasses.dataclass
+class PoiQuery:
+    """Circular search area around a WGS84 center."""
+
+    center: Point
+    radius: float  # meters
+
+    def __post_init__(self) -> None:
+        self.projection = LocalProjection(self.center)
+        self.local_center = self.projection.to_local(self.center)
+
+    def area(self) -> BaseGeometry:
+        """Search area as WGS84 polygon, slightly enlarged for the query."""
+        return self.projection.to_wgs(self.local_center.buffer(self.radius + 1.0))
+
+    def contains(self, local_shape: BaseGeometry) -> bool:
+        return bool(local_shape.distance(self.local_center) <= self.radius)
+
+
+class PoiLookup:
+    def __init__(
+        self,
+        backend: PoiBackend | None = None,
+        group_size: float = 0.25,
+        max_workers: int = 4,
+    ) -> None:
+        """Create a lookup.
+
+        Args:
+            backend: POI source; defaults to the poiidx database.
+            group_size: Size in degrees of the grid cells used to group
+                search areas into one query.
+            max_workers: Number of concurrent queries.
+        """
+        self.backend = backend or PoiidxBackend()
+        self.group_size = group_size
+        self.max_workers = max_workers
+
+    def __group(self, queries: Sequence[PoiQuery]) -> list[list[int]]:
+        groups: defaultdict[tuple[int, int], list[int]] = defaultdict(list)
+        for i, query in enumerate(queries):
+            key = (
+                int(query.center.x // self.group_size),
+                int(query.center.y // self.group_size),
+            )
+            groups[key].append(i)
+        return list(groups.values())
+
+    def __nearby_pois_for_group(
+        self, queries: list[PoiQuery]
+    ) -> list[list[dict[str, Any]]]:
+        areas = [query.area() for query in queries]
+        pois = self.backend.get_pois_within(shapely.union_all(areas))
+        logger.debug(f"Found {len(pois)} POIs for a group of {len(queries)} areas")
+
+        # Assign POIs to the areas they are in; the tree avoids testing
+        # every POI against every area of the group
+        tree = shapely.STRtree(areas)
+        results: list[list[dict[str, Any]]] = [[] for _ in queries]
+        for poi in pois:
+            for i in sorted(tree.query(poi["coordinates"])):
+                query = queries[i]
+                local_shape = query.projection.to_local(poi["coordinates"])
+                if query.contains(local_shape):
+                    poi_copy = dict(poi)
+                    poi_copy["local_center"] = local_shape.centroid
+                    poi_copy["center"] = query.projection.to_wgs(
+                        poi_copy["local_center"]
+                    )
+                    results[i].append(poi_copy)
+        return results
+
+    def nearby_pois(self, queries: Sequence[PoiQuery]) -> list[list[dict[str, Any]]]:
+        """Return the POIs within each search area.
+
+        Every returned POI additionally contains its ``center`` (WGS84) and
+        ``local_center`` (in the projection of its search area).
+        """
+        groups = self.__group(queries)
+        logger.debug(
+            f"Looking up POIs for {len(queries)} areas in {len(groups)} groups"
+        )
+
+        results: list[list[dict[str, Any]]] = [[] for _ in queries]
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = [
+                executor.submit(
+                    self.__nearby_pois_for_group, [queries[i] for i in group]
+                )
+                for group in groups
+            ]
+            for group, future in zip(groups, futures, strict=True):
+                for i, pois in zip(group, future.result(), strict=True):
+                    results[i] = pois
+        return results
+
+    def administrative_hierarchy_strings(
+        self,
+        shapes: Sequence[BaseGeometry],
+        lang: str | None = None,
+        max_admin_levels: Sequence[int | None] | None = None,
+    ) -> list[str]:
+        """Look up administrative hierarchies for many shapes concurrently.
+
+        Identical requests are only looked up once.
+        """
+        if max_admin_levels is None:
+            max_admin_levels = [None] * len(shapes)
+        keys = [
+            (shape.wkt, level)
+            for shape, level in zip(shapes, max_admin_levels, strict=True)
+        ]
+        unique = dict(
+            zip(keys, zip(shapes, max_admin_levels, strict=True), strict=True)
+        )
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                key: executor.submit(
+                    self.backend.get_administrative_hierarchy_string,
+                    shape,
+                    lang,
+                    max_admin_level=level,
+                )
+                for key, (shape, level) in unique.items()
+            }
+            return [futures[key].result() for key in keys]
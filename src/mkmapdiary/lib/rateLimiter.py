@@ -0,0 +1,134 @@
+"""Per-host rate limiting of outgoing HTTP requests.
+
+Every host gets a token bucket: a request takes one token, and tokens refill
+at a fixed rate up to the bucket capacity. A request without a token reserves
+the next one and sleeps until it becomes available, so concurrent callers are
+served in order without holding a lock while sleeping. The time spent waiting
+is recorded per host.
+"""
+
+import dataclasses
+import threading
+import time
+from collections.abc import Callable
+from urllib.parse import urlsplit
+
+# Requests per second and burst size of known hosts; the Nominatim usage
+# policy allows at most one request per second.
+HOST_LIMITS: dict[str, tuple[float, int]] = {
+    "nominatim.openstreetmap.org": (1.0, 1),
+}
+
+
+class TokenBucket:
+    def __init__(
+        self,
+        rate: float,
+        capacity: int = 1,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        """Create a bucket refilling `rate` tokens per second up to `capacity`."""
+        assert rate > 0, "Rate must be positive"
+        assert capacity >= 1, "Capacity must be at least one"
+        self.rate = rate
+        self.capacity = capacity
+        self.__clock = clock
+        self.__tokens = float(capacity)
+        self.__updated = clock()
+        self.__lock = threading.Lock()
+
+    def reserve(self) -> float:
+        """Take a token and return the time in seconds until it is available.
+
+        Tokens may go negative; each reservation then waits for its own
+        refill, which keeps callers in order.
+        """
+        with self.__lock:
+            now = self.__clock()
+            self.__tokens = min(
+                self.capacity,
+                self.__tokens + (now - self.__updated) * self.rate,
+            )
+            self.__updated = now
+            self.__tokens -= 1
+            if self.__tokens >= 0:
+                return 0.0
+            return -self.__tokens / self.rate
+
+
+@dataclasses.dataclass
+class WaitStats:
+    requests: int = 0
+    delayed: int = 0
+    wait_time: float = 0.0
+    max_wait: float = 0.0
+
+
+class RateLimiter:
+    def __init__(
+        self,
+        limits: dict[str, tuple[float, int]] | None = None,
+        default: tuple[float, int] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        """Create a limiter.
+
+        Args:
+            limits: Rate (requests per second) and burst size per host.
+            default: Limit for hosts not listed; unlimited if None.
+            clock: Monotonic clock, replaceable for tests.
+            sleep: Sleep function, replaceable for tests.
+        """
+        self.limits = HOST_LIMITS if limits is None else limits
+        self.default = default
+        self.__clock = clock
+        self.__sleep = sleep
+        self.__buckets: dict[str, TokenBucket | None] = {}
+        self.__stats: dict[str, WaitStats] = {}
+        self.__lock = threading.Lock()
+
+    def __bucket(self, host: str) -> TokenBucket | None:
+        with self.__lock:
+            if host not in self.__buckets:
+                limit = self.limits.get(host, self.default)
+                self.__buckets[host] = (
+                    TokenBucket(*limit, clock=self.__clock) if limit else None
+                )
+                self.__stats[host] = WaitStats()
+            return self.__buckets[host]
+
+    def acquire(self, url: str) -> float:
+        """Wait until a request to the host of `url` may be sent.
+
+        Returns the time waited in seconds.
+        """
+        host = urlsplit(url).hostname or ""
+        bucket = self.__bucket(host)
+        wait = bucket.reserve() if bucket is not None else 0.0
+        if wait > 0:
+            self.__sleep(wait)
+
+        with self.__lock:
+            stats = self.__stats[host]
+            stats.requests += 1
+            if wait > 0:
+                stats.delayed += 1
+                stats.wait_time += wait
+                stats.max_wait = max(stats.max_wait, wait)
+        return wait
+
+    def stats(self) -> dict[str, WaitStats]:
+        """Copy of the wait statistics per host."""
+        with self.__lock:
+            return {
+                host: dataclasses.replace(stats) for host, stats in self.__stats.items()
+            }
+
+
+_limiter = RateLimiter()
+
+
+def get_limiter() -> RateLimiter:
+    """Process-wide shared limiter."""
+    return _limiter
@@ -0,0 +1,300 @@
+"""Offline reverse geocoding from OpenStreetMap extracts.
+
+A PBF extract is scanned once for named place nodes and administrative
+boundaries. The result is stored as a packed MessagePack file next to the
+extract; queries use a k-d tree for places and an R-tree for boundaries and
+need no network access. Results mimic the JSON returned by Nominatim.
+"""
+
+import logging
+import pathlib
+from collections.abc import Iterator
+from typing import Any
+
+import msgpack
+import numpy as np
+import osmium
+import shapely
+from shapely.geometry import Point, shape
+
+logger = logging.getLogger(__name__)
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = ".geocoder"
+
+# Place types, from most to least important
+PLACE_TYPES = (
+    "city",
+    "town",
+    "village",
+    "suburb",
+    "hamlet",
+    "neighbourhood",
+    "locality",
+)
+
+# Address keys used by Nominatim for admin levels
+ADMIN_LEVEL_KEYS = {
+    2: "country",
+    4: "state",
+    5: "region",
+    6: "county",
+    7: "municipality",
+    8: "city",
+    9: "city_district",
+    10: "suburb",
+}
+
+# Places further away than this are not considered part of the address
+MAX_PLACE_DISTANCE = 0.1  # degrees
+
+
+def _localized_names(tags: Any) -> dict[str, str]:
+    names = {}
+    for tag in tags:
+        if tag.k.startswith("name:"):
+            lang = tag.k[5:]
+            if len(lang) == 2 and lang.isalpha() and lang.islower() and tag.v:
+                names[lang] = tag.v
+    return names
+
+
+def _scan_places(pbf_path: pathlib.Path) -> Iterator[dict[str, Any]]:
+    processor = osmium.FileProcessor(str(pbf_path), osmium.osm.NODE)
+    processor.with_filter(osmium.filter.KeyFilter("place"))
+    processor.with_filter(osmium.filter.KeyFilter("name"))
+    for node in processor:
+        assert isinstance(node, osmium.osm.Node)
+        place = node.tags.get("place")
+        if place not in PLACE_TYPES or not node.location.valid():
+            continue
+        yield {
+            "lon": node.location.lon,
+            "lat": node.location.lat,
+            "name": node.tags.get("name"),
+            "type": place,
+            "names": _localized_names(node.tags),
+        }
+
+
+def _scan_boundaries(pbf_path: pathlib.Path) -> Iterator[dict[str, Any]]:
+    processor = osmium.FileProcessor(str(pbf_path))
+    processor.with_filter(osmium.filter.TagFilter(("boundary", "administrative")))
+    processor.with_filter(osmium.filter.KeyFilter("name"))
+    processor.with_filter(osmium.filter.KeyFilter("admin_level"))
+    processor.with_areas()
+    processor.with_filter(osmium.filter.GeoInterfaceFilter())
+    for obj in processor:
+        if not hasattr(obj, "__geo_interface__"):
+            continue  # Only areas have a polygon geometry
+        try:
+            admin_level = int(obj.tags["admin_level"])
+        except ValueError:
+            continue
+        geometry = shape(obj.__geo_interface__["geometry"])  # type: ignore[attr-defined]
+        yield {
+            "name": obj.tags.get("name"),
+            "admin_level": admin_level,
+            "names": _localized_names(obj.tags),
+            "wkb": shapely.to_wkb(geometry),
+        }
+
+
+def index_path_for(pbf_path: pathlib.Path) -> pathlib.Path:
+    """Path of the geocoder index belonging to an extract."""
+    return pbf_path.with_name(pbf_path.name.split(".")[0] + INDEX_SUFFIX)
+
+
+def build_index(pbf_path: pathlib.Path, index_path: pathlib.Path) -> None:
+    """Scan an extract and write the packed geocoder index."""
+    logger.debug(f"Building reverse geocoder index for {pbf_path}")
+    places = list(_scan_places(pbf_path))
+    boundaries = list(_scan_boundaries(pbf_path))
+
+    if boundaries:
+        bounds = shapely.total_bounds(
+            shapely.from_wkb([b["wkb"] for b in boundaries])
+        ).tolist()
+    elif places:
+        lons = [p["lon"] for p in places]
+        lats = [p["lat"] for p in places]
+        bounds = [min(lons), min(lats), max(lons), max(lats)]
+    else:
+        bounds = None
+
+    data = {
+        "version": INDEX_VERSION,
+        "source": pbf_path.name,
+        "bounds": bounds,
+        "places": {
+            "lon": np.array([p["lon"] for p in places], dtype=float).tobytes(),
+            "lat": np.array([p["lat"] for p in places], dtype=float).tobytes(),
+            "name": [p["name"] for p in places],
+            "type": [p["type"] for p in places],
+            "names": [p["names"] for p in places],
+        },
+        "boundaries": boundaries,
+    }
+
+    tmp_path = index_path.with_suffix(index_path.suffix + ".tmp")
+    with open(tmp_path, "wb") as f:
+        msgpack.pack(data, f)
+    tmp_path.replace(index_path)
+
+
+class ReverseGeocoder:
+    def __init__(self, index_path: pathlib.Path) -> None:
+        with open(index_path, "rb") as f:
+            data = msgpack.unpack(f)
+        if data.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported geocoder index version in {index_path}")
+
+        from scipy.spatial import cKDTree
+
+        self.bounds: list[float] | None = data["bounds"]
+
+        places = data["places"]
+        self.__place_lon = np.frombuffer(places["lon"], dtype=float)
+        self.__place_lat = np.frombuffer(places["lat"], dtype=float)
+        self.__place_name: list[str] = places["name"]
+        self.__place_type: list[str] = places["type"]
+        self.__place_names: list[dict[str, str]] = places["names"]
+        self.__place_tree = (
+            cKDTree(np.column_stack((self.__place_lon, self.__place_lat)))
+            if len(self.__place_lon)
+            else None
+        )
+        self.__place_lookup: dict[str, int] = {}
+        for i, name in sorted(
+            enumerate(self.__place_name),
+            key=lambda x: -PLACE_TYPES.index(self.__place_type[x[0]]),
+        ):
+            self.__place_lookup[name.casefold()] = i
+
+        self.__boundaries: list[dict[str, Any]] = data["boundaries"]
+        self.__boundary_shapes = shapely.from_wkb([b["wkb"] for b in self.__boundaries])
+        shapely.prepare(self.__boundary_shapes)
+        self.__boundary_tree = shapely.STRtree(self.__boundary_shapes)
+        # The top-level boundaries outline the area of the extract
+        self.__top_admin_level: int | None = min(
+            (b["admin_level"] for b in self.__boundaries), default=None
+        )
+
+    @classmethod
+    def open(cls, pbf_path: pathlib.Path) -> "ReverseGeocoder":
+        """Open the index of an extract, building it if missing or outdated."""
+        index_path = index_path_for(pbf_path)
+        if (
+            not index_path.exists()
+            or index_path.stat().st_mtime < pbf_path.stat().st_mtime
+        ):
+            build_index(pbf_path, index_path)
+        return cls(index_path)
+
+    def covers(self, lat: float, lon: float) -> bool:
+        """Whether the coordinate lies within the top-level boundaries of the extract.
+
+        Extracts without boundaries cover nothing, their area is unknown.
+        """
+        if self.bounds is None or self.__top_admin_level is None:
+            return False
+        west, south, east, north = self.bounds
+        if not (west <= lon <= east and south <= lat <= north):
+            return False
+        return any(
+            boundary["admin_level"] == self.__top_admin_level
+            for boundary in self.__boundaries_at(lon, lat)
+        )
+
+    @staticmethod
+    def __name(name: str, names: dict[str, str], lang: str | None) -> str:
+        return names.get(lang, name) if lang else name
+
+    def __boundaries_at(self, lon: float, lat: float) -> list[dict[str, Any]]:
+        point = Point(lon, lat)
+        indices = self.__boundary_tree.query(point, predicate="within")
+        return sorted(
+            (self.__boundaries[i] for i in indices),
+            key=lambda b: b["admin_level"],
+        )
+
+    def __nearest_place(self, lon: float, lat: float) -> int | None:
+        if self.__place_tree is None:
+            return None
+        distance, index = self.__place_tree.query(
+            [lon, lat], distance_upper_bound=MAX_PLACE_DISTANCE
+        )
+        if not np.isfinite(distance):
+            return None
+        return int(index)
+
+    def reverse(
+        self, lat: float, lon: float, zoom: int = 10, lang: str | None = None
+    ) -> dict[str, Any]:
+        """Reverse geocode a coordinate, similar to Nominatim's /reverse."""
+        if zoom <= 4:
+            max_admin_level = 2
+        elif zoom <= 7:
+            max_admin_level = 4
+        elif zoom <= 9:
+            max_admin_level = 6
+        else:
+            max_admin_level = 8
+
+        address: dict[str, str] = {}
+        parts: list[str] = []
+        for boundary in self.__boundaries_at(lon, lat):
+            if boundary["admin_level"] > max_admin_level:
+                continue
+            name = self.__name(boundary["name"], boundary["names"], lang)
+            key = ADMIN_LEVEL_KEYS.get(boundary["admin_level"])
+            if key is not None and key not in address:
+                address[key] = name
+            if name not in parts:
+                parts.insert(0, name)
+
+        if zoom >= 10:
+            place = self.__nearest_place(lon, lat)
+            if place is not None:
+                name = self.__name(
+                    self.__place_name[place], self.__place_names[place], lang
+                )
+                address.setdefault(self.__place_type[place], name)
+                if name not in parts:
+                    parts.insert(0, name)
+
+        if not parts:
+            return {"error": "Unable to geocode"}
+
+        return {
+            "lat": str(lat),
+            "lon": str(lon),
+            "name": parts[0],
+            "display_name": ", ".join(parts),
+            "address": address,
+        }
+
+    def search(self, query: str, limit: int = 1) -> list[dict[str, Any]]:
+        """Find places by name, similar to Nominatim's /search."""
+        index = self.__place_lookup.get(query.strip().casefold())
+        if index is None:
+            return []
+        lon = float(self.__place_lon[index])
+        lat = float(self.__place_lat[index])
+        result = self.reverse(lat, lon, zoom=10)
+        return [
+            {
+                "lat": str(lat),
+                "lon": str(lon),
+                "name": self.__place_name[index],
+                "type": self.__place_type[index],
+                "display_name": result.get("display_name", self.__place_name[index]),
+            }
+        ][:limit]
+
+
+def find_extracts(region_cache_dir: pathlib.Path) -> list[pathlib.Path]:
+    """OSM extracts available in the region cache directory."""
+    if not region_cache_dir.exists():
+        return []
+    return sorted(region_cache_dir.glob("*.pbf"))
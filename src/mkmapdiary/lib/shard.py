@@ -0,0 +1,207 @@
+"""Builds split into shards by date range.
+
+A shard is a build limited to a range of dates; shards are independent and
+can run on several machines sharing a file system. A shard writes the pages
+of its dates, their GPX and map data, and a manifest with its assets, but
+neither the index page nor the site. The merge command combines the build
+directories of the shards: it links their outputs into one build directory,
+combines the overview tracks and statistics, and builds the index page and
+the site.
+"""
+
+import dataclasses
+import json
+import logging
+import os
+import pathlib
+import pickle
+import shutil
+from typing import Any
+
+import gpxpy
+import gpxpy.gpx
+import numpy as np
+import whenever
+
+from mkmapdiary.lib.asset import AssetRecord
+from mkmapdiary.lib.statistics import Statistics
+from mkmapdiary.lib.trackLevels import write_track_levels
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_NAME = "shard.pickle"
+
+# Lines of the overview track of a shard, as written by the GPX stage
+OVERVIEW_LINES_NAME = "overview_lines.npz"
+
+
+@dataclasses.dataclass(frozen=True)
+class DateRange:
+    """Dates from start to end, both included."""
+
+    start: whenever.Date
+    end: whenever.Date
+
+    @classmethod
+    def parse(cls, value: str) -> "DateRange":
+        """Parse a range in the format ``START:END``, e.g. 2024-05-01:2024-05-31."""
+        try:
+            start, end = value.split(":")
+            date_range = cls(
+                whenever.Date.parse_iso(start), whenever.Date.parse_iso(end)
+            )
+        except ValueError as e:
+            raise ValueError(
+                f"Invalid date range '{value}', expected START:END with dates "
+                "in the format YYYY-MM-DD"
+            ) from e
+        if date_range.end < date_range.start:
+            raise ValueError(f"Invalid date range '{value}', end is before start")
+        return date_range
+
+    def __str__(self) -> str:
+        return f"{self.start}:{self.end}"
+
+    def __contains__(self, date: object) -> bool:
+        return isinstance(date, whenever.Date) and self.start <= date <= self.end
+
+    def may_contain(self, instant: whenever.Instant) -> bool:
+        """Whether an asset recorded at this time may be shown on a date of the range.
+
+        The date an asset is shown on depends on the local time at its
+        position, which is only known after the geo correlation. The UTC date
+        differs from it by one day at most.
+        """
+        date = instant.to_tz("UTC").date()
+        return self.start.subtract(days=1) <= date <= self.end.add(days=1)
+
+    def overlaps(self, other: "DateRange") -> bool:
+        return self.start <= other.end and other.start <= self.end
+
+
+@dataclasses.dataclass
+class ShardManifest:
+    """Assets and dates of a shard, written to its build directory.
+
+    The manifest is pickled; merge only build directories you created
+    yourself, with the same version of mkmapdiary.
+    """
+
+    date_range: DateRange
+    dates: list[whenever.Date]
+    assets: list[AssetRecord]
+
+    def save(self, build_dir: pathlib.Path) -> None:
+        with open(build_dir / MANIFEST_NAME, "wb") as f:
+            pickle.dump(self, f)
+
+    @classmethod
+    def load(cls, build_dir: pathlib.Path) -> "ShardManifest":
+        path = build_dir / MANIFEST_NAME
+        if not path.is_file():
+            raise ValueError(
+                f"'{build_dir}' is not the build directory of a shard; "
+                "build it with --shard and --build-dir"
+            )
+        with open(path, "rb") as f:
+            manifest = pickle.load(f)
+        assert isinstance(manifest, cls), f"Invalid shard manifest: {path}"
+        return manifest
+
+    def rebased_assets(
+        self, shard_dir: pathlib.Path, build_dir: pathlib.Path
+    ) -> list[AssetRecord]:
+        """Copies of the assets with their outputs moved to another build directory.
+
+        The ids are reset, as the ids of different shards overlap.
+        """
+        assets = []
+        for asset in self.assets:
+            path = asset.path
+            if path.is_relative_to(shard_dir):
+                path = build_dir / path.relative_to(shard_dir)
+            assets.append(dataclasses.replace(asset, id=None, path=path))
+        return assets
+
+
+def link_tree(
+    source: pathlib.Path,
+    destination: pathlib.Path,
+    exclude: tuple[str, ...] = (),
+) -> int:
+    """Hard link all files below source into destination; returns their number.
+
+    Files are copied if they cannot be linked, e.g. on another file system.
+    Files matching one of the exclude patterns (relative to source) are
+    skipped; the merge writes them itself, and writing into a linked file
+    would change the file of the shard.
+    """
+    count = 0
+    for path in sorted(source.rglob("*")):
+        relative = path.relative_to(source)
+        if path.is_dir() or any(relative.match(pattern) for pattern in exclude):
+            continue
+        target = destination / relative
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.unlink(missing_ok=True)
+        try:
+            os.link(path, target)
+        except OSError:
+            shutil.copy2(path, target)
+        count += 1
+    return count
+
+
+def merge_overviews(
+    files_dirs: list[pathlib.Path], assets_dir: pathlib.Path
+) -> dict[str, Any]:
+    """Combine the overviews of the shards into the overview of all dates.
+
+    Writes the track levels of the combined overview track to the assets
+    directory and returns the overview in the format of the GPX stage.
+    """
+    lines: list[np.ndarray] = []
+    statistics = Statistics()
+    gpx_out = gpxpy.gpx.GPX()
+    starts: list[whenever.Instant] = []
+    ends: list[whenever.Instant] = []
+
+    for files_dir in files_dirs:
+        overview_path = files_dir / "overview.json"
+        if not overview_path.is_file():
+            continue
+        with open(overview_path, encoding="utf-8") as f:
+            overview = json.load(f)
+        with np.load(files_dir / OVERVIEW_LINES_NAME) as data:
+            lines.extend(data[name] for name in data.files)
+        gpx = gpxpy.parse(overview["gpx_data"])
+        gpx_out.waypoints.extend(gpx.waypoints)
+        gpx_out.routes.extend(gpx.routes)
+        statistics.add(Statistics.from_dict(overview["statistics"]))
+        if overview["start"] is not None:
+            starts.append(whenever.Instant.parse_iso(overview["start"]))
+        if overview["end"] is not None:
+            ends.append(whenever.Instant.parse_iso(overview["end"]))
+
+    start = min(starts) if starts else None
+    end = max(ends) if ends else None
+    if start is not None and end is not None:
+        statistics.total_time = (end - start).in_seconds()
+
+    overview_data = write_track_levels(lines, assets_dir, "index")
+    overview_data["gpx_data"] = gpx_out.to_xml()
+    overview_data["statistics"] = statistics.to_dict()
+    overview_data["start"] = start and start.format_iso()
+    overview_data["end"] = end and end.format_iso()
+    return overview_data
+
+
+def merge_statistics(files_dirs: list[pathlib.Path]) -> dict[str, Any]:
+    """Combine the track statistics per date of the shards."""
+    statistics: dict[str, Any] = {}
+    for files_dir in files_dirs:
+        path = files_dir / "statistics.json"
+        if path.is_file():
+            with open(path, encoding="utf-8") as f:
+                statistics.update(json.load(f))
+    return statistics
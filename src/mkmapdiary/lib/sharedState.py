@@ -0,0 +1,343 @@
+"""Asset state shared between the processes of a build.
+
+In the process-parallel mode, doit runs the task actions in forked worker
+processes. Every worker starts with a copy of the asset registry, so changes
+of the assets made by an action would only be visible in that worker. Actions
+updating assets therefore record their changes as a delta in an SQLite
+database in the build directory:
+
+- The main process merges the deltas of a task into its registry as soon as
+  the task succeeded, i.e. before it creates the tasks depending on it.
+- Before running an action, a worker applies the deltas of the other workers
+  it has not seen yet.
+
+A delta holds the changed fields of existing assets, added assets and the ids
+of removed assets. Fields are compared by value, so actions may change asset
+records in place or replace them in the registry.
+"""
+
+import contextlib
+import dataclasses
+import functools
+import multiprocessing
+import os
+import pathlib
+import pickle
+import sqlite3
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any
+
+from mkmapdiary.lib.asset import AssetRecord
+from mkmapdiary.lib.assetRegistry import AssetRegistry
+from mkmapdiary.util.log import current_task
+
+
+@dataclasses.dataclass
+class AssetDelta:
+    added: list[AssetRecord] = dataclasses.field(default_factory=list)
+    updated: dict[int, dict[str, Any]] = dataclasses.field(default_factory=dict)
+    removed: list[int] = dataclasses.field(default_factory=list)
+    has_display_date: bool | None = None
+
+    def __bool__(self) -> bool:
+        return bool(
+            self.added
+            or self.updated
+            or self.removed
+            or self.has_display_date is not None
+        )
+
+    def apply(self, registry: AssetRegistry) -> None:
+        with registry.lock:
+            registry.remove_assets(self.removed)
+            assets = {asset.id: asset for asset in registry.assets}
+            for asset_id, fields in self.updated.items():
+                asset = assets.get(asset_id)
+                if asset is None:
+                    # Removed by another task in the meantime
+                    continue
+                for name, value in fields.items():
+                    setattr(asset, name, value)
+            for asset in self.added:
+                registry.restore_asset(asset)
+            if self.has_display_date is not None:
+                registry.has_display_date = self.has_display_date
+
+
+class AssetSnapshot:
+    """State of assets before an action, to determine the changes of the action.
+
+    Without asset ids, all assets are compared and added and removed assets
+    are detected as well.
+    """
+
+    def __init__(
+        self, registry: AssetRegistry, asset_ids: Iterable[int] | None = None
+    ) -> None:
+        self.__registry = registry
+        with registry.lock:
+            if asset_ids is None:
+                assets = registry.assets
+                self.__ids: set[int] | None = {_id(asset) for asset in assets}
+            else:
+                assets = [
+                    asset
+                    for asset in map(registry.get_asset_by_id, asset_ids)
+                    if asset is not None
+                ]
+                self.__ids = None
+            self.__state = {_id(asset): pickle.dumps(vars(asset)) for asset in assets}
+            self.__has_display_date = registry.has_display_date
+
+    def delta(self) -> AssetDelta:
+        registry = self.__registry
+        delta = AssetDelta()
+        with registry.lock:
+            current: dict[int, AssetRecord | None]
+            if self.__ids is None:
+                current = {
+                    asset_id: registry.get_asset_by_id(asset_id)
+                    for asset_id in self.__state
+                }
+            else:
+                assets = registry.assets
+                current = {_id(asset): asset for asset in assets}
+                delta.added = [
+                    asset for asset in assets if _id(asset) not in self.__ids
+                ]
+                delta.removed = sorted(self.__ids - current.keys())
+
+            for asset_id, state in self.__state.items():
+                asset = current.get(asset_id)
+                if asset is None or pickle.dumps(vars(asset)) == state:
+                    continue
+                before = pickle.loads(state)
+                fields = {
+                    name: value
+                    for name, value in vars(asset).items()
+                    if pickle.dumps(value) != pickle.dumps(before.get(name))
+                }
+                if fields:
+                    delta.updated[asset_id] = fields
+
+            if registry.has_display_date != self.__has_display_date:
+                delta.has_display_date = registry.has_display_date
+        return delta
+
+
+def _id(asset: AssetRecord) -> int:
+    assert asset.id is not None, "Asset must have an ID"
+    return asset.id
+
+
+class SharedState:
+    """Deltas of the tasks of a build, stored in an SQLite database.
+
+    Every process uses its own connection, which is opened on first use
+    after a fork. ``processes`` is the number of worker processes, which
+    share the resources of the machine.
+    """
+
+    def __init__(self, path: pathlib.Path, processes: int = 1) -> None:
+        self.path = path
+        self.processes = processes
+        # Process running doit; actions only run elsewhere in worker processes
+        self.owner = os.getpid()
+        self.__conn: sqlite3.Connection | None = None
+        self.__pid: int | None = None
+        self.__seen = 0
+
+    def __connection(self) -> sqlite3.Connection:
+        pid = os.getpid()
+        if self.__conn is None or self.__pid != pid:
+            # Connections must not be used across a fork; the inherited one
+            # belongs to the parent process
+            self.__conn = sqlite3.connect(self.path, timeout=60)
+            self.__conn.execute("PRAGMA journal_mode=WAL")
+            self.__conn.execute("PRAGMA synchronous=OFF")
+            self.__conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS deltas (
+                    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                    task TEXT NOT NULL,
+                    pid INTEGER NOT NULL,
+                    delta BLOB NOT NULL
+                )
+                """
+            )
+            self.__conn.execute(
+                "CREATE INDEX IF NOT EXISTS deltas_task ON deltas (task)"
+            )
+            self.__conn.commit()
+            self.__pid = pid
+            self.__seen = 0
+        return self.__conn
+
+    @property
+    def is_worker(self) -> bool:
+        return os.getpid() != self.owner
+
+    def reset(self) -> None:
+        """Remove the deltas of a previous run; call before starting workers."""
+        conn = self.__connection()
+        conn.execute("DELETE FROM deltas")
+        conn.commit()
+        # Do not pass an open connection to the workers
+        conn.close()
+        self.__conn = None
+
+    def publish(self, task: str, delta: AssetDelta) -> None:
+        conn = self.__connection()
+        conn.execute(
+            "INSERT INTO deltas (task, pid, delta) VALUES (?, ?, ?)",
+            (task, os.getpid(), pickle.dumps(delta)),
+        )
+        conn.commit()
+
+    def merge(self, task: str, registry: AssetRegistry) -> int:
+        """Apply the deltas of a finished task; returns their number."""
+        rows = (
+            self.__connection()
+            .execute("SELECT delta FROM deltas WHERE task = ? ORDER BY seq", (task,))
+            .fetchall()
+        )
+        for (data,) in rows:
+            pickle.loads(data).apply(registry)
+        return len(rows)
+
+    def sync(self, registry: AssetRegistry) -> None:
+        """Apply the deltas of other processes not seen yet."""
+        conn = self.__connection()
+        rows = conn.execute(
+            "SELECT seq, delta FROM deltas WHERE seq > ? AND pid != ? ORDER BY seq",
+            (self.__seen, os.getpid()),
+        ).fetchall()
+        for seq, data in rows:
+            pickle.loads(data).apply(registry)
+            self.__seen = seq
+
+
+class SharedAction:
+    """Python action of a task, running in a worker process.
+
+    The action sees the assets as updated by the tasks finished before and,
+    if it updates assets, publishes its changes. It can be pickled if the
+    wrapped callable and its arguments can, which is required for tasks
+    created after the workers were started (``create_after``).
+    """
+
+    def __init__(
+        self,
+        owner: Any,
+        task: str,
+        action: Callable[..., Any],
+        args: Iterable[Any] = (),
+        kwargs: dict[str, Any] | None = None,
+        updates_assets: bool | Iterable[int] = False,
+    ) -> None:
+        """Wrap an action.
+
+        Args:
+            owner: Task list with the ``db`` and ``shared_state`` properties.
+            task: Name of the task, under which the changes are published.
+            action: The wrapped callable.
+            args: Positional arguments of the callable.
+            kwargs: Keyword arguments of the callable.
+            updates_assets: Whether the action updates assets: True for any
+                assets, or the ids of the assets it updates.
+        """
+        self.owner = owner
+        self.task = task
+        self.action = action
+        self.args = tuple(args)
+        self.kwargs = kwargs or {}
+        self.updates_assets = (
+            updates_assets if isinstance(updates_assets, bool) else list(updates_assets)
+        )
+
+    def __call__(self) -> Any:
+        state: SharedState | None = self.owner.shared_state
+        if state is None or not state.is_worker:
+            return self.action(*self.args, **self.kwargs)
+
+        current_task.set(self.task)
+        registry = self.owner.db
+        state.sync(registry)
+        if not self.updates_assets:
+            return self.action(*self.args, **self.kwargs)
+
+        snapshot = AssetSnapshot(
+            registry, None if self.updates_assets is True else self.updates_assets
+        )
+        result = self.action(*self.args, **self.kwargs)
+        delta = snapshot.delta()
+        if delta:
+            state.publish(self.task, delta)
+        return result
+
+
+def share_creator(
+    owner: Any, name: str, creator: Callable[..., Any]
+) -> Callable[..., Any]:
+    """Wrap the python actions of the tasks of a doit task creator.
+
+    Tasks declare the assets their actions update with the ``updates_assets``
+    entry of their ``meta`` dictionary (see :class:`SharedAction`).
+    """
+    basename = name.removeprefix("task_")
+
+    def _share(task: dict[str, Any]) -> dict[str, Any]:
+        if not task.get("actions"):
+            return task
+        task_name = task.get("basename", basename)
+        if "name" in task:
+            task_name += f":{task['name']}"
+        updates_assets = (task.get("meta") or {}).get("updates_assets", False)
+        actions = []
+        for action in task["actions"]:
+            if callable(action):
+                action = (action,)
+            if isinstance(action, tuple) and callable(action[0]):
+                action = SharedAction(
+                    owner,
+                    task_name,
+                    action[0],
+                    args=action[1] if len(action) > 1 else (),
+                    kwargs=action[2] if len(action) > 2 else None,
+                    updates_assets=updates_assets,
+                )
+            actions.append(action)
+        return {**task, "actions": actions}
+
+    @functools.wraps(creator)
+    def _creator(*args: Any, **kwargs: Any) -> Any:
+        result = creator(*args, **kwargs)
+        if isinstance(result, dict):
+            return _share(result)
+        if isinstance(result, Iterator):
+            return (_share(task) for task in result)
+        return result
+
+    return _creator
+
+
+@contextlib.contextmanager
+def fork_workers() -> Iterator[None]:
+    """Let doit start its worker processes with fork.
+
+    doit uses the default start method and cannot be given a context, so its
+    process and queue classes are replaced by those of a fork context while
+    the context manager is active. The default start method stays unchanged.
+    """
+    import doit.runner
+
+    context = multiprocessing.get_context("fork")
+    runner = doit.runner.MRunner
+    saved = (doit.runner.Process, runner.__dict__["Child"], runner.__dict__["Queue"])
+    doit.runner.Process = context.Process
+    runner.Child = staticmethod(context.Process)
+    runner.Queue = staticmethod(context.Queue)
+    try:
+        yield
+    finally:
+        doit.runner.Process, runner.Child, runner.Queue = saved
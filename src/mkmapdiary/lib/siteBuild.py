@@ -0,0 +1,361 @@
+"""Incremental build of the static site.
+
+A clean mkdocs build renders every page and copies every asset again, although
+usually only a few days of a trip have changed. The incremental build runs
+mkdocs in its dirty mode, but decides what to render from a manifest of the
+previous build instead of file times:
+
+* A page is rendered if its markdown or any snippet it includes has changed.
+* All pages are rendered if the mkdocs configuration, the installed versions
+  or the navigation (pages and their titles) have changed.
+* Static files are hard-linked into the site directory, with a reflink or a
+  copy as fallback; files already in place are kept.
+* Outputs of the previous build that are no longer produced are removed,
+  other files in the site directory are left alone.
+* Search index entries of pages that are not rendered are carried over from
+  the previous search index.
+"""
+
+import dataclasses
+import hashlib
+import importlib.metadata
+import json
+import logging
+import os
+import pathlib
+import re
+import shutil
+from collections.abc import Iterable
+from typing import Any
+
+import jinja2
+import mkdocs.commands.build
+import mkdocs.config
+from mkdocs.config.defaults import MkDocsConfig
+from mkdocs.plugins import BasePlugin, event_priority
+from mkdocs.structure.files import File, Files
+from mkdocs.utils import get_markdown_title
+
+from .fingerprint import fingerprint
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_VERSION = 1
+PLUGIN_NAME = "mkmapdiary/incremental"
+VERSIONED_PACKAGES = ("mkmapdiary", "mkdocs", "mkdocs-material", "mkdocs-glightbox")
+
+# pymdownx.snippets: single line and block syntax
+SNIPPET_LINE = re.compile(r"""^\s*-{1,}8<-{1,}\s+(["'])(?P<path>.+?)\1\s*$""")
+SNIPPET_BLOCK = re.compile(r"^\s*-{1,}8<-{1,}\s*$")
+LINE_SELECTION = re.compile(r"(:\d*)+$")
+
+# Linux ioctl cloning a file on copy-on-write file systems
+FICLONE = 0x40049409
+
+
+@dataclasses.dataclass
+class SiteBuildStats:
+    pages: int = 0
+    rendered: int = 0
+    linked: int = 0
+    removed: int = 0
+
+
+def snippet_paths(markdown: str) -> list[str]:
+    """Files included by pymdownx.snippets, without line selections."""
+    paths = []
+    in_block = False
+    for line in markdown.splitlines():
+        if SNIPPET_BLOCK.match(line):
+            in_block = not in_block
+            continue
+        if in_block:
+            path = line.strip()
+        else:
+            match = SNIPPET_LINE.match(line)
+            if match is None:
+                continue
+            path = match["path"]
+        # Escaped or empty lines are not included
+        if path and not path.startswith(";"):
+            paths.append(LINE_SELECTION.sub("", path))
+    return paths
+
+
+def page_digest(path: pathlib.Path, base_paths: Iterable[pathlib.Path]) -> str:
+    """Digest of a page and all snippets it includes, recursively."""
+    base_paths = list(base_paths)
+    digest = hashlib.sha256()
+    seen: set[pathlib.Path] = set()
+    pending = [path]
+    while pending:
+        current = pending.pop()
+        if current in seen:
+            continue
+        seen.add(current)
+        digest.update(str(current).encode())
+        try:
+            data = current.read_bytes()
+        except OSError:
+            digest.update(b"missing")
+            continue
+        digest.update(hashlib.sha256(data).digest())
+
+        for snippet in snippet_paths(data.decode(errors="replace")):
+            for base_path in base_paths:
+                candidate = base_path / snippet
+                if candidate.is_file():
+                    pending.append(candidate)
+                    break
+            else:
+                digest.update(f"missing snippet {snippet}".encode())
+    return digest.hexdigest()
+
+
+def _reflink(source: pathlib.Path, target: pathlib.Path) -> bool:
+    try:
+        import fcntl
+    except ImportError:
+        return False
+    try:
+        with open(source, "rb") as src, open(target, "wb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+    except OSError:
+        target.unlink(missing_ok=True)
+        return False
+    shutil.copystat(source, target)
+    return True
+
+
+def link_file(source: pathlib.Path, target: pathlib.Path) -> bool:
+    """Place a file at the target, sharing its data with the source if possible.
+
+    Hard links are tried first, then copy-on-write clones, then a plain copy.
+
+    Returns:
+        True if the target was updated, False if it was already in place.
+    """
+    if target.exists():
+        source_stat = source.stat()
+        target_stat = target.stat()
+        if os.path.samestat(source_stat, target_stat) or (
+            source_stat.st_size == target_stat.st_size
+            and source_stat.st_mtime_ns == target_stat.st_mtime_ns
+        ):
+            return False
+        target.unlink()
+
+    target.parent.mkdir(parents=True, exist_ok=True)
+    try:
+        os.link(source, target)
+        return True
+    except OSError:
+        pass
+    if not _reflink(source, target):
+        shutil.copy2(source, target)
+    return True
+
+
+def _versions() -> dict[str, str | None]:
+    versions: dict[str, str | None] = {}
+    for package in VERSIONED_PACKAGES:
+        try:
+            versions[package] = importlib.metadata.version(package)
+        except importlib.metadata.PackageNotFoundError:
+            versions[package] = None
+    return versions
+
+
+def _snippet_base_paths(config: MkDocsConfig) -> list[pathlib.Path]:
+    options = config.mdx_configs.get("pymdownx.snippets", {})
+    base_paths = options.get("base_path", ["."])
+    if isinstance(base_paths, (str, os.PathLike)):
+        base_paths = [base_paths]
+    return [pathlib.Path(base_path) for base_path in base_paths]
+
+
+def _set_modified(file: File, modified: bool) -> None:
+    # mkdocs decides by file times in dirty mode; the manifest decides here
+    file.is_modified = lambda: modified  # type: ignore[method-assign]
+
+
+class _DirtyWarningFilter(logging.Filter):
+    def filter(self, record: logging.LogRecord) -> bool:
+        # The warning would abort the build in strict mode
+        return not record.getMessage().startswith("A 'dirty' build")
+
+
+class IncrementalBuildPlugin(BasePlugin):
+    def __init__(self, config_file: pathlib.Path, manifest: dict[str, Any]) -> None:
+        """Create the plugin.
+
+        Args:
+            config_file: mkdocs configuration of the site.
+            manifest: Manifest of the previous build, empty for a full build.
+        """
+        super().__init__()
+        self.__config_file = config_file
+        self.__previous = manifest
+        self.site = ""
+        self.pages: dict[str, str] = {}
+        self.titles: dict[str, str | None] = {}
+        self.outputs: set[str] = set()
+        self.stats = SiteBuildStats()
+        self.__unchanged: list[File] = []
+        self.__files = Files([])
+
+    def on_files(self, files: Files, /, *, config: MkDocsConfig) -> Files:
+        self.__files = files
+        base_paths = _snippet_base_paths(config)
+
+        pages = []
+        titles = []
+        for file in files.documentation_pages():
+            assert file.abs_src_path is not None
+            path = pathlib.Path(file.abs_src_path)
+            self.pages[file.src_uri] = page_digest(path, base_paths)
+            pages.append(file)
+            titles.append((file.src_uri, get_markdown_title(file.content_string)))
+
+        # Every page contains the navigation and depends on the configuration
+        self.site = fingerprint(
+            MANIFEST_VERSION,
+            self.__config_file.read_text(),
+            _versions(),
+            sorted(titles),
+        )
+        full_build = self.site != self.__previous.get("site")
+        if full_build:
+            logger.debug(
+                "Site configuration or navigation changed, rendering all pages"
+            )
+        previous_pages = self.__previous.get("pages", {})
+        for file in pages:
+            modified = (
+                full_build
+                or previous_pages.get(file.src_uri) != self.pages[file.src_uri]
+                or not os.path.exists(file.abs_dest_path)
+            )
+            _set_modified(file, modified)
+            if not modified:
+                self.__unchanged.append(file)
+        self.stats.pages = len(pages)
+        self.stats.rendered = len(pages) - len(self.__unchanged)
+
+        for file in files:
+            if not file.inclusion.is_included():
+                continue
+            self.outputs.add(file.dest_uri)
+            if file.is_documentation_page() or file.abs_src_path is None:
+                continue
+            # Generated files have no source to link to
+            if file.generated_by is not None:
+                continue
+            if link_file(
+                pathlib.Path(file.abs_src_path), pathlib.Path(file.abs_dest_path)
+            ):
+                self.stats.linked += 1
+            _set_modified(file, False)
+        return files
+
+    def on_env(
+        self, env: jinja2.Environment, /, *, config: MkDocsConfig, files: Files
+    ) -> None:
+        # Pages that are not rendered are not read either; the navigation of
+        # the rendered pages still needs their titles.
+        titles = self.__previous.get("titles", {})
+        for file in self.__unchanged:
+            assert file.page is not None
+            file.page._title_from_render = titles.get(file.src_uri)
+
+    @event_priority(100)
+    def on_post_build(self, *, config: MkDocsConfig) -> None:
+        for file in self.__files.documentation_pages():
+            self.titles[file.src_uri] = file.page.title if file.page else None
+
+        # Carry over the search index entries of pages that were not rendered
+        search_index = next(
+            (
+                plugin.search_index
+                for plugin in config.plugins.values()
+                if hasattr(plugin, "search_index")
+            ),
+            None,
+        )
+        index_path = pathlib.Path(config.site_dir) / "search" / "search_index.json"
+        if search_index is None or not self.__unchanged or not index_path.exists():
+            return
+        urls = {file.url for file in self.__unchanged}
+        previous_entries = json.loads(index_path.read_text())["docs"]
+        # material names the list "entries", the mkdocs search plugin "_entries"
+        entries = getattr(search_index, "entries", None)
+        if entries is None:
+            entries = search_index._entries
+        entries.extend(
+            entry
+            for entry in previous_entries
+            if entry["location"].split("#")[0] in urls
+        )
+
+
+def remove_stale(site_dir: pathlib.Path, stale: Iterable[str]) -> int:
+    """Remove outputs and the directories left empty by them."""
+    removed = 0
+    for uri in stale:
+        path = site_dir / uri
+        if not path.is_file():
+            continue
+        path.unlink()
+        removed += 1
+        parent = path.parent
+        while parent != site_dir and not any(parent.iterdir()):
+            parent.rmdir()
+            parent = parent.parent
+    return removed
+
+
+def build_site(
+    config_file: pathlib.Path, manifest_file: pathlib.Path
+) -> SiteBuildStats:
+    """Build the site incrementally.
+
+    Args:
+        config_file: mkdocs configuration of the site.
+        manifest_file: Manifest of the previous build; updated after a
+            successful build.
+    """
+    try:
+        manifest = json.loads(manifest_file.read_text())
+    except (OSError, ValueError):
+        manifest = {}
+    config = mkdocs.config.load_config(config_file=str(config_file))
+    site_dir = pathlib.Path(config.site_dir)
+    if manifest.get("version") != MANIFEST_VERSION or not site_dir.exists():
+        manifest = {}
+
+    plugin = IncrementalBuildPlugin(config_file, manifest)
+    config.plugins[PLUGIN_NAME] = plugin
+
+    build_logger = logging.getLogger(mkdocs.commands.build.__name__)
+    dirty_filter = _DirtyWarningFilter()
+    build_logger.addFilter(dirty_filter)
+    try:
+        mkdocs.commands.build.build(config, dirty=True)
+    finally:
+        build_logger.removeFilter(dirty_filter)
+
+    plugin.stats.removed = remove_stale(
+        site_dir, set(manifest.get("outputs", [])) - plugin.outputs
+    )
+    manifest_file.write_text(
+        json.dumps(
+            {
+                "version": MANIFEST_VERSION,
+                "site": plugin.site,
+                "pages": plugin.pages,
+                "titles": plugin.titles,
+                "outputs": sorted(plugin.outputs),
+            }
+        )
+    )
+    return plugin.stats
@@ -0,0 +1,103 @@
+"""Polling for changes of the source directory.
+
+Polling needs no platform specific notification API and works on network and
+removable drives. Hidden files and editor backups are ignored, as editors
+create and remove them while saving.
+"""
+
+import dataclasses
+import os
+import pathlib
+import time
+from collections.abc import Callable
+
+Snapshot = dict[pathlib.Path, tuple[int, int]]
+
+
+@dataclasses.dataclass
+class SourceChanges:
+    added: list[pathlib.Path] = dataclasses.field(default_factory=list)
+    modified: list[pathlib.Path] = dataclasses.field(default_factory=list)
+    removed: list[pathlib.Path] = dataclasses.field(default_factory=list)
+
+    def __bool__(self) -> bool:
+        return bool(self.added or self.modified or self.removed)
+
+    @property
+    def changed(self) -> list[pathlib.Path]:
+        return self.added + self.modified
+
+    @property
+    def paths(self) -> list[pathlib.Path]:
+        return self.added + self.modified + self.removed
+
+
+def _ignored(name: str) -> bool:
+    return name.startswith(".") or name.endswith("~")
+
+
+def snapshot(root: pathlib.Path) -> Snapshot:
+    """Modification time and size of all files below the root."""
+    files: Snapshot = {}
+    for directory, dirnames, filenames in os.walk(root, followlinks=True):
+        dirnames[:] = [name for name in dirnames if not _ignored(name)]
+        for name in filenames:
+            if _ignored(name):
+                continue
+            path = pathlib.Path(directory) / name
+            try:
+                stat = path.stat()
+            except OSError:
+                # Removed while walking
+                continue
+            files[path] = (stat.st_mtime_ns, stat.st_size)
+    return files
+
+
+def compare(old: Snapshot, new: Snapshot) -> SourceChanges:
+    return SourceChanges(
+        added=sorted(new.keys() - old.keys()),
+        modified=sorted(
+            path for path in new.keys() & old.keys() if old[path] != new[path]
+        ),
+        removed=sorted(old.keys() - new.keys()),
+    )
+
+
+class SourceWatcher:
+    def __init__(
+        self,
+        root: pathlib.Path,
+        interval: float = 1.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.__root = root
+        self.__interval = interval
+        self.__sleep = sleep
+        self.__snapshot = snapshot(root)
+
+    def poll(self) -> SourceChanges:
+        """Changes since the previous poll."""
+        current = snapshot(self.__root)
+        changes = compare(self.__snapshot, current)
+        self.__snapshot = current
+        return changes
+
+    def wait(self) -> SourceChanges:
+        """Wait for changes and until the source directory is quiet again.
+
+        Copying many files or saving a file in several steps results in a
+        single set of changes.
+        """
+        while True:
+            start = self.__snapshot
+            while not self.poll():
+                self.__sleep(self.__interval)
+            while True:
+                self.__sleep(self.__interval)
+                if not self.poll():
+                    break
+            # Files created and removed again in the meantime are no change
+            changes = compare(start, self.__snapshot)
+            if changes:
+                return changes
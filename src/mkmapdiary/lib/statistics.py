@@ -1,11 +1,26 @@
 import logging
+import math
 
-import numpy as np
 import whenever
-from sklearn.metrics.pairwise import haversine_distances
 
 logger = logging.getLogger(__name__)
 
+EARTH_RADIUS = 6371000  # meters
+
+
+def _haversine(pos1: tuple[float, float], pos2: tuple[float, float]) -> float:
+    """Great-circle distance in meters between two (lon, lat) positions.
+
+    Computed with scalar math, as it runs once per track point.
+    """
+    lon1, lat1 = math.radians(pos1[0]), math.radians(pos1[1])
+    lon2, lat2 = math.radians(pos2[0]), math.radians(pos2[1])
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return EARTH_RADIUS * 2 * math.asin(math.sqrt(a))
+
 
 class Statistics:
     THRESHOLDS = {
@@ -26,6 +41,32 @@ class Statistics:
         self.__position: tuple[float, float] | None = None
         self.__elevation: float | None = None
 
+    def to_dict(self) -> dict[str, float]:
+        return {
+            "time_moving": self.time_moving,
+            "total_time": self.total_time,
+            "distance": self.distance,
+            "elevation_gain": self.elevation_gain,
+            "elevation_loss": self.elevation_loss,
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict[str, float]) -> "Statistics":
+        statistics = cls()
+        statistics.time_moving = data["time_moving"]
+        statistics.total_time = data["total_time"]
+        statistics.distance = data["distance"]
+        statistics.elevation_gain = data["elevation_gain"]
+        statistics.elevation_loss = data["elevation_loss"]
+        return statistics
+
+    def add(self, other: "Statistics") -> None:
+        """Add the distances and times of another track; total_time is not added."""
+        self.distance += other.distance
+        self.elevation_gain += other.elevation_gain
+        self.elevation_loss += other.elevation_loss
+        self.time_moving += other.time_moving
+
     def reset(self) -> None:
         self.__time = None
         # Don't reset __first_time to maintain accurate total_time calculation
@@ -87,14 +128,7 @@ class Statistics:
         assert self.__position is not None
 
         time_delta = (time - self.__time).in_seconds()
-        # calculate distance using haversine
-        distance = 0.0
-        # Convert from interface format (lon, lat) to haversine format (lat, lon)
-        pos1 = np.radians(np.array([[self.__position[1], self.__position[0]]]))
-        pos2 = np.radians(np.array([[position[1], position[0]]]))
-        distance = (
-            haversine_distances(pos1, pos2)[0][0] * 6371000
-        )  # radius of Earth in meters
+        distance = _haversine(self.__position, position)
 
         speed = distance / time_delta if time_delta > 0 else 0.0
 
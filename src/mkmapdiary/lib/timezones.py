@@ -0,0 +1,142 @@
+"""Timezone lookup for coordinates, memoized on a coarse grid.
+
+Most assets of a trip are only a few metres apart, so looking up the timezone
+for every single one with tzfpy is wasteful. The resolver divides the world
+into grid cells; a cell whose sample points, and those of its eight
+neighbours, all lie in the same timezone is resolved once and cached. A zone
+border crossing a cell between its sample points shows up in the samples of
+a neighbouring cell. Cells near a border fall back to an exact lookup per
+coordinate.
+"""
+
+import threading
+from collections.abc import Iterable, Sequence
+
+import numpy as np
+import tzfpy
+import whenever
+
+# Sample points per cell axis used to detect zone borders
+SAMPLES = 3
+
+
+class TimezoneResolver:
+    def __init__(self, cell_size: float = 0.05) -> None:
+        """Create a resolver with the given grid cell size in degrees."""
+        self.cell_size = cell_size
+        self.__samples: dict[tuple[int, int], str | None] = {}
+        self.__cells: dict[tuple[int, int], str | None] = {}
+        self.__exact: dict[tuple[float, float], str] = {}
+        self.__lock = threading.Lock()
+
+    def __cell(self, lon: float, lat: float) -> tuple[int, int]:
+        return (
+            int(np.floor(lon / self.cell_size)),
+            int(np.floor(lat / self.cell_size)),
+        )
+
+    def __sample_cell(self, cell: tuple[int, int]) -> str | None:
+        """Timezone of all sample points of a cell, or None if they differ."""
+        with self.__lock:
+            if cell in self.__samples:
+                return self.__samples[cell]
+
+        offsets = np.linspace(0, self.cell_size, SAMPLES)
+        lon0, lat0 = cell[0] * self.cell_size, cell[1] * self.cell_size
+        zones = {
+            tzfpy.get_tz(
+                lng=float(np.clip(lon0 + dx, -180, 180)),
+                lat=float(np.clip(lat0 + dy, -90, 90)),
+            )
+            for dx in offsets
+            for dy in offsets
+        }
+        tz = zones.pop() if len(zones) == 1 else None
+
+        with self.__lock:
+            self.__samples[cell] = tz
+        return tz
+
+    def __resolve_cell(self, cell: tuple[int, int]) -> str | None:
+        """Timezone of a cell, or None if the cell may lie near a zone border."""
+        with self.__lock:
+            if cell in self.__cells:
+                return self.__cells[cell]
+
+        tz = self.__sample_cell(cell)
+        if tz is not None and any(
+            self.__sample_cell((cell[0] + dx, cell[1] + dy)) != tz
+            for dx in (-1, 0, 1)
+            for dy in (-1, 0, 1)
+            if dx or dy
+        ):
+            tz = None
+
+        with self.__lock:
+            self.__cells[cell] = tz
+        return tz
+
+    def __resolve_exact(self, lon: float, lat: float) -> str:
+        key = (lon, lat)
+        with self.__lock:
+            if key in self.__exact:
+                return self.__exact[key]
+        tz = tzfpy.get_tz(lng=lon, lat=lat)
+        with self.__lock:
+            self.__exact[key] = tz
+        return tz
+
+    def get_tz(self, lon: float, lat: float) -> str:
+        """Timezone name for a (lon, lat) coordinate."""
+        tz = self.__resolve_cell(self.__cell(lon, lat))
+        if tz is None:
+            tz = self.__resolve_exact(lon, lat)
+        return tz
+
+    def get_tzs(
+        self, lons: Sequence[float] | np.ndarray, lats: Sequence[float] | np.ndarray
+    ) -> list[str]:
+        """Timezone names for many (lon, lat) coordinates at once."""
+        lons = np.asarray(lons, dtype=float)
+        lats = np.asarray(lats, dtype=float)
+        if not len(lons):
+            return []
+
+        cells = np.column_stack(
+            (
+                np.floor(lons / self.cell_size).astype(np.int64),
+                np.floor(lats / self.cell_size).astype(np.int64),
+            )
+        )
+        # One integer key per cell; np.unique on rows is much slower
+        keys = cells[:, 0] * 2**32 + cells[:, 1]
+        _, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+        cell_zones = np.array(
+            [self.__resolve_cell((int(x), int(y))) for x, y in cells[first].tolist()],
+            dtype=object,
+        )
+
+        result = cell_zones[inverse.reshape(-1)]
+        for i in np.flatnonzero(result == None):  # noqa: E711
+            result[i] = self.__resolve_exact(float(lons[i]), float(lats[i]))
+        return result.tolist()
+
+    def to_local(
+        self,
+        instants: Iterable[whenever.Instant],
+        lons: Sequence[float] | np.ndarray,
+        lats: Sequence[float] | np.ndarray,
+    ) -> list[whenever.ZonedDateTime]:
+        """Convert instants to the local time at the corresponding coordinates."""
+        return [
+            instant.to_tz(tz)
+            for instant, tz in zip(instants, self.get_tzs(lons, lats), strict=True)
+        ]
+
+
+_resolver = TimezoneResolver()
+
+
+def get_resolver() -> TimezoneResolver:
+    """Process-wide shared resolver."""
+    return _resolver
@@ -0,0 +1,118 @@
+"""Multi-resolution (level of detail) track output for the map front end.
+
+Each level is a compact GeoJSON MultiLineString, simplified so that the error
+stays below one screen pixel for the zoom levels it is used for. Levels are
+written as small script files that register themselves with ``geo.js``, so
+they can be loaded lazily even when the site is opened from the file system.
+"""
+
+import json
+import math
+import pathlib
+from typing import Any
+
+import numpy as np
+
+from mkmapdiary.lib import trackProcessing
+
+# Minimum map zoom level for which each track level is used
+LEVEL_ZOOMS = (0, 6, 9, 12, 15)
+MAX_ZOOM = 18
+
+# Size of a pixel at the equator for zoom level 0 (web mercator, 256px tiles)
+EQUATOR_METERS_PER_PIXEL = 156543.03392
+
+
+def meters_per_pixel(zoom: int, latitude: float) -> float:
+    """Ground resolution of a web mercator map at the given zoom and latitude."""
+    return EQUATOR_METERS_PER_PIXEL * math.cos(math.radians(latitude)) / 2**zoom
+
+
+def level_tolerance(level: int, latitude: float) -> float:
+    """Simplification tolerance in meters for a track level."""
+    if level + 1 < len(LEVEL_ZOOMS):
+        max_zoom = LEVEL_ZOOMS[level + 1] - 1
+    else:
+        max_zoom = MAX_ZOOM
+    return meters_per_pixel(max_zoom, latitude)
+
+
+def level_paths(assets_dir: pathlib.Path, name: str) -> list[pathlib.Path]:
+    """Paths of all level files for a track name."""
+    return [assets_dir / f"{name}.z{zoom}.js" for zoom in LEVEL_ZOOMS]
+
+
+def _decimals(tolerance: float) -> int:
+    """Number of decimals needed so that rounding stays below the tolerance."""
+    return max(1, min(6, math.ceil(math.log10(111320 / max(tolerance, 1e-3)))))
+
+
+def _simplify_line(line: np.ndarray, tolerance: float, decimals: int) -> np.ndarray:
+    indices = trackProcessing.simplify_lonlat(line[:, 0], line[:, 1], tolerance)
+    simplified = np.round(line[indices], decimals)
+
+    # Remove consecutive duplicates introduced by rounding
+    changed = np.ones(len(simplified), dtype=bool)
+    changed[1:] = np.any(np.diff(simplified, axis=0) != 0, axis=1)
+    return simplified[changed]
+
+
+def build_levels(lines: list[np.ndarray]) -> list[list[list[list[float]]]]:
+    """Simplify (lon, lat) lines for every level.
+
+    Returns one list of lines per entry in ``LEVEL_ZOOMS``; every line is a
+    list of [lon, lat] pairs as used by GeoJSON.
+    """
+    lines = [line for line in lines if len(line) >= 2]
+    if not lines:
+        return [[] for _ in LEVEL_ZOOMS]
+
+    latitude = float(np.mean(np.concatenate([line[:, 1] for line in lines])))
+
+    levels = []
+    for level in range(len(LEVEL_ZOOMS)):
+        tolerance = level_tolerance(level, latitude)
+        decimals = _decimals(tolerance)
+        level_lines = []
+        for line in lines:
+            simplified = _simplify_line(line, tolerance, decimals)
+            if len(simplified) >= 2:
+                level_lines.append(simplified.tolist())
+        levels.append(level_lines)
+    return levels
+
+
+def bounds(lines: list[np.ndarray]) -> list[list[float]] | None:
+    """Bounds of the lines as [[south, west], [north, east]] (Leaflet order)."""
+    lines = [line for line in lines if len(line)]
+    if not lines:
+        return None
+    points = np.concatenate(lines)
+    return [
+        [float(points[:, 1].min()), float(points[:, 0].min())],
+        [float(points[:, 1].max()), float(points[:, 0].max())],
+    ]
+
+
+def write_track_levels(
+    lines: list[np.ndarray], assets_dir: pathlib.Path, name: str
+) -> dict[str, Any]:
+    """Write all level files for a track and return their description.
+
+    The returned dictionary is embedded into the page and tells ``geo.js``
+    which file to load for which zoom level.
+    """
+    levels = []
+    for zoom, path, level_lines in zip(
+        LEVEL_ZOOMS, level_paths(assets_dir, name), build_levels(lines), strict=True
+    ):
+        src = f"assets/{path.name}"
+        geometry = {"type": "MultiLineString", "coordinates": level_lines}
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(
+                f"mkmapdiary_track_level({json.dumps(src)}, "
+                f"{json.dumps(geometry, separators=(',', ':'))});\n"
+            )
+        levels.append({"zoom": zoom, "src": src})
+
+    return {"bounds": bounds(lines), "levels": levels}
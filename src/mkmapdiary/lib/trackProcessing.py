@@ -0,0 +1,232 @@
+"""Vectorized track processing on coordinate columns.
+
+All functions operate on plain NumPy columns (longitude, latitude, elevation)
+instead of gpxpy point objects, so they can be applied to any columnar
+representation of a track. Missing elevations are represented as NaN.
+"""
+
+import math
+
+import numpy as np
+from shapely.geometry import Point
+
+from mkmapdiary.util.projection import LocalProjection
+
+# Constants used by gpxpy; kept identical so results match gpxpy's output
+EARTH_RADIUS = 6378.137 * 1000
+ONE_DEGREE = (2 * math.pi * EARTH_RADIUS) / 360
+SMOOTHING_RATIO = (0.4, 0.2, 0.4)
+
+
+def distance_2d(
+    lon1: np.ndarray, lat1: np.ndarray, lon2: np.ndarray, lat2: np.ndarray
+) -> np.ndarray:
+    """Element-wise 2D distance in meters, using the same approximation as gpxpy.
+
+    Close points use an equirectangular approximation; points further apart
+    than 0.2° in either direction use the haversine formula.
+    """
+    lon1, lat1, lon2, lat2 = np.broadcast_arrays(
+        np.asarray(lon1, dtype=float),
+        np.asarray(lat1, dtype=float),
+        np.asarray(lon2, dtype=float),
+        np.asarray(lat2, dtype=float),
+    )
+
+    coef = np.cos(np.radians(lat1))
+    x = lat1 - lat2
+    y = (lon1 - lon2) * coef
+    flat = np.sqrt(x * x + y * y) * ONE_DEGREE
+
+    d_lon = np.radians(lon1 - lon2)
+    r_lat1 = np.radians(lat1)
+    r_lat2 = np.radians(lat2)
+    a = np.sin((r_lat1 - r_lat2) / 2) ** 2 + np.sin(d_lon / 2) ** 2 * np.cos(
+        r_lat1
+    ) * np.cos(r_lat2)
+    haversine = EARTH_RADIUS * 2 * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+
+    far = (np.abs(lat1 - lat2) > 0.2) | (np.abs(lon1 - lon2) > 0.2)
+    return np.where(far, haversine, flat)
+
+
+def remove_extremes(
+    lon: np.ndarray,
+    lat: np.ndarray,
+    ele: np.ndarray,
+    vertical: bool = True,
+    horizontal: bool = True,
+) -> np.ndarray:
+    """Return a boolean mask of points to keep after removing extremes.
+
+    Equivalent to ``GPXTrackSegment.smooth(remove_extremes=True)``.
+    """
+    n = len(lon)
+    keep = np.ones(n, dtype=bool)
+    if n <= 3:
+        return keep
+
+    elevations = np.nan_to_num(ele, nan=0.0)
+
+    # Average distance between two (distinct) consecutive points
+    distances = distance_2d(lon[:-1], lat[:-1], lon[1:], lat[1:])
+    distances = distances[distances != 0]
+    avg_distance = float(distances.mean()) if len(distances) else 0.0
+
+    # Average elevation change between consecutive points with elevation
+    elevation_deltas = np.abs(np.diff(ele))
+    elevation_deltas = elevation_deltas[~np.isnan(elevation_deltas)]
+    avg_elevation_delta = (
+        float(elevation_deltas.mean()) if len(elevation_deltas) else 1.0
+    )
+
+    remove_2d_threshold = 1.75 * avg_distance
+    remove_elevation_threshold = avg_elevation_delta * 5
+
+    prev, cur, nxt = slice(None, -2), slice(1, -1), slice(2, None)
+    removed = np.zeros(n - 2, dtype=bool)
+
+    if vertical:
+        has_elevation = (
+            (elevations[prev] != 0) & (elevations[cur] != 0) & (elevations[nxt] != 0)
+        )
+        new_elevation = (
+            SMOOTHING_RATIO[0] * elevations[prev]
+            + SMOOTHING_RATIO[1] * elevations[cur]
+            + SMOOTHING_RATIO[2] * elevations[nxt]
+        )
+        d1 = np.abs(elevations[cur] - elevations[prev])
+        d2 = np.abs(elevations[cur] - elevations[nxt])
+        extreme = (np.minimum(d1, d2) >= remove_elevation_threshold) | (
+            np.abs(elevations[cur] - new_elevation) >= remove_2d_threshold
+        )
+        removed |= has_elevation & extreme
+
+    if horizontal:
+        new_lon, new_lat = _smoothed(lon), _smoothed(lat)
+        d1 = distance_2d(lon[prev], lat[prev], lon[cur], lat[cur])
+        d2 = distance_2d(lon[nxt], lat[nxt], lon[cur], lat[cur])
+        dist = distance_2d(lon[prev], lat[prev], lon[nxt], lat[nxt])
+        moved = distance_2d(lon[cur], lat[cur], new_lon, new_lat)
+        removed |= (d1 + d2 > dist * 1.5) & (moved >= remove_2d_threshold)
+
+    keep[1:-1] = ~removed
+    return keep
+
+
+def smooth(
+    lon: np.ndarray,
+    lat: np.ndarray,
+    ele: np.ndarray,
+    vertical: bool = True,
+    horizontal: bool = True,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return smoothed copies of the coordinate columns.
+
+    Equivalent to ``GPXTrackSegment.smooth(remove_extremes=False)``.
+    """
+    lon, lat, ele = lon.copy(), lat.copy(), ele.copy()
+    if len(lon) <= 3:
+        return lon, lat, ele
+
+    if vertical:
+        elevations = np.nan_to_num(ele, nan=0.0)
+        has_elevation = (
+            (elevations[:-2] != 0) & (elevations[1:-1] != 0) & (elevations[2:] != 0)
+        )
+        ele[1:-1] = np.where(has_elevation, _smoothed(elevations), ele[1:-1])
+
+    if horizontal:
+        lon[1:-1] = _smoothed(lon)
+        lat[1:-1] = _smoothed(lat)
+
+    return lon, lat, ele
+
+
+def _smoothed(values: np.ndarray) -> np.ndarray:
+    """Weighted average of each inner value with its neighbours."""
+    return (
+        SMOOTHING_RATIO[0] * values[:-2]
+        + SMOOTHING_RATIO[1] * values[1:-1]
+        + SMOOTHING_RATIO[2] * values[2:]
+    )
+
+
+def simplify(xy: np.ndarray, max_distance: float) -> np.ndarray:
+    """Ramer–Douglas–Peucker simplification of a projected polyline.
+
+    All pending sub-ranges of one recursion level are processed at once, so
+    the number of Python iterations is bounded by the recursion depth instead
+    of the number of retained points.
+
+    Args:
+        xy: Array of shape (n, 2) with coordinates in meters.
+        max_distance: Maximum allowed distance (in meters) of a removed point
+            from the line through the retained neighbouring points.
+
+    Returns:
+        Sorted indices of the points to keep.
+    """
+    n = len(xy)
+    if n < 3:
+        return np.arange(n)
+
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+
+    begins = np.array([0])
+    ends = np.array([n - 1])
+    while len(begins):
+        counts = ends - begins - 1
+        pending = counts > 0
+        begins, ends, counts = begins[pending], ends[pending], counts[pending]
+        if not len(begins):
+            break
+
+        # Flatten the inner points of all ranges into one array
+        range_ids = np.repeat(np.arange(len(begins)), counts)
+        starts = np.cumsum(counts) - counts
+        indices = np.arange(counts.sum()) - starts[range_ids] + begins[range_ids] + 1
+
+        origin = xy[begins][range_ids]
+        direction = xy[ends][range_ids] - origin
+        offset = xy[indices] - origin
+        length = np.hypot(direction[:, 0], direction[:, 1])
+        cross = np.abs(direction[:, 0] * offset[:, 1] - direction[:, 1] * offset[:, 0])
+        distances = np.where(
+            length > 0,
+            cross / np.where(length > 0, length, 1),
+            np.hypot(offset[:, 0], offset[:, 1]),
+        )
+
+        # First point with the maximum distance in each range
+        max_distances = np.maximum.reduceat(distances, starts)
+        is_max = distances == max_distances[range_ids]
+        _, first = np.unique(range_ids[is_max], return_index=True)
+        anchors = indices[is_max][first]
+
+        split = max_distances >= max_distance
+        anchors = anchors[split]
+        keep[anchors] = True
+
+        begins, ends = (
+            np.concatenate((begins[split], anchors)),
+            np.concatenate((anchors, ends[split])),
+        )
+
+    return np.flatnonzero(keep)
+
+
+def simplify_lonlat(
+    lon: np.ndarray, lat: np.ndarray, max_distance: float
+) -> np.ndarray:
+    """Simplify a WGS84 polyline in a local metric projection.
+
+    Returns the sorted indices of the points to keep.
+    """
+    if len(lon) < 3:
+        return np.arange(len(lon))
+
+    projection = LocalProjection(Point(float(np.mean(lon)), float(np.mean(lat))))
+    xy = projection.to_local_np(np.column_stack((lon, lat)))
+    return simplify(xy, max_distance)
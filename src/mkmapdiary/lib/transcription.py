@@ -0,0 +1,193 @@
+"""Chunked, parallel speech transcription.
+
+Recordings are decoded once into 16 kHz mono samples, the input format of
+whisper. Long recordings are split at pauses into chunks of limited length,
+which are transcribed independently and can therefore be cached and processed
+in parallel. Every worker of the pool holds its own model, so the number of
+workers is bounded by the available memory.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+from collections.abc import Callable, Sequence
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+
+import numpy as np
+
+if TYPE_CHECKING:
+    from pydub import AudioSegment
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 16000
+FRAME_LENGTH = 0.02  # seconds
+MIN_SILENCE = 0.5  # seconds
+SILENCE_THRESHOLD = 16.0  # dB below the average loudness
+MODEL_MEMORY = 6 * 2**30  # approximate memory of a loaded model in bytes
+
+
+def to_samples(audio: "AudioSegment") -> np.ndarray:
+    """Convert decoded audio to 16 kHz mono 16-bit samples."""
+    audio = audio.set_channels(1).set_frame_rate(SAMPLE_RATE).set_sample_width(2)
+    return np.array(audio.get_array_of_samples(), dtype=np.int16)
+
+
+def find_chunks(
+    samples: np.ndarray,
+    max_length: float,
+    sample_rate: int = SAMPLE_RATE,
+) -> list[tuple[int, int]]:
+    """Split samples into chunks of at most `max_length` seconds.
+
+    Chunks end in the middle of a pause where possible; a chunk without any
+    pause is cut at the maximum length.
+
+    Returns:
+        (start, end) sample indices of the chunks.
+    """
+    n_samples = len(samples)
+    max_samples = int(max_length * sample_rate)
+    if n_samples <= max_samples:
+        return [(0, n_samples)]
+
+    # Loudness per frame
+    frame = int(FRAME_LENGTH * sample_rate)
+    n_frames = n_samples // frame
+    frames = samples[: n_frames * frame].astype(np.float64).reshape(n_frames, frame)
+    rms = np.sqrt(np.mean(frames**2, axis=1))
+    loudness = 20 * np.log10(np.maximum(rms, 1.0) / 32768)
+    average = 20 * np.log10(max(float(np.sqrt(np.mean(frames**2))), 1.0) / 32768)
+    silent = loudness < average - SILENCE_THRESHOLD
+
+    # Middle of every sufficiently long run of silent frames
+    edges = np.diff(np.concatenate(([0], silent.astype(np.int8), [0])))
+    run_starts = np.flatnonzero(edges == 1)
+    run_ends = np.flatnonzero(edges == -1)
+    long_runs = (run_ends - run_starts) * FRAME_LENGTH >= MIN_SILENCE
+    cuts = ((run_starts + run_ends)[long_runs] // 2) * frame
+
+    chunks = []
+    start = 0
+    while n_samples - start > max_samples:
+        candidates = cuts[(cuts > start) & (cuts <= start + max_samples)]
+        end = int(candidates[-1]) if len(candidates) else start + max_samples
+        chunks.append((start, end))
+        start = end
+    chunks.append((start, n_samples))
+    return chunks
+
+
+def chunk_digest(samples: np.ndarray) -> str:
+    """Content hash of a chunk, used as cache key."""
+    return hashlib.md5(samples.tobytes()).hexdigest()
+
+
+def merge_segments(
+    results: Sequence[dict[str, Any]],
+    chunks: Sequence[tuple[int, int]],
+    sample_rate: int = SAMPLE_RATE,
+) -> list[dict[str, Any]]:
+    """Combine the segments of chunk transcriptions into one timeline.
+
+    Segments ending after their chunk are hallucinations and are dropped.
+    """
+    segments = []
+    for result, (start, end) in zip(results, chunks, strict=True):
+        offset = start / sample_rate
+        duration = (end - start) / sample_rate
+        for segment in result["segments"]:
+            if segment["end"] > duration:
+                break
+            segments.append(
+                {
+                    "start": segment["start"] + offset,
+                    "end": segment["end"] + offset,
+                    "text": segment["text"],
+                }
+            )
+    return segments
+
+
+def available_memory() -> int | None:
+    """Available physical memory in bytes, if it can be determined."""
+    try:
+        return os.sysconf("SC_AVPHYS_PAGES") * os.sysconf("SC_PAGE_SIZE")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def worker_count(
+    max_workers: int = 0, model_memory: int = MODEL_MEMORY, processes: int = 1
+) -> int:
+    """Number of transcription workers of a process.
+
+    Args:
+        max_workers: Upper limit; 0 means no limit besides memory and CPUs.
+        model_memory: Memory needed per worker in bytes.
+        processes: Number of build processes sharing the memory and CPUs.
+    """
+    processes = max(1, processes)
+    limit = max_workers if max_workers > 0 else (os.cpu_count() or 1) // processes
+    memory = available_memory()
+    if memory is not None:
+        limit = min(limit, memory // processes // model_memory)
+    return max(1, limit)
+
+
+class TranscriberPool:
+    def __init__(
+        self,
+        workers: int = 1,
+        load_model: Callable[[], Any] | None = None,
+    ) -> None:
+        """Create a pool.
+
+        Args:
+            workers: Number of models transcribing concurrently.
+            load_model: Function loading a model with a ``transcribe`` method;
+                defaults to the whisper turbo model.
+        """
+        self.workers = workers
+        self.__load_model = load_model or _load_whisper_model
+        self.__executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="transcribe"
+        )
+        self.__local = threading.local()
+
+    def __transcribe(self, samples: np.ndarray) -> dict[str, Any]:
+        model = getattr(self.__local, "model", None)
+        if model is None:
+            # Loading the model seems to leak memory; therefore, every worker
+            # loads it only once and reuses it.
+            model = self.__local.model = self.__load_model()
+        audio = samples.astype(np.float32) / 32768
+        result = model.transcribe(audio)
+        return {
+            "segments": [
+                {
+                    "start": float(segment["start"]),
+                    "end": float(segment["end"]),
+                    "text": segment["text"],
+                }
+                for segment in result["segments"]
+            ]
+        }
+
+    def transcribe(self, samples: np.ndarray) -> dict[str, Any]:
+        """Transcribe 16 kHz mono samples, waiting for a free worker."""
+        return self.submit(samples).result()
+
+    def submit(self, samples: np.ndarray) -> Future[dict[str, Any]]:
+        return self.__executor.submit(self.__transcribe, samples)
+
+    def shutdown(self) -> None:
+        self.__executor.shutdown()
+
+
+def _load_whisper_model() -> Any:
+    import whisper
+
+    return whisper.load_model("turbo")
@@ -11,6 +11,11 @@ class SingleAssetPostprocessor(BasePostprocessor):
     def filter(cls, asset: AssetRecord) -> bool:
         raise NotImplementedError("Subclasses must implement the filter method.")
 
+    @classmethod
+    def is_processed(cls, asset: AssetRecord) -> bool:
+        """Whether the asset was processed before, e.g. in an earlier watch run."""
+        return False
+
     @abstractmethod
     def processSingleAsset(self, asset: AssetRecord) -> None:
         raise NotImplementedError("Subclasses must implement the processAsset method.")
@@ -2,7 +2,6 @@ import logging
 
 import imagehash
 import numpy as np
-from sklearn.cluster import AgglomerativeClustering
 
 from mkmapdiary.lib.asset import AssetRecord
 from mkmapdiary.postprocessors.base.multiAssetPostprocessor import (
@@ -42,6 +41,8 @@ class DuplicateDetector(MultiAssetPostprocessor):
 
     def _process_duplicates_for_date_group(self, assets: list[AssetRecord]) -> None:
         """Process duplicate detection for a group of assets from the same display date."""
+        from sklearn.cluster import AgglomerativeClustering
+
         assets = [
             a
             for a in assets
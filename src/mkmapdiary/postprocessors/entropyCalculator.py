@@ -22,6 +22,10 @@ class EntropyCalculator(SingleAssetPostprocessor):
     def filter(cls, asset: AssetRecord) -> bool:
         return asset.type == "image"
 
+    @classmethod
+    def is_processed(cls, asset: AssetRecord) -> bool:
+        return asset.entropy is not None
+
     def processSingleAsset(self, asset: AssetRecord) -> None:
         if not self.__enabled:
             asset.entropy = 8.0
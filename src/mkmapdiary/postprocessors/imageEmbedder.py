@@ -1,7 +1,5 @@
 import logging
 
-import ollama
-
 from mkmapdiary.lib.asset import AssetRecord
 from mkmapdiary.postprocessors.base.multiAssetPostprocessor import (
     MultiAssetPostprocessor,
@@ -18,6 +16,8 @@ class ImageEmbedder(MultiAssetPostprocessor):
         return "Embedding images for semantic analysis."
 
     def processAllAssets(self, assets: list[AssetRecord]) -> None:
+        import ollama
+
         for asset in assets:
             if asset.type != "image":
                 continue
@@ -17,6 +17,10 @@ class ImageHasher(SingleAssetPostprocessor):
     def filter(cls, asset: AssetRecord) -> bool:
         return asset.type == "image"
 
+    @classmethod
+    def is_processed(cls, asset: AssetRecord) -> bool:
+        return asset.image_hash is not None and asset.color_hash is not None
+
     def __init__(self, ai: Callable, config: dict) -> None:
         super().__init__(ai, config)
         self.__enabled = config["features"]["image_comparison"]["enabled"]
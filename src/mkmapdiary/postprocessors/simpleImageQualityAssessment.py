@@ -3,7 +3,6 @@ from pathlib import Path
 
 import numpy as np
 from PIL import Image
-from scipy.ndimage import laplace
 
 from mkmapdiary.lib.asset import AssetRecord
 from mkmapdiary.postprocessors.base.multiAssetPostprocessor import (
@@ -45,6 +44,8 @@ class SimpleImageQualityAssessment(MultiAssetPostprocessor):
         cls, image_paths: list[Path]
     ) -> tuple[np.ndarray, np.ndarray]:
         """Compute raw Laplacian variance and contrast for each image."""
+        from scipy.ndimage import laplace
+
         laplacians = []
         contrasts = []
 
@@ -110,6 +110,78 @@ window.addEventListener("DOMContentLoaded", () => {
     });
   }
 
+  // Tracks are provided in multiple levels of detail. Each level is a script
+  // file which registers its geometry by calling mkmapdiary_track_level; the
+  // levels are loaded lazily when the zoom level requires them.
+  if (window.track_levels && track_levels.bounds) {
+    const trackLevelData = {};
+    const trackLevelCallbacks = {};
+    var trackLayer = null;
+    var trackLevelSrc = null;
+
+    window.mkmapdiary_track_level = function(src, geometry) {
+      trackLevelData[src] = geometry;
+      for (const callback of trackLevelCallbacks[src] || []) {
+        callback(geometry);
+      }
+      delete trackLevelCallbacks[src];
+    };
+
+    const loadTrackLevel = function(src, callback) {
+      if (src in trackLevelData) {
+        callback(trackLevelData[src]);
+        return;
+      }
+      if (src in trackLevelCallbacks) {
+        trackLevelCallbacks[src].push(callback);
+        return;
+      }
+      trackLevelCallbacks[src] = [callback];
+      const script = document.createElement('script');
+      script.src = src;
+      document.head.appendChild(script);
+    };
+
+    const showTrackLevel = function() {
+      const zoom = map.getZoom();
+      var level = track_levels.levels[0];
+      for (const candidate of track_levels.levels) {
+        if (candidate.zoom <= zoom) {
+          level = candidate;
+        }
+      }
+      if (level.src === trackLevelSrc) {
+        return;
+      }
+      trackLevelSrc = level.src;
+      loadTrackLevel(level.src, function(geometry) {
+        if (trackLevelSrc !== level.src) {
+          return; // Zoom changed while loading
+        }
+        const layer = L.geoJSON(geometry, {
+          style: {
+            color: '#3F51B5',
+            lineCap: 'round',
+          },
+          interactive: false,
+        }).addTo(map);
+        if (trackLayer) {
+          map.removeLayer(trackLayer);
+        }
+        trackLayer = layer;
+      });
+    };
+
+    if (!window.is_main_page) {
+      combinedBounds.extend(track_levels.bounds);
+      map.fitBounds(combinedBounds.pad(0.1));
+    } else if (!combinedBounds.isValid()) {
+      map.fitBounds(track_levels.bounds);
+    }
+    map.on('zoomend', showTrackLevel);
+    showTrackLevel();
+  }
+
   if (gpx_data) {
 
     const iconoirIcon = function(iconName, colorClass) {
@@ -1,6 +1,7 @@
 import logging
 import sys
-from collections.abc import Callable, Iterator, MutableMapping
+import weakref
+from collections.abc import Callable, Iterable, Iterator, MutableMapping
 from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Any
@@ -12,6 +13,9 @@ from identify import identify
 from mkmapdiary.lib.asset import AssetRecord
 from mkmapdiary.lib.calibration import Calibration
 from mkmapdiary.lib.dirs import Dirs
+from mkmapdiary.lib.llmScheduler import LlmSchedulerManager
+from mkmapdiary.lib.shard import DateRange
+from mkmapdiary.lib.sharedState import SharedState, share_creator
 
 from .lib.assetRegistry import AssetRegistry
 from .tasks import (
@@ -25,6 +29,7 @@ from .tasks import (
     MarkdownTask,
     PostprocessingTask,
     RawInputTask,
+    ShardTask,
     SiteTask,
     TagsTask,
     TextTask,
@@ -46,8 +51,16 @@ tasks = [
     DayPageTask,
     GalleryTask,
     JournalTask,
+    ShardTask,
 ]
 
+# Task lists by id, to pickle them by reference (see TaskList.__reduce__)
+_instances: "weakref.WeakValueDictionary[int, TaskList]" = weakref.WeakValueDictionary()
+
+
+def _task_list(key: int) -> "TaskList":
+    return _instances[key]
+
 
 class TaskList(*tasks):  # type: ignore
     """
@@ -64,12 +77,17 @@ class TaskList(*tasks):  # type: ignore
         cache: MutableMapping,
         scan: bool = True,
         gettext: Callable = lambda x: x,
+        date_range: DateRange | None = None,
     ):
         self.__config = config
         self.__cache = cache
         self.__dirs = dirs
         self.__pre_assets: list[Iterator[AssetRecord]] = []
         self.__gettext = gettext
+        self.__date_range = date_range
+        # Assets of every handled file, to handle it again while watching
+        self.__source_assets: dict[Path, list[AssetRecord]] = {}
+        self.__shared_state: SharedState | None = None
 
         self.__calibration = [
             Calibration(
@@ -87,6 +105,14 @@ class TaskList(*tasks):  # type: ignore
             self.__scan()
             self.finalize_assets()
 
+        _instances[id(self)] = self
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        # Actions of tasks created after the worker processes of a parallel
+        # build were forked are pickled. The workers have a copy of the task
+        # list, so the actions refer to it instead of pickling its state.
+        return _task_list, (id(self),)
+
     @property
     def gettext(self) -> Callable:
         """Property to access the gettext function."""
@@ -117,9 +143,36 @@ class TaskList(*tasks):  # type: ignore
         """Property to access the cache."""
         return self.__cache
 
+    @property
+    def date_range(self) -> DateRange | None:
+        """Property to access the dates built by a shard."""
+        return self.__date_range
+
+    @property
+    def shared_state(self) -> SharedState | None:
+        """Asset state shared with the worker processes of a parallel build."""
+        return self.__shared_state
+
+    def share(
+        self, state: SharedState, llm_manager: LlmSchedulerManager | None = None
+    ) -> None:
+        """Run the task actions in worker processes, sharing the assets.
+
+        With an LLM scheduler manager, the LLM requests of all processes are
+        scheduled together.
+        """
+        self.__shared_state = state
+        if llm_manager is not None:
+            self.share_llm_scheduler(llm_manager)
+
     def toDict(self) -> dict[str, Any]:
         """Convert this object to a dictionary so that doit can use it."""
-        return dict((name, getattr(self, name)) for name in dir(self))
+        result = dict((name, getattr(self, name)) for name in dir(self))
+        if self.__shared_state is not None:
+            for name, value in result.items():
+                if name.startswith("task_") and callable(value):
+                    result[name] = share_creator(self, name, value)
+        return result
 
     def __scan(self) -> None:
         """Scan the source directory and identify files and directories."""
@@ -184,11 +237,28 @@ class TaskList(*tasks):  # type: ignore
 
     def handle(self, source: Path) -> None:
         results = self.handle_path(source)
+        if not source.is_dir():
+            self.__source_assets[source] = []
         if results:
-            if isinstance(results, Iterator):
-                self.add_assets(results)
-            else:
-                self.add_assets(iter(results))
+            assets = results if isinstance(results, Iterator) else iter(results)
+            if self.__date_range is not None:
+                assets = filter(self.__in_date_range, assets)
+            self.add_assets(self.__track(source, assets))
+
+    def __in_date_range(self, asset: AssetRecord) -> bool:
+        # Assets without a time are never shown on a day page and not part
+        # of any shard
+        assert self.__date_range is not None
+        return asset.timestamp_utc is not None and self.__date_range.may_contain(
+            asset.timestamp_utc
+        )
+
+    def __track(
+        self, source: Path, assets: Iterator[AssetRecord]
+    ) -> Iterator[AssetRecord]:
+        for asset in assets:
+            self.__source_assets[source].append(asset)
+            yield asset
 
     def handle_directory(self, source: Path, calibration: Calibration) -> None:
         """Handle a directory by processing its contents."""
@@ -259,3 +329,90 @@ class TaskList(*tasks):  # type: ignore
                 asset_iterator = future.result()
                 for asset in asset_iterator:
                     self.db.add_asset(asset)
+        self.__pre_assets = []
+
+    @property
+    def sources(self) -> list[Path]:
+        """All handled files."""
+        return list(self.__source_assets)
+
+    def assets_of(self, sources: Iterable[Path]) -> list[AssetRecord]:
+        """Current records of the assets created from the given sources."""
+        assets = []
+        for source in sources:
+            for asset in self.__source_assets.get(source, []):
+                assert asset.id is not None
+                record = self.db.get_asset_by_id(asset.id)
+                if record is not None:
+                    assets.append(record)
+        return assets
+
+    def update_sources(
+        self, changed: Iterable[Path], removed: Iterable[Path]
+    ) -> list[AssetRecord]:
+        """Handle added or modified files again and drop removed files.
+
+        A changed calibration file handles all files of its directory again.
+        If tracks change, the positions and local times derived from them
+        are reset, so that the geo correlation assigns them again.
+
+        Returns:
+            The assets of the changed and removed files before the update.
+        """
+        changed = set(changed)
+        removed = set(removed)
+        for path in changed | removed:
+            if path.name == "calibration.yaml":
+                changed.update(
+                    source
+                    for source in self.__source_assets
+                    if source.is_relative_to(path.parent) and source not in removed
+                )
+        changed.difference_update(removed)
+
+        previous = self.assets_of(changed | removed)
+        tracks_changed = self.__affects_tracks(removed | changed)
+        for source in changed | removed:
+            self.forget_source(source)
+            self.__source_assets.pop(source, None)
+        self.db.remove_assets(asset.id for asset in previous)
+
+        for source in sorted(changed):
+            if source.is_file():
+                self.__handle_calibrated(source)
+        self.finalize_assets()
+        tracks_changed = tracks_changed or self.__affects_tracks(changed)
+
+        if tracks_changed:
+            logger.debug("Tracks changed, resetting positions of assets")
+            for asset in self.db.assets:
+                asset.timestamp_geo = None
+                if asset.approx is not None:
+                    # Position was assigned by the geo correlation
+                    asset.latitude = None
+                    asset.longitude = None
+                    asset.approx = None
+        return previous
+
+    def __affects_tracks(self, sources: Iterable[Path]) -> bool:
+        track_sources = set(self.track_sources)
+        return any(
+            self.derived_paths(source) & track_sources  # type: ignore[arg-type]
+            for source in sources
+        )
+
+    def __handle_calibrated(self, source: Path) -> None:
+        """Handle a file with the calibrations of its directories."""
+        directories = [
+            directory
+            for directory in reversed(source.parents)
+            if directory.is_relative_to(self.dirs.source_dir)
+            and (directory / "calibration.yaml").is_file()
+        ]
+        for directory in directories:
+            self.__push_calibration(directory / "calibration.yaml")
+        try:
+            self.handle(source)
+        finally:
+            for _ in directories:
+                self.__pop_calibration()
@@ -8,6 +8,7 @@ from .journalTask import JournalTask
 from .markdownTask import MarkdownTask
 from .postprocessingTask import PostprocessingTask
 from .rawInputTask import RawInputTask
+from .shardTask import ShardTask
 from .siteTask import SiteTask
 from .tagsTask import TagsTask
 from .textTask import TextTask
@@ -26,4 +27,5 @@ __all__ = [
     "TagsTask",
     "TextTask",
     "PostprocessingTask",
+    "ShardTask",
 ]
@@ -1,20 +1,27 @@
-import hashlib
 import logging
 import threading
 from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import PosixPath
 from typing import Any
 
-from pydub import AudioSegment
+import numpy as np
 
 from mkmapdiary.lib.asset import AssetRecord
 from mkmapdiary.lib.calibration import Calibration
+from mkmapdiary.lib.metrics import get_metrics
+from mkmapdiary.lib.transcription import (
+    TranscriberPool,
+    chunk_digest,
+    find_chunks,
+    merge_segments,
+    to_samples,
+    worker_count,
+)
 from mkmapdiary.util.log import ThisMayTakeAWhile
 
 from .base.baseTask import BaseTask
 
-whisper_lock = threading.Lock()
-
 logger = logging.getLogger(__name__)
 
 
@@ -22,6 +29,13 @@ class AudioTask(BaseTask):
     def __init__(self) -> None:
         super().__init__()
         self.__sources: list[PosixPath] = []
+        self.__transcriber_pool: TranscriberPool | None = None
+        self.__transcriber_lock = threading.Lock()
+
+    def forget_source(self, source: PosixPath) -> None:
+        derived = self.derived_paths(source)
+        self.__sources = [s for s in self.__sources if s not in derived]
+        super().forget_source(source)
 
     def handle_audio(
         self, source: PosixPath, calibration: Calibration
@@ -54,49 +68,102 @@ class AudioTask(BaseTask):
         filename = PosixPath(self.dirs.assets_dir / source.stem).with_suffix(suffix)
         return self.make_unique_filename(source, filename)
 
-    def task_convert_audio(self) -> Iterator[dict[str, Any]]:
-        """Convert an image to a different format."""
+    def __pcm_filename(self, mp3: PosixPath) -> PosixPath:
+        return PosixPath(self.dirs.files_dir / mp3.name).with_suffix(".pcm.npy")
 
-        def _convert(src: PosixPath, dst: PosixPath) -> None:
-            audio = AudioSegment.from_file(src)
-            audio.export(dst, format="mp3")
+    def task_convert_audio(self) -> Iterator[dict[str, Any]]:
+        """Convert an audio file to mp3 and decoded samples for transcription."""
+
+        transcribe = self.config["features"]["transcription"]["enabled"]
+
+        def _convert(src: PosixPath, dst: PosixPath, pcm: PosixPath) -> None:
+            from pydub import AudioSegment
+
+            # Decode only once for the conversion and the transcription
+            metrics = get_metrics()
+            with metrics.timer(
+                "audio_conversion_seconds", "Duration of audio conversions"
+            ).time():
+                audio = AudioSegment.from_file(src)
+                metrics.counter(
+                    "audio_files_decoded_total", "Decoded audio files"
+                ).inc()
+                audio.export(dst, format="mp3")
+                written = dst.stat().st_size
+                if transcribe:
+                    np.save(pcm, to_samples(audio))
+                    written += pcm.stat().st_size
+            metrics.counter(
+                "bytes_written_total", "Bytes of written assets", type="audio"
+            ).inc(written)
 
         for src in self.__sources:
             dst = self.__generate_destination_filename(src, ".mp3")
+            pcm = self.__pcm_filename(dst)
             yield dict(
                 name=dst,
-                actions=[(_convert, (src, dst))],
+                actions=[(_convert, (src, dst, pcm))],
                 file_dep=[src],
-                task_dep=[f"create_directory:{dst.parent}"],
-                targets=[dst],
+                task_dep=[
+                    f"create_directory:{dst.parent}",
+                    f"create_directory:{self.dirs.files_dir}",
+                ],
+                targets=[dst, pcm] if transcribe else [dst],
             )
 
-    def __file_md5(self, path: PosixPath) -> str:
-        hash_md5 = hashlib.md5()
-        with open(path, "rb") as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+    @property
+    def __transcriber(self) -> TranscriberPool:
+        with self.__transcriber_lock:
+            if self.__transcriber_pool is None:
+                shared_state = self.shared_state
+                workers = worker_count(
+                    self.config["features"]["transcription"]["max_workers"],
+                    processes=shared_state.processes if shared_state else 1,
+                )
+                logger.debug(f"Using {workers} transcription workers")
+                self.__transcriber_pool = TranscriberPool(workers)
+            return self.__transcriber_pool
+
+    def __transcribe_samples(self, samples: np.ndarray) -> list[dict[str, Any]]:
+        """Transcribe samples in chunks, which are cached individually."""
+        chunks = find_chunks(
+            samples, self.config["features"]["transcription"]["chunk_length"]
+        )
+        pool = self.__transcriber
+        metrics = get_metrics()
+
+        def _transcribe(chunk: np.ndarray) -> dict[str, Any]:
+            metrics.counter("whisper_calls_total", "Transcribed audio chunks").inc()
+            with metrics.timer(
+                "whisper_call_seconds", "Duration of chunk transcriptions"
+            ).time():
+                return pool.transcribe(chunk)
+
+        def _transcribe_chunk(start: int, end: int) -> dict[str, Any]:
+            chunk = samples[start:end]
+            return self.with_cache(
+                "whisper-chunk",
+                _transcribe,
+                chunk,
+                cache_args=(chunk_digest(chunk),),
+                bypass_cache=not self.config["debug"]["enable_user_cache"],
+            )
 
-    def __transcribe_audio(self, src: PosixPath) -> dict[str, Any]:
-        import whisper
+        # Cache lookups run in parallel as well; the pool bounds the number
+        # of chunks actually being transcribed
+        with ThreadPoolExecutor(max_workers=pool.workers) as executor:
+            results = list(executor.map(lambda c: _transcribe_chunk(*c), chunks))
+        return merge_segments(results, chunks)
 
-        with whisper_lock:
-            with ThisMayTakeAWhile(logger, f"Transcribing audio: {src.name}"):
-                if not hasattr(self, "_model"):
-                    # Loading the model seems to leak memory; therefore, we
-                    # load it only once and reuse it.
-                    self._model = whisper.load_model("turbo")
-                result = self._model.transcribe(str(src))
-        return result
-
-    def task_transcribe_audio(self) -> dict[str, Any]:
+    def task_transcribe_audio(self) -> Iterator[dict[str, Any]]:
         """Transcribe audio to text."""
 
+        transcribe = self.config["features"]["transcription"]["enabled"]
+
         def _transcribe(src: PosixPath, dst: PosixPath) -> None:
             audio_title = self.config["strings"]["audio_title"]
 
-            if not self.config["features"]["transcription"]["enabled"]:
+            if not transcribe:
                 with open(dst, "w") as f:
                     f.write(f"### {audio_title}\n\n")
                 return
@@ -104,21 +171,11 @@ class AudioTask(BaseTask):
             output = []
             output.append("<div class='transcript'>")
 
-            result = self.with_cache(
-                "whisper",
-                self.__transcribe_audio,
-                src,
-                cache_args=(self.__file_md5(src),),
-                bypass_cache=not self.config["debug"]["enable_user_cache"],
-            )
+            with ThisMayTakeAWhile(logger, f"Transcribing audio: {src.name}"):
+                segments = self.__transcribe_samples(np.load(src))
 
-            audio = AudioSegment.from_file(src)
             text = []
-
-            for segment in result["segments"]:
-                if segment["end"] > audio.duration_seconds:
-                    break
-
+            for segment in segments:
                 output.append(
                     self.template(
                         "transcript_segment.j2",
@@ -140,27 +197,15 @@ class AudioTask(BaseTask):
                 f.write(f"### {audio_title}: {title}\n\n")
                 f.write("\n".join(output))
 
-        def _transcribe_all() -> None:
-            for src in self.__sources:
-                dst = self.__generate_destination_filename(src, ".mp3.md")
-                _transcribe(src, dst)
-
-        # Collect all file dependencies, task dependencies, and targets
-        file_deps = list(self.__sources)
-        task_deps = []
-        targets = []
-
         for src in self.__sources:
+            mp3 = self.__generate_destination_filename(src, ".mp3")
             dst = self.__generate_destination_filename(src, ".mp3.md")
-            targets.append(dst)
-            task_deps.append(f"create_directory:{dst.parent}")
-
-        # Remove duplicate task dependencies
-        task_deps = list(set(task_deps))
-
-        return dict(
-            actions=[_transcribe_all],
-            file_dep=file_deps,
-            task_dep=task_deps,
-            targets=targets,
-        )
+            # The decoded samples are written by the conversion task
+            dep = self.__pcm_filename(mp3) if transcribe else src
+            yield dict(
+                name=dst,
+                actions=[(_transcribe, (dep, dst))],
+                file_dep=[dep],
+                task_dep=[f"create_directory:{dst.parent}"],
+                targets=[dst],
+            )
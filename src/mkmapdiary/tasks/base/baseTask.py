@@ -1,23 +1,28 @@
 import datetime
 import threading
 from abc import ABC, ABCMeta, abstractmethod
-from collections.abc import Callable, Mapping
+from collections.abc import Callable, Mapping, Sequence
 from pathlib import PosixPath
 from typing import Any
 
 import dateutil.parser
-import ollama
 import whenever
 from jinja2 import Environment, PackageLoader, StrictUndefined, select_autoescape
 
+from mkmapdiary.lib.adminLookup import AdminLookup
+from mkmapdiary.lib.asset import AssetRecord
 from mkmapdiary.lib.assetRegistry import AssetRegistry
 from mkmapdiary.lib.calibration import Calibration
 from mkmapdiary.lib.dirs import Dirs
+from mkmapdiary.lib.fingerprint import fingerprint
+from mkmapdiary.lib.llmCache import LlmCache, cache_key
+from mkmapdiary.lib.llmScheduler import LlmScheduler, LlmSchedulerManager
+from mkmapdiary.lib.metrics import get_metrics
+from mkmapdiary.lib.shard import DateRange
+from mkmapdiary.lib.sharedState import SharedState
 from mkmapdiary.util.cache import with_cache
 from mkmapdiary.util.units import format_distance, format_time, format_time_hours
 
-ai_lock = threading.Lock()
-
 
 def debug(func: Callable[..., Any]) -> Callable[..., Any]:
     """Decorator to print debug information for a function."""
@@ -37,6 +42,13 @@ class BaseTask(ABC, metaclass=ABCMeta):
     def __init__(self) -> None:
         super().__init__()
         self.__unique_paths: dict[PosixPath, PosixPath] = {}
+        self.__admin_lookup: AdminLookup | None = None
+        self.__admin_lookup_lock = threading.Lock()
+        self.__llm_scheduler: LlmScheduler | None = None
+        self.__llm_scheduler_lock = threading.Lock()
+        self.__llm_cache: LlmCache | None = None
+        self.__llm_cache_lock = threading.Lock()
+        self.__templates_digest: str | None = None
 
         self.__template_env = Environment(
             loader=PackageLoader("mkmapdiary"),
@@ -71,6 +83,16 @@ class BaseTask(ABC, metaclass=ABCMeta):
     def dirs(self) -> Dirs:
         """Property to access the directory structure."""
 
+    @property
+    @abstractmethod
+    def date_range(self) -> DateRange | None:
+        """Property to access the dates built by a shard."""
+
+    @property
+    @abstractmethod
+    def shared_state(self) -> SharedState | None:
+        """Property to access the state shared with worker processes."""
+
     @property
     @abstractmethod
     def cache(self) -> Mapping[tuple[str, tuple[Any] | list[Any]], Any]:
@@ -134,6 +156,21 @@ class BaseTask(ABC, metaclass=ABCMeta):
         template = self.__template_env.get_template(template_name)
         return template.render(**params, strings=self.config["strings"])
 
+    def page_fingerprint(self, config_keys: Sequence[str], *inputs: Any) -> str:
+        """Fingerprint of the inputs of a page, for its uptodate check.
+
+        Besides the given inputs, the fingerprint covers the listed top-level
+        configuration sections and all templates.
+        """
+        if self.__templates_digest is None:
+            env = self.__template_env
+            assert env.loader is not None
+            self.__templates_digest = fingerprint(
+                [env.loader.get_source(env, name)[0] for name in env.list_templates()]
+            )
+        config = {key: self.config.get(key) for key in config_keys}
+        return fingerprint(self.__templates_digest, config, *inputs)
+
     def make_unique_filename(
         self,
         source: PosixPath,
@@ -158,6 +195,29 @@ class BaseTask(ABC, metaclass=ABCMeta):
         self.__unique_paths[candidate] = source
         return candidate
 
+    def derived_paths(self, source: PosixPath) -> set[PosixPath]:
+        """The source and all intermediate and destination files derived from it."""
+        paths = {source}
+        added = True
+        while added:
+            derived = {
+                destination
+                for destination, origin in self.__unique_paths.items()
+                if origin in paths
+            }
+            added = not derived <= paths
+            paths |= derived
+        return paths
+
+    def forget_source(self, source: PosixPath) -> None:
+        """Forget a source, so that it can be handled again or left out.
+
+        Tasks keeping a list of their sources override this to remove the
+        source and the files derived from it, and call the base method.
+        """
+        for path in self.derived_paths(source) - {source}:
+            del self.__unique_paths[path]
+
     def ai(
         self,
         key: str,
@@ -168,32 +228,104 @@ class BaseTask(ABC, metaclass=ABCMeta):
         return self.__ai(
             self.config["strings"][translation_key].format(**format_args),
             model=self.config["llm_prompts"][key]["model"],
+            priority=self.config["llm_prompts"][key]["priority"],
             options=self.config["llm_prompts"][key]["options"],
             message_params=message_params,
         )
 
     def __ai(
-        self, prompt: str, model: str, message_params: dict | None = None, **params: Any
+        self,
+        prompt: str,
+        model: str,
+        priority: int = 0,
+        message_params: dict | None = None,
+        **params: Any,
     ) -> str:
         """Generate text using an AI model."""
 
         if not self.config["features"]["llms"]["enabled"]:
             return ""
 
+        metrics = get_metrics()
+        llm_cache = self.__get_llm_cache(params.get("options"))
+        if llm_cache is not None:
+            key = cache_key(model, params.get("options"), prompt, message_params)
+            cached = llm_cache.get(key)
+            if cached is not None:
+                metrics.counter(
+                    "llm_requests_total", "LLM requests", model=model, result="cached"
+                ).inc()
+                return cached
+
         message = {"role": "user", "content": prompt}
         if message_params is not None:
             message.update(message_params)
-        with ai_lock:
-            response = ollama.chat(
-                model=model,
-                messages=[message],
-                keep_alive="15s",
-                **params,
+        metrics.counter(
+            "llm_requests_total", "LLM requests", model=model, result="generated"
+        ).inc()
+        with metrics.timer(
+            "llm_request_seconds", "Duration of LLM requests", model=model
+        ).time():
+            response = self.llm_scheduler.chat(
+                model, [message], priority=priority, **params
             )
 
-        return response["message"]["content"].strip()
+        content = response["message"]["content"].strip()
+        if llm_cache is not None:
+            llm_cache.put(key, content)
+        return content
+
+    def __get_llm_cache(self, options: dict[str, Any] | None) -> LlmCache | None:
+        """Response cache for a request, or None if it must not be cached."""
+        settings = self.config["features"]["llms"]["cache"]
+        if not settings["enabled"]:
+            return None
+        deterministic = (options or {}).get("temperature") == 0
+        if not deterministic and not settings["cache_sampled"]:
+            return None
+        with self.__llm_cache_lock:
+            if self.__llm_cache is None:
+                self.__llm_cache = LlmCache(
+                    getattr(self.cache, "path", ":memory:"),
+                    max_entries=settings["max_entries"],
+                )
+            return self.__llm_cache
+
+    @property
+    def llm_scheduler(self) -> LlmScheduler:
+        """Scheduler shared by all LLM requests of the build."""
+        with self.__llm_scheduler_lock:
+            if self.__llm_scheduler is None:
+                self.__llm_scheduler = LlmScheduler(**self.__llm_scheduler_settings())
+            return self.__llm_scheduler
+
+    def share_llm_scheduler(self, manager: LlmSchedulerManager) -> None:
+        """Schedule the LLM requests of all processes in the manager's server."""
+        with self.__llm_scheduler_lock:
+            self.__llm_scheduler = manager.scheduler(**self.__llm_scheduler_settings())
+
+    def __llm_scheduler_settings(self) -> dict[str, Any]:
+        settings = self.config["features"]["llms"]
+        return {
+            "concurrency": settings["concurrency"],
+            "model_concurrency": settings["model_concurrency"],
+            "keep_alive": settings["keep_alive"],
+        }
 
     def with_cache(self, *args: Any, **params: Any) -> Any:
         """Get the value from cache or compute it if not present."""
 
         return with_cache(self.cache, *args, **params)
+
+    def location_admin(self, asset: AssetRecord, lang: str | None = None) -> str | None:
+        """Administrative hierarchy string for an asset's position.
+
+        Returns None if POI detection is disabled or the asset has no position.
+        Lookups are shared by all tasks and persisted in the cache.
+        """
+        if not self.config["features"]["poi_detection"]["enabled"]:
+            return None
+        with self.__admin_lookup_lock:
+            if self.__admin_lookup is None:
+                self.__admin_lookup = AdminLookup(self.cache)  # type: ignore[arg-type]
+        return self.__admin_lookup.get_for_asset(asset, lang)
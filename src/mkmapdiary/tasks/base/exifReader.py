@@ -4,10 +4,10 @@ import logging
 from abc import ABC, abstractmethod
 from pathlib import PosixPath
 
-import exiftool
 import whenever
 
 from mkmapdiary.lib.calibration import Calibration
+from mkmapdiary.lib.metrics import get_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -34,11 +34,18 @@ class ExifReader(ABC):
         pass
 
     def read_exif(self, source: PosixPath, calibration: Calibration) -> ExifData:
+        import exiftool
+
         exif_data: ExifData = ExifData()
         exif_data_dict = {}
+        metrics = get_metrics()
+        metrics.counter("exif_reads_total", "EXIF metadata reads").inc()
 
         # Try to extract time from exif data
-        with exiftool.ExifToolHelper() as et:
+        with (
+            metrics.timer("exif_read_seconds", "Duration of EXIF reads").time(),
+            exiftool.ExifToolHelper() as et,
+        ):
             try:
                 exif_data_dict = et.get_metadata([source])[0]
             except exiftool.exceptions.ExifToolExecuteError as e:
@@ -1,21 +1,38 @@
+import logging
+import pathlib
 import threading
-import time
 from typing import Any
 
+from mkmapdiary.lib.reverseGeocoder import ReverseGeocoder, find_extracts
+
 from .httpRequest import HttpRequest
 
-lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+geocoder_lock = threading.Lock()
+geocoders: dict[pathlib.Path, ReverseGeocoder] = {}
 
 
 class GeoLookup(HttpRequest):
+    def __geocoders(self) -> list[ReverseGeocoder]:
+        """Offline geocoders for all extracts in the region cache."""
+        with geocoder_lock:
+            for extract in find_extracts(self.dirs.region_cache_dir):
+                if extract not in geocoders:
+                    logger.debug(f"Loading offline geocoder for {extract}")
+                    geocoders[extract] = ReverseGeocoder.open(extract)
+            return list(geocoders.values())
+
     def geoSearch(self, location: str) -> Any:
-        with lock:
-            time.sleep(1)  # respect rate limit
+        for geocoder in self.__geocoders():
+            result = geocoder.search(location)
+            if result:
+                return result
 
-            url = "https://nominatim.openstreetmap.org/search"
-            headers = {"User-Agent": "mkmapdiary/0.1 travel-diary generator"}
-            params = {"q": location, "format": "json", "limit": 1}
-            return self.httpRequest(url, params, headers)
+        url = "https://nominatim.openstreetmap.org/search"
+        headers = {"User-Agent": "mkmapdiary/0.1 travel-diary generator"}
+        params = {"q": location, "format": "json", "limit": 1}
+        return self.httpRequest(url, params, headers)
 
     def __decimals_for_zoom(self, zoom: int) -> int:
         if self.config["geo_lookup"]["high_precision"]:
@@ -38,15 +55,20 @@ class GeoLookup(HttpRequest):
         # Interface uses separate lat, lon parameters (not (lon, lat) tuple) for Nominatim API compatibility
         zoom = max(1, min(zoom, 10))  # Clamp zoom
 
-        with lock:
-            time.sleep(1)  # respect rate limit
-
-            url = "https://nominatim.openstreetmap.org/reverse"
-            headers = {"User-Agent": "mkmapdiary/0.1 travel-diary generator"}
-            params = {
-                "lat": self.__round_coord(lat, zoom),
-                "lon": self.__round_coord(lon, zoom),
-                "format": "json",
-                "zoom": zoom,
-            }
-            return self.httpRequest(url, params, headers)
+        # Prefer a local extract covering the coordinate; ask Nominatim if
+        # the extract knows no address there
+        for geocoder in self.__geocoders():
+            if geocoder.covers(lat, lon):
+                result = geocoder.reverse(lat, lon, zoom)
+                if "error" not in result and result.get("address"):
+                    return result
+
+        url = "https://nominatim.openstreetmap.org/reverse"
+        headers = {"User-Agent": "mkmapdiary/0.1 travel-diary generator"}
+        params = {
+            "lat": self.__round_coord(lat, zoom),
+            "lon": self.__round_coord(lon, zoom),
+            "format": "json",
+            "zoom": zoom,
+        }
+        return self.httpRequest(url, params, headers)
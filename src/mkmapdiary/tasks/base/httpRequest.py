@@ -1,13 +1,32 @@
+import threading
+import urllib.parse
 from typing import Any
 
 import requests
 
+from mkmapdiary.lib.httpClient import HttpClient
+from mkmapdiary.lib.metrics import get_metrics
+
 from .baseTask import BaseTask
 
 
 class HttpRequest(BaseTask):
     def __init__(self) -> None:
         super().__init__()
+        self.__client: HttpClient | None = None
+        self.__client_lock = threading.Lock()
+
+    def __get_client(self) -> HttpClient:
+        with self.__client_lock:
+            if self.__client is None:
+                settings = self.config["http"]
+                self.__client = HttpClient(
+                    self.cache,  # type: ignore[arg-type]
+                    freshness=settings["freshness"],
+                    url_freshness=settings["url_freshness"],
+                    offline=settings["offline"],
+                )
+            return self.__client
 
     def httpRequest(
         self,
@@ -16,28 +35,16 @@ class HttpRequest(BaseTask):
         headers: dict[str, str] | None = None,
         json: bool = True,
     ) -> dict[str, Any] | str:
-        req = requests.Request("GET", url, params=data, headers=headers)
+        req = requests.Request("GET", url, params=data)
         prepared = req.prepare()
 
         assert prepared.url is not None, "Prepared URL should not be None"
         assert "?" in prepared.url or not data
 
-        return self.with_cache(
-            "http-request",
-            self.__send_request,
-            prepared,
-            json,
-            cache_args=(prepared.url, json),
-        )
-
-    def __send_request(
-        self, prepared: requests.PreparedRequest, json: bool
-    ) -> dict[str, Any] | str:
-        with requests.Session() as session:
-            response = session.send(prepared, timeout=5)
-            response.raise_for_status()
-
-            if json:
-                return response.json()
-            else:
-                return response.text
+        host = urllib.parse.urlsplit(prepared.url).hostname or ""
+        metrics = get_metrics()
+        metrics.counter("http_requests_total", "HTTP requests", host=host).inc()
+        with metrics.timer(
+            "http_request_seconds", "Duration of HTTP requests", host=host
+        ).time():
+            return self.__get_client().get(prepared.url, headers, json)
@@ -3,42 +3,64 @@ from typing import Any
 
 import whenever
 from doit import create_after
+from doit.tools import config_changed
 
 from .base.baseTask import BaseTask
 
+# Templates of the gallery, journal and tags tasks included by a day page
+DAY_TEMPLATES = ("gallery", "journal", "tags")
+
 
 class DayPageTask(BaseTask):
     def __init__(self) -> None:
         super().__init__()
 
+    def _generate_day_page(self, date: whenever.Date) -> None:
+        formatter = "%a, %x"
+
+        day_page_path = self.dirs.docs_dir / f"{date}.md"
+        with open(day_page_path, "w") as f:
+            formatted_date = date.py_date().strftime(
+                formatter,
+            )
+            f.write(
+                self.template(
+                    "day_base.j2",
+                    formatted_date=formatted_date,
+                    date=date,
+                ),
+            )
+
     @create_after("end_postprocessing")
     def task_build_day_page(self) -> Iterator[dict[str, Any]]:
         """Generate day pages for each date with assets."""
 
-        def _generate_day_page(date: whenever.Date) -> None:
-            formatter = "%a, %x"
-
-            day_page_path = self.dirs.docs_dir / f"{date}.md"
-            with open(day_page_path, "w") as f:
-                formatted_date = date.py_date().strftime(
-                    formatter,
-                )
-                f.write(
-                    self.template(
-                        "day_base.j2",
-                        formatted_date=formatted_date,
-                        date=date,
-                    ),
-                )
-
-        for date in self.db.get_all_dates(self.config.get("ignore_dates")):
+        dates = self.db.get_all_dates(self.config.get("ignore_dates"))
+
+        # Remove pages of dates without assets and the templates included by
+        # them, e.g. after files were removed while watching
+        pages = {f"{date}.md" for date in dates}
+        for page in self.dirs.docs_dir.glob("????-??-??.md"):
+            if page.name not in pages:
+                page.unlink()
+        templates = {f"{date}_{part}.md" for date in dates for part in DAY_TEMPLATES}
+        for part in DAY_TEMPLATES:
+            for template in self.dirs.templates_dir.glob(f"????-??-??_{part}.md"):
+                if template.name not in templates:
+                    template.unlink()
+
+        for date in dates:
             if date is None:
                 continue
 
             yield dict(
                 name=str(date),
-                actions=[(_generate_day_page, (date,))],
+                actions=[(self._generate_day_page, (date,))],
                 targets=[self.dirs.docs_dir / f"{date}.md"],
                 task_dep=[f"create_directory:{self.dirs.docs_dir}"],
-                uptodate=[False],
+                uptodate=[
+                    config_changed(
+                        self.page_fingerprint(("site", "strings"), str(date))
+                    )
+                ],
             )
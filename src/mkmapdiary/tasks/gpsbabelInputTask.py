@@ -18,6 +18,12 @@ class GpsbabelInputTask(MultiFormat):
         self.__sources: list[PosixPath] = []
         self.__options: dict[PosixPath, str] = {}
 
+    def forget_source(self, source: PosixPath) -> None:
+        derived = self.derived_paths(source)
+        self.__sources = [s for s in self.__sources if s not in derived]
+        self.__options.pop(source, None)
+        super().forget_source(source)
+
     def __handle(
         self, source: PosixPath, calibration: Calibration, option: str
     ) -> list[Any]:
@@ -1,4 +1,5 @@
-import bisect
+import itertools
+import json
 import logging
 from collections.abc import Iterator
 from pathlib import Path, PosixPath
@@ -6,7 +7,7 @@ from typing import Any
 
 import gpxpy
 import gpxpy.gpx
-import tzfpy
+import numpy as np
 import whenever
 from doit import create_after
 from tabulate import tabulate
@@ -14,8 +15,12 @@ from whenever import Date
 
 from mkmapdiary.lib.asset import AssetRecord
 from mkmapdiary.lib.calibration import Calibration
+from mkmapdiary.lib.geoCorrelation import GeoCorrelator, epoch_us
 from mkmapdiary.lib.gpxCreator import GpxCreator
+from mkmapdiary.lib.shard import OVERVIEW_LINES_NAME
 from mkmapdiary.lib.statistics import Statistics
+from mkmapdiary.lib.timezones import get_resolver
+from mkmapdiary.lib.trackLevels import level_paths, write_track_levels
 from mkmapdiary.tasks.base.httpRequest import HttpRequest
 
 logger = logging.getLogger(__name__)
@@ -25,11 +30,29 @@ class GPXTask(HttpRequest):
     def __init__(self) -> None:
         super().__init__()
         self.__sources: list[PosixPath] = []
-        self.__statistics: dict[Date, Any] = {}
+
+    def forget_source(self, source: PosixPath) -> None:
+        derived = self.derived_paths(source)
+        self.__sources = [s for s in self.__sources if s not in derived]
+        super().forget_source(source)
 
     @property
     def track_statistics(self) -> dict[Date, Statistics]:
-        return dict(self.__statistics)
+        # Read from the file written by the GPX stage, which may have run in
+        # a worker process or in a previous build
+        path = self.__generate_statistics_filename()
+        if not path.exists():
+            return {}
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        return {
+            Date.parse_iso(date): Statistics.from_dict(statistics)
+            for date, statistics in data.items()
+        }
+
+    @property
+    def track_sources(self) -> list[PosixPath]:
+        return list(self.__sources)
 
     def handle_gpx(self, source: PosixPath, calibration: Calibration) -> list[Any]:
         self.__sources.append(source)
@@ -65,6 +88,36 @@ class GPXTask(HttpRequest):
         )
         return filename
 
+    def __generate_map_data_filename(self, date: Date) -> Path:
+        return self.dirs.files_dir / f"{date.format_iso()}.map.json"
+
+    def __generate_overview_filename(self) -> Path:
+        return self.dirs.files_dir / "overview.json"
+
+    def __generate_statistics_filename(self) -> Path:
+        return self.dirs.files_dir / "statistics.json"
+
+    def __generate_overview_lines_filename(self) -> Path:
+        return self.dirs.files_dir / OVERVIEW_LINES_NAME
+
+    def get_overview_data(self) -> dict[str, Any] | None:
+        """Overview of all dates: track levels, GPX overlay, statistics and time span."""
+        path = self.__generate_overview_filename()
+        if not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        data["statistics"] = Statistics.from_dict(data["statistics"])
+        return data
+
+    def get_map_data(self, date: Date) -> dict[str, Any] | None:
+        """Map data of a date: track levels and a GPX overlay without tracks."""
+        path = self.__generate_map_data_filename(date)
+        if not path.exists():
+            return None
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+
     def task_pre_gpx(self) -> dict[str, Any]:
         # Ensure that the assets and files directories exist
         return {
@@ -76,69 +129,110 @@ class GPXTask(HttpRequest):
             ],
         }
 
-    @create_after("pre_gpx", target_regex=r".*\.gpx")
-    def task_gpx2gpx(self) -> Iterator[dict[str, Any]]:
-        def _generate_all_gpx_files() -> None:
-            """Generate all GPX files in one batch operation."""
-            logger.debug("Generating all GPX files...")
-
-            # Create GpxCreator with sources
-            logger.debug("Fetching Geofabrik region data...")
-            index_data = self.httpRequest("https://download.geofabrik.de/index-v1.json")
-            assert isinstance(index_data, dict), "Invalid index data received"
-
-            language = self.config["site"]["locale"].split("_")[0]
-            # Create GpxCreator - it will automatically discover all dates
-            gc = GpxCreator(
-                index_data,
-                self.__sources,
-                self.db,
-                self.dirs.region_cache_dir,
-                skip_poi_detection=not self.config["features"]["poi_detection"][
-                    "enabled"
-                ],
-                priorities=self.config["features"]["poi_detection"]["priorities"],
-                simplification_tolerance=(
-                    self.config["features"]["track_simplification"]["tolerance"]
-                    if self.config["features"]["track_simplification"]["enabled"]
-                    else 0.0
-                ),
-                gettext=self.gettext,
-                language=language,
+    def _generate_all_gpx_files(self) -> None:
+        """Generate all GPX files in one batch operation."""
+        logger.debug("Generating all GPX files...")
+
+        # Create GpxCreator with sources
+        logger.debug("Fetching Geofabrik region data...")
+        index_data = self.httpRequest("https://download.geofabrik.de/index-v1.json")
+        assert isinstance(index_data, dict), "Invalid index data received"
+
+        language = self.config["site"]["locale"].split("_")[0]
+        # Create GpxCreator - it will automatically discover all dates
+        gc = GpxCreator(
+            index_data,
+            self.__sources,
+            self.db,
+            self.dirs.region_cache_dir,
+            skip_poi_detection=not self.config["features"]["poi_detection"]["enabled"],
+            priorities=self.config["features"]["poi_detection"]["priorities"],
+            simplification_tolerance=(
+                self.config["features"]["track_simplification"]["tolerance"]
+                if self.config["features"]["track_simplification"]["enabled"]
+                else 0.0
+            ),
+            gettext=self.gettext,
+            language=language,
+        )
+
+        with open(self.__generate_statistics_filename(), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    date.format_iso(): statistics.to_dict()
+                    for date, statistics in gc.get_statistics().items()
+                },
+                f,
             )
 
-            self.__statistics = gc.get_statistics()
+        # Generate GPX files for all discovered dates
+        all_dates = gc.get_available_dates()
 
-            # Generate GPX files for all discovered dates
-            all_dates = gc.get_available_dates()
+        # Filter out ignored dates
+        ignore_dates = self.config.get("ignore_dates", [])
+        if ignore_dates:
+            ignored = {Date.from_py_date(d) for d in ignore_dates}
+            all_dates = all_dates - ignored
 
-            # Filter out ignored dates
-            ignore_dates = self.config.get("ignore_dates", [])
-            if ignore_dates:
-                ignored = {Date.from_py_date(d) for d in ignore_dates}
-                all_dates = all_dates - ignored
+        # A shard only generates the dates of its range
+        if self.date_range is not None:
+            all_dates = {date for date in all_dates if date in self.date_range}
 
-            logger.debug(f"Generating GPX files for dates: {sorted(all_dates)}")
+        logger.debug(f"Generating GPX files for dates: {sorted(all_dates)}")
 
-            for date in all_dates:
-                dst = self.__generate_destination_filename(date)
+        # Replace the assets of a previous run, e.g. while watching
+        self.db.remove_assets(asset.id for asset in self.db.get_assets_by_type("gpx"))
 
-                # Create asset record
-                asset = AssetRecord(
-                    path=dst,
-                    type="gpx",
-                    display_date=date,
-                    effects=[],  # GPX files typically don't have effects, but initialize empty list
-                )
-                self.db.add_asset(asset)
+        # The overview for the index page is built from the in-memory
+        # data before to_xml simplifies the tracks in place
+        overview = gc.get_overview(all_dates)
+        overview_data = write_track_levels(
+            overview.lines, self.dirs.assets_dir, "index"
+        )
+        overview_data["gpx_data"] = overview.gpx_data
+        overview_data["statistics"] = overview.statistics.to_dict()
+        overview_data["start"] = overview.start and overview.start.format_iso()
+        overview_data["end"] = overview.end and overview.end.format_iso()
+        with open(self.__generate_overview_filename(), "w", encoding="utf-8") as f:
+            json.dump(overview_data, f)
+        if self.date_range is not None:
+            # The merge builds the overview of all shards from their lines
+            np.savez(self.__generate_overview_lines_filename(), *overview.lines)
+
+        for date in all_dates:
+            dst = self.__generate_destination_filename(date)
+
+            # Create asset record
+            asset = AssetRecord(
+                path=dst,
+                type="gpx",
+                display_date=date,
+                effects=[],  # GPX files typically don't have effects, but initialize empty list
+            )
+            self.db.add_asset(asset)
+
+            # Write the track levels for the map before to_xml simplifies
+            # the tracks in place
+            map_data = write_track_levels(
+                gc.get_track_lines(date),
+                self.dirs.assets_dir,
+                date.format_iso(),
+            )
+            map_data["gpx_data"] = gc.to_xml(date, include_tracks=False)
+            with open(
+                self.__generate_map_data_filename(date), "w", encoding="utf-8"
+            ) as f:
+                json.dump(map_data, f)
 
-                # Generate and write GPX content
-                gpx_out = gc.to_xml(date)
-                with open(dst, "w", encoding="utf-8") as f:
-                    f.write(gpx_out)
+            # Generate and write GPX content
+            gpx_out = gc.to_xml(date)
+            with open(dst, "w", encoding="utf-8") as f:
+                f.write(gpx_out)
 
-                logger.debug(f"Generated GPX file: {dst}")
+            logger.debug(f"Generated GPX file: {dst}")
 
+    @create_after("pre_gpx", target_regex=r".*\.gpx")
+    def task_gpx2gpx(self) -> Iterator[dict[str, Any]]:
         # Collect all target files by pre-scanning sources
         targets = []
 
@@ -158,19 +252,40 @@ class GPXTask(HttpRequest):
         all_dates = source_dates | set(
             self.db.get_geotagged_journal_dates(ignore_dates)
         )
+        if self.date_range is not None:
+            all_dates = {date for date in all_dates if date in self.date_range}
 
         # Create target file paths
+        targets.append(str(self.__generate_overview_filename()))
+        targets.append(str(self.__generate_statistics_filename()))
+        if self.date_range is not None:
+            targets.append(str(self.__generate_overview_lines_filename()))
+        targets.extend(str(path) for path in level_paths(self.dirs.assets_dir, "index"))
         for date in all_dates:
             dst = self.__generate_destination_filename(date)
             targets.append(str(dst))
+            targets.append(str(self.__generate_map_data_filename(date)))
+            targets.extend(
+                str(path)
+                for path in level_paths(self.dirs.assets_dir, date.format_iso())
+            )
 
         yield {
             "name": "generate_all_gpx",
-            "actions": [_generate_all_gpx_files],
+            "actions": [self._generate_all_gpx_files],
             "file_dep": [str(src) for src in self.__sources],
             "task_dep": ["geo_correlation", "qstarz2gpx"],
             "targets": targets,
             "clean": True,
+            "meta": {"updates_assets": True},
+        }
+
+    def _gpx_deps(self) -> dict[str, list[str]]:
+        self.__debug_dump_gpx()
+        return {
+            "file_dep": [
+                str(asset.path) for asset in self.db.get_assets_by_type("gpx")
+            ],
         }
 
     @create_after("end_gpx")
@@ -182,100 +297,72 @@ class GPXTask(HttpRequest):
         # - https://pydoit.org/task-creation.html#delayed-task-creation
         # - https://pydoit.org/dependencies.html#calculated-dependencies
 
-        def _gpx_deps() -> dict[str, list[str]]:
-            self.__debug_dump_gpx()
-            return {
-                "file_dep": [
-                    str(asset.path) for asset in self.db.get_assets_by_type("gpx")
-                ],
-            }
-
         return {
             "task_dep": ["gpx2gpx"],
             "file_dep": [str(src) for src in self.__sources],
-            "actions": [_gpx_deps],
+            "actions": [self._gpx_deps],
         }
 
     def __get_timed_coords(
-        self, gpx: gpxpy.gpx.GPX, coords: list[tuple[whenever.Instant, float, float]]
+        self, gpx: gpxpy.gpx.GPX, times: list[int], coords: list[tuple[float, float]]
     ) -> None:
-        # Extract coordinates from GPX format (lat, lon) and store as (time, lon, lat) for internal use
-        for wpt in gpx.waypoints:
-            if wpt.time is not None:
-                coords.append(
-                    (
-                        whenever.Instant.from_py_datetime(wpt.time),
-                        wpt.longitude,
-                        wpt.latitude,
-                    )
-                )
-        for trk in gpx.tracks:
-            for seg in trk.segments:
-                for pt in seg.points:
-                    if pt.time is not None:
-                        coords.append(
-                            (
-                                whenever.Instant.from_py_datetime(pt.time),
-                                pt.longitude,
-                                pt.latitude,
-                            )
-                        )
-        for rte in gpx.routes:
-            for rte_pt in rte.points:
-                if rte_pt.time is not None:
-                    coords.append(
-                        (
-                            whenever.Instant.from_py_datetime(rte_pt.time),
-                            rte_pt.longitude,
-                            rte_pt.latitude,
-                        )
-                    )
+        # Extract coordinates from GPX format (lat, lon) and store as epoch
+        # microseconds and (lon, lat) for internal use
+        points: Iterator[Any] = itertools.chain(
+            gpx.waypoints,
+            (pt for trk in gpx.tracks for seg in trk.segments for pt in seg.points),
+            (rte_pt for rte in gpx.routes for rte_pt in rte.points),
+        )
+        for pt in points:
+            if pt.time is not None:
+                times.append(epoch_us(pt.time))
+                coords.append((pt.longitude, pt.latitude))
 
     def task_geo_correlation(self) -> dict[str, Any]:
         def _update_positions() -> None:
-            coords: list[tuple[whenever.Instant, float, float]] = []
+            times: list[int] = []
+            coords: list[tuple[float, float]] = []
             for path in self.__sources:
                 with open(path, encoding="utf-8") as f:
                     gpx = gpxpy.parse(f)
-                self.__get_timed_coords(gpx, coords)
-            coords.sort(key=lambda x: x[0])
-            for asset in self.db.get_unpositioned_assets():
-                # Find closest coordinate by time
-                if asset.timestamp_utc is not None:
-                    assert isinstance(asset.timestamp_utc, whenever.Instant), (
-                        "Asset time should be a whenever.Instant"
-                    )
-                    asset_datetime: whenever.Instant = asset.timestamp_utc
-                    candidates = []
-                    pos = bisect.bisect_left(coords, asset_datetime, key=lambda x: x[0])
-                    if pos > 0:
-                        candidates.append(coords[pos - 1])
-                    if pos < len(coords):
-                        candidates.append(coords[pos])
-                    if candidates:
-                        closest = min(
-                            candidates, key=lambda x: abs(x[0] - asset_datetime)
-                        )
-                        diff_w: whenever.TimeDelta = closest[0] - asset_datetime
-                        diff = diff_w.in_seconds()
-                        if (
-                            abs(diff)
-                            < self.config["features"]["geo_correlation"][
-                                "max_time_diff"
-                            ]
-                        ):
-                            # closest contains (time, lon, lat), database expects separate lat, lon parameters
-                            assert asset.id is not None, "Asset must have an ID"
-                            self.db.update_asset_position(
-                                asset.id,
-                                closest[2],
-                                closest[1],
-                                bool(
-                                    diff
-                                ),  # Convert to bool as expected by the function
-                            )
+                self.__get_timed_coords(gpx, times, coords)
+            coord_array = np.array(coords, dtype=float).reshape(-1, 2)
+            correlator = GeoCorrelator(
+                np.array(times, dtype=np.int64), coord_array[:, 0], coord_array[:, 1]
+            )
+
+            # Find positions for all assets with a timestamp at once
+            assets = [
+                asset
+                for asset in self.db.get_unpositioned_assets()
+                if asset.timestamp_utc is not None
+            ]
+            asset_times = np.fromiter(
+                (epoch_us(asset.timestamp_utc) for asset in assets),  # type: ignore[arg-type]
+                dtype=np.int64,
+                count=len(assets),
+            )
+            settings = self.config["features"]["geo_correlation"]
+            result = correlator.correlate(
+                asset_times,
+                settings["max_time_diff"],
+                interpolate=settings["interpolate"],
+            )
+            for i in np.flatnonzero(result.valid):
+                asset = assets[i]
+                assert asset.id is not None, "Asset must have an ID"
+                self.db.update_asset_position(
+                    asset.id,
+                    float(result.latitude[i]),
+                    float(result.longitude[i]),
+                    bool(result.time_diff[i]),
+                )
 
             # Assigning timestamp_geo to assets
+            located = []
+            instants: list[whenever.Instant] = []
+            lons: list[float] = []
+            lats: list[float] = []
             for asset in self.db.assets:
                 if asset.timestamp_utc is None:
                     # No UTC timestamp to base geo timestamp on
@@ -293,11 +380,15 @@ class GPXTask(HttpRequest):
                     # Already has a geo timestamp
                     continue
 
-                asset_tz = tzfpy.get_tz(
-                    lng=asset.longitude,
-                    lat=asset.latitude,
-                )
-                asset.timestamp_geo = asset.timestamp_utc.to_tz(asset_tz)
+                located.append(asset)
+                instants.append(asset.timestamp_utc)
+                lons.append(asset.longitude)
+                lats.append(asset.latitude)
+
+            # Resolve timezones for all assets at once
+            local_times = get_resolver().to_local(instants, lons, lats)
+            for asset, local_time in zip(located, local_times, strict=True):
+                asset.timestamp_geo = local_time
 
             # Assigning display date to assets
             last_date = whenever.Date.MIN
@@ -318,6 +409,15 @@ class GPXTask(HttpRequest):
 
             self.db.has_display_date = True
 
+            if self.date_range is not None:
+                # Assets were selected by their UTC time; keep only those
+                # shown on a date of the shard
+                self.db.remove_assets(
+                    asset.id
+                    for asset in self.db.assets
+                    if asset.display_date not in self.date_range
+                )
+
             logger.debug(
                 "Asset positions updated:\n" + tabulate(*self.db.dump()),
                 extra={"icon": "🌐"},
@@ -328,6 +428,7 @@ class GPXTask(HttpRequest):
             "file_dep": [str(src) for src in self.__sources]
             + [str(asset.path) for asset in self.db.get_unpositioned_assets()],
             "uptodate": [False],
+            "meta": {"updates_assets": True},
         }
 
     def task_end_gpx(self) -> dict[str, Any]:
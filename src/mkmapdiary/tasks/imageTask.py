@@ -6,6 +6,7 @@ from PIL import Image
 
 from mkmapdiary.lib.asset import AssetRecord
 from mkmapdiary.lib.calibration import Calibration
+from mkmapdiary.lib.metrics import get_metrics
 
 from .base.baseTask import BaseTask
 from .base.exifReader import ExifReader
@@ -16,6 +17,11 @@ class ImageTask(BaseTask, ExifReader):
         super().__init__()
         self.__sources: list[PosixPath] = []
 
+    def forget_source(self, source: PosixPath) -> None:
+        derived = self.derived_paths(source)
+        self.__sources = [s for s in self.__sources if s not in derived]
+        super().forget_source(source)
+
     def handle_image(
         self, source: PosixPath, calibration: Calibration
     ) -> Iterator[AssetRecord]:
@@ -50,8 +56,17 @@ class ImageTask(BaseTask, ExifReader):
             asset = self.db.get_asset_by_path(dst)
             assert asset is not None
             orientation = asset.orientation if asset.orientation is not None else 1
+            metrics = get_metrics()
 
-            with Image.open(src) as img:
+            with (
+                metrics.timer(
+                    "image_conversion_seconds", "Duration of image conversions"
+                ).time(),
+                Image.open(src) as img,
+            ):
+                metrics.counter(
+                    "images_decoded_total", "Decoded images", format=img.format
+                ).inc()
                 # apply image orientation if needed
                 if orientation == 3:
                     img = img.rotate(180, expand=True)
@@ -62,6 +77,10 @@ class ImageTask(BaseTask, ExifReader):
 
                 img.convert("RGB").save(dst, **self.config["site"]["image_options"])
 
+            metrics.counter(
+                "bytes_written_total", "Bytes of written assets", type="image"
+            ).inc(dst.stat().st_size)
+
         for src in self.__sources:
             dst = self.__generate_destination_filename(src)
             yield dict(
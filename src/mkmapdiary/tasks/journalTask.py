@@ -3,11 +3,11 @@ import pathlib
 from collections.abc import Iterator
 from typing import Any
 
-import poiidx
-import shapely
 import whenever
 from doit import create_after
+from doit.tools import config_changed
 
+from ..lib.fingerprint import assets_fingerprint
 from ..lib.fmt import location_string, time_string
 from .base.baseTask import BaseTask
 
@@ -18,77 +18,70 @@ class JournalTask(BaseTask):
     def __init__(self) -> None:
         super().__init__()
 
-    @create_after("end_postprocessing")
-    def task_build_journal(self) -> Iterator[dict[str, Any]]:
-        """Generate journal pages."""
+    def _generate_journal(self, date: whenever.Date) -> None:
+        gallery_path = (
+            self.dirs.docs_dir / "templates" / f"{date.format_iso()}_journal.md"
+        )
 
-        def _generate_journal(date: whenever.Date) -> None:
-            gallery_path = (
-                self.dirs.docs_dir / "templates" / f"{date.format_iso()}_journal.md"
-            )
+        assets = []
 
-            assets = []
+        for asset in self.db.get_assets_by_date(
+            date,
+            ("markdown", "audio"),
+        ):
+            logger.debug(f"Processing asset: {asset.path} of type {asset.type}")
+            asset_data = self.db.get_asset_by_path(asset.path)
 
-            for asset in self.db.get_assets_by_date(
-                date,
-                ("markdown", "audio"),
-            ):
-                logger.debug(f"Processing asset: {asset.path} of type {asset.type}")
-                asset_data = self.db.get_asset_by_path(asset.path)
+            # Ensure asset_data is not None before creating item
+            if asset_data is not None:
+                location = location_string(asset_data)
+                time_str, timezone_str = time_string(asset_data, date)
 
-                # Ensure asset_data is not None before creating item
-                if asset_data is not None:
-                    location = location_string(asset_data)
-                    time_str, timezone_str = time_string(asset_data, date)
+                language = self.config["site"]["locale"].split("_")[0]
+                location_admin = self.location_admin(asset_data, language)
 
-                    if (
-                        self.config["features"]["poi_detection"]["enabled"]
-                        and asset_data.latitude is not None
-                        and asset_data.longitude is not None
-                    ):
-                        language = self.config["site"]["locale"].split("_")[0]
-                        location_admin = poiidx.get_administrative_hierarchy_string(
-                            shapely.geometry.Point(
-                                asset_data.longitude, asset_data.latitude
-                            ),
-                            language,
-                        )
-                    else:
-                        location_admin = None
+                item = dict(
+                    type=asset.type,
+                    path=pathlib.PosixPath(asset.path).name,
+                    time=time_str,
+                    timezone=timezone_str,
+                    latitude=asset_data.latitude,
+                    longitude=asset_data.longitude,
+                    location=location,
+                    location_admin=location_admin,
+                    id=asset_data.id,
+                )
+                assets.append(item)
 
-                    item = dict(
-                        type=asset.type,
-                        path=pathlib.PosixPath(asset.path).name,
-                        time=time_str,
-                        timezone=timezone_str,
-                        latitude=asset_data.latitude,
-                        longitude=asset_data.longitude,
-                        location=location,
-                        location_admin=location_admin,
-                        id=asset_data.id,
-                    )
-                    assets.append(item)
+        with open(gallery_path, "w") as f:
+            f.write(
+                self.template(
+                    "day_journal.j2",
+                    assets=assets,
+                ),
+            )
 
-            with open(gallery_path, "w") as f:
-                f.write(
-                    self.template(
-                        "day_journal.j2",
-                        assets=assets,
-                    ),
-                )
+    @create_after("end_postprocessing")
+    def task_build_journal(self) -> Iterator[dict[str, Any]]:
+        """Generate journal pages."""
 
         for date in self.db.get_all_dates():
+            assets = self.db.get_assets_by_date(date, ("markdown", "audio"))
+            page_fingerprint = self.page_fingerprint(
+                ("features", "site", "strings"),
+                str(date),
+                assets_fingerprint(assets),
+            )
             yield dict(
                 name=str(date),
-                actions=[(_generate_journal, [date])],
+                actions=[(self._generate_journal, [date])],
                 targets=[
                     self.dirs.docs_dir / "templates" / f"{date.format_iso()}_journal.md"
                 ],
-                file_dep=[str(asset.path) for asset in self.db.get_all_assets()],
-                calc_dep=["get_gpx_deps"],
+                file_dep=[str(asset.path) for asset in assets],
                 task_dep=[
                     f"create_directory:{self.dirs.templates_dir}",
                     "geo_correlation",
                 ],
-                uptodate=[False],
+                uptodate=[config_changed(page_fingerprint)],
             )
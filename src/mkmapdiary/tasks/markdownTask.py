@@ -13,6 +13,11 @@ class MarkdownTask(BaseTask):
         super().__init__()
         self.__sources: list[PosixPath] = []
 
+    def forget_source(self, source: PosixPath) -> None:
+        derived = self.derived_paths(source)
+        self.__sources = [s for s in self.__sources if s not in derived]
+        super().forget_source(source)
+
     def handle_markdown(
         self, source: PosixPath, calibration: Calibration
     ) -> Iterator[AssetRecord]:
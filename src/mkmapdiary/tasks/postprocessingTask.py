@@ -6,7 +6,6 @@ from typing import Any
 from doit import create_after
 from tabulate import tabulate
 
-from mkmapdiary.lib.asset import AssetRecord
 from mkmapdiary.postprocessors.autoRotator import AutoRotator
 from mkmapdiary.postprocessors.base.multiAssetPostprocessor import (
     MultiAssetPostprocessor,
@@ -28,16 +27,18 @@ class PostprocessingTask(BaseTask):
     def __init__(self) -> None:
         super().__init__()
 
+    def _postprocess_single(
+        self, processor_class: type[SingleAssetPostprocessor], asset_id: int
+    ) -> None:
+        asset = self.db.get_asset_by_id(asset_id)
+        assert asset is not None, f"Asset {asset_id} not found"
+        processor = processor_class(self.ai, self.config)
+        processor.processSingleAsset(asset)
+
     @create_after("end_gpx")
     def task_post_processing_single(self) -> Iterator[dict[str, Any]]:
         """Perform post-processing after GPX processing."""
 
-        def __process(
-            processor_class: type[SingleAssetPostprocessor], asset: AssetRecord
-        ) -> None:
-            processor = processor_class(self.ai, self.config)
-            processor.processSingleAsset(asset)
-
         # All single-asset postprocessors. Single-asset postprocessors process each asset individually.
         # They should be used for tasks that can be multithreaded and do not depend on previous postprocessing steps.
         # Single-asset postprocessors are guaranteed to run before any multi-asset postprocessors but
@@ -49,46 +50,51 @@ class PostprocessingTask(BaseTask):
 
         for processor_class in postprocessors:
             for asset in self.db.assets:
-                if not processor_class.filter(asset):
+                if not processor_class.filter(asset) or processor_class.is_processed(
+                    asset
+                ):
                     continue
                 yield {
                     "name": f"{processor_class.__name__}_{asset.path.stem}_{asset.id}",
-                    "actions": [(__process, (processor_class, asset))],
+                    "actions": [
+                        (self._postprocess_single, (processor_class, asset.id))
+                    ],
                     "task_dep": ["end_gpx"],
                     "uptodate": [False],
+                    "meta": {"updates_assets": [asset.id]},
                 }
 
-    @create_after("post_processing_single")
-    def task_post_processing(self) -> dict[str, Any]:
-        """Perform post-processing after GPX processing."""
-
-        def __process() -> None:
-            # All multi-asset postprocessors. Multi-asset postprocessors can access all assets.
-            # They should be used for tasks that require context from multiple assets, or that
-            # cannot be multithreaded or depend on previous postprocessing steps.
-            # Multi-asset postprocessors are guaranteed to run after all single-asset postprocessors and
-            # in the order they are listed here.
-            # In particular, AI tasks cannot be multithreaded due to thread-safety and memory constraints.
-            postprocessors: list[type[MultiAssetPostprocessor]] = [
-                ImageQualityAssessment,
-                DuplicateDetector,
-                AutoRotator,
-                # JournalSummarizer,
-                # ImageSummarizer,
-                # ImageEmbedder,
-            ]
+    def _postprocess_all(self) -> None:
+        # All multi-asset postprocessors. Multi-asset postprocessors can access all assets.
+        # They should be used for tasks that require context from multiple assets, or that
+        # cannot be multithreaded or depend on previous postprocessing steps.
+        # Multi-asset postprocessors are guaranteed to run after all single-asset postprocessors and
+        # in the order they are listed here.
+        # In particular, AI tasks cannot be multithreaded due to thread-safety and memory constraints.
+        postprocessors: list[type[MultiAssetPostprocessor]] = [
+            ImageQualityAssessment,
+            DuplicateDetector,
+            AutoRotator,
+            # JournalSummarizer,
+            # ImageSummarizer,
+            # ImageEmbedder,
+        ]
 
-            for processor_class in postprocessors:
+        for processor_class in postprocessors:
+            self.__gc()
+            processor = processor_class(self.ai, self.config)
+            with ThisMayTakeAWhile(logger, processor.info, icon="🛠️"):
+                processor.processAllAssets(self.db.assets)
                 self.__gc()
-                processor = processor_class(self.ai, self.config)
-                with ThisMayTakeAWhile(logger, processor.info, icon="🛠️"):
-                    processor.processAllAssets(self.db.assets)
-                    self.__gc()
 
+    @create_after("post_processing_single")
+    def task_post_processing(self) -> dict[str, Any]:
+        """Perform post-processing after GPX processing."""
         return {
-            "actions": [__process],
+            "actions": [self._postprocess_all],
             "task_dep": ["post_processing_single", "end_gpx"],
             "uptodate": [False],
+            "meta": {"updates_assets": True},
         }
 
     def __gc(self) -> None:
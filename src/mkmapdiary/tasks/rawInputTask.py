@@ -3,11 +3,9 @@ from collections.abc import Generator, Iterator
 from pathlib import PosixPath
 from typing import Any
 
-import imageio.v2 as imageio
-import rawpy
-
 from mkmapdiary.lib.asset import AssetRecord
 from mkmapdiary.lib.calibration import Calibration
+from mkmapdiary.lib.metrics import get_metrics
 from mkmapdiary.tasks.base.multiFormat import MultiFormat
 
 from .base.exifReader import ExifReader
@@ -19,6 +17,11 @@ class RawInputTask(MultiFormat, ExifReader):
         self.setup_multiformat("raw", self.__handle_raw)
         self.__sources: list[PosixPath] = []
 
+    def forget_source(self, source: PosixPath) -> None:
+        derived = self.derived_paths(source)
+        self.__sources = [s for s in self.__sources if s not in derived]
+        super().forget_source(source)
+
     @abstractmethod
     def handle_image(self, source: PosixPath, calibration: Calibration) -> Generator:
         raise NotImplementedError
@@ -53,6 +56,19 @@ class RawInputTask(MultiFormat, ExifReader):
         """Convert a RAW image to JPEG."""
 
         def _convert(src: PosixPath, dst: PosixPath) -> None:
+            metrics = get_metrics()
+            with metrics.timer(
+                "raw_conversion_seconds", "Duration of RAW image conversions"
+            ).time():
+                _decode(src, dst)
+            metrics.counter(
+                "bytes_written_total", "Bytes of written assets", type="raw"
+            ).inc(dst.stat().st_size)
+
+        def _decode(src: PosixPath, dst: PosixPath) -> None:
+            import imageio.v2 as imageio
+            import rawpy
+
             if self.config["features"]["cr2"]["use_thumbnail"]:
                 with rawpy.imread(str(src)) as raw:
                     thumb = raw.extract_thumb()
@@ -69,6 +85,9 @@ class RawInputTask(MultiFormat, ExifReader):
                         )
 
             with rawpy.imread(str(src)) as raw:
+                get_metrics().counter(
+                    "images_decoded_total", "Decoded images", format="raw"
+                ).inc()
                 rgb = raw.postprocess(
                     use_camera_wb=True,  # Kamera-Weißabgleich
                     no_auto_bright=False,  # automatische Helligkeit
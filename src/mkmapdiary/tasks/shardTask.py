@@ -0,0 +1,46 @@
+import logging
+from typing import Any
+
+from doit import create_after
+
+from ..lib.shard import ShardManifest
+from .base.baseTask import BaseTask
+
+logger = logging.getLogger(__name__)
+
+
+class ShardTask(BaseTask):
+    def __init__(self) -> None:
+        super().__init__()
+
+    def _export_shard(self) -> None:
+        assert self.date_range is not None
+        manifest = ShardManifest(
+            date_range=self.date_range,
+            dates=self.db.get_all_dates(),
+            assets=self.db.get_all_assets(),
+        )
+        manifest.save(self.dirs.build_dir)
+        logger.info(
+            f"Shard {self.date_range}: {len(manifest.dates)} dates, "
+            f"{len(manifest.assets)} assets",
+            extra={"icon": "🧩"},
+        )
+
+    @create_after("end_postprocessing")
+    def task_export_shard(self) -> dict[str, Any]:
+        """Write the manifest of a shard, after all pages of its dates."""
+        if self.date_range is None:
+            return {"actions": []}
+
+        return {
+            "actions": [self._export_shard],
+            "task_dep": [
+                "build_day_page",
+                "build_gallery",
+                "build_journal",
+                "build_tags",
+                "get_gpx_deps",
+            ],
+            "uptodate": [False],
+        }
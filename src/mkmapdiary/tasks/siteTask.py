@@ -5,17 +5,14 @@ import shutil
 from collections.abc import Iterator
 from typing import Any
 
-import gpxpy
-import gpxpy.gpx
-import poiidx
 import sass
-import shapely
 import yaml
 from doit import create_after
+from doit.tools import config_changed
 
 from mkmapdiary.lib.highlights import Highlights
-from mkmapdiary.lib.statistics import Statistics
 
+from ..lib.fingerprint import assets_fingerprint
 from ..lib.fmt import location_string, time_string
 from .base.httpRequest import HttpRequest
 
@@ -100,139 +97,93 @@ class SiteTask(HttpRequest):
             uptodate=[False],
         )
 
-    @create_after("end_postprocessing")
-    def task_build_index_page(self) -> dict[str, Any]:
-        def _generate_index_page() -> None:
-            index_path = self.dirs.docs_dir / "index.md"
-
-            images = self.db.get_assets_by_type("image")
-
-            logger.info("Generating index page data ...")
-            page_info = Highlights(images, self.config)
-            logger.info("Generating index page ...")
-            logger.debug(f"Gallery assets: {len(page_info.gallery_assets)}")
-            logger.debug(f"Map assets: {len(page_info.map_assets)}")
-            logger.debug(f"With map: {page_info.with_map}")
-            logger.debug(f"Gallery rows: {page_info.gallery_rows}")
-
-            geo_assets = []
-            for i, geo_asset in enumerate(page_info.map_assets):
-                geo_item = dict(
-                    photo="assets/" + str(geo_asset.path).split("/")[-1],
-                    thumbnail="assets/" + str(geo_asset.path).split("/")[-1],
-                    lat=geo_asset.latitude,
-                    lng=geo_asset.longitude,
-                    index=i + len(page_info.gallery_assets),
-                    quality=geo_asset.quality,
-                )
-                geo_assets.append(geo_item)
-
-            # Collect all GPX data and statistics, respecting ignore_dates
-            ignore_dates = self.config.get("ignore_dates", [])
-            all_dates = self.db.get_all_dates(ignore_dates)
-
-            # Merge all GPX tracks into one
-            merged_gpx = gpxpy.gpx.GPX()
-            overall_statistics = Statistics()
-            first_timestamp = None
-            last_timestamp = None
-
-            for date in all_dates:
-                gpx_assets = self.db.get_assets_by_date(date, "gpx")
-                if gpx_assets:
-                    with open(gpx_assets[0].path) as f:
-                        gpx_content = gpxpy.parse(f)
-                        # Add all tracks from this GPX to the merged one
-                        for track in gpx_content.tracks:
-                            merged_gpx.tracks.append(track)
-                        for waypoint in gpx_content.waypoints:
-                            merged_gpx.waypoints.append(waypoint)
-                        for route in gpx_content.routes:
-                            merged_gpx.routes.append(route)
-
-                    # Add statistics from this date if available
-                    if date in self.track_statistics:  # type: ignore[attr-defined]
-                        date_stats = self.track_statistics[date]  # type: ignore[attr-defined]
-                        overall_statistics.distance += date_stats.distance
-                        overall_statistics.elevation_gain += date_stats.elevation_gain
-                        overall_statistics.elevation_loss += date_stats.elevation_loss
-                        overall_statistics.time_moving += date_stats.time_moving
-
-            # Calculate total time from merged GPX tracks
-            if merged_gpx.tracks:
-                for track in merged_gpx.tracks:
-                    for segment in track.segments:
-                        for point in segment.points:
-                            if point.time is not None:
-                                if (
-                                    first_timestamp is None
-                                    or point.time < first_timestamp
-                                ):
-                                    first_timestamp = point.time
-                                if (
-                                    last_timestamp is None
-                                    or point.time > last_timestamp
-                                ):
-                                    last_timestamp = point.time
-
-            # Set total_time if we have both timestamps
-            if first_timestamp is not None and last_timestamp is not None:
-                overall_statistics.total_time = (
-                    last_timestamp - first_timestamp
-                ).total_seconds()
-
-            # Convert merged GPX to XML if we have any tracks
-            gpx_data = merged_gpx.to_xml() if merged_gpx.tracks else None
-
-            # Only include statistics if we have meaningful data
-            track_statistics = (
-                overall_statistics if overall_statistics.distance > 0 else None
+    def _generate_index_page(self) -> None:
+        index_path = self.dirs.docs_dir / "index.md"
+
+        images = self.db.get_assets_by_type("image")
+
+        logger.info("Generating index page data ...")
+        page_info = Highlights(images, self.config)
+        logger.info("Generating index page ...")
+        logger.debug(f"Gallery assets: {len(page_info.gallery_assets)}")
+        logger.debug(f"Map assets: {len(page_info.map_assets)}")
+        logger.debug(f"With map: {page_info.with_map}")
+        logger.debug(f"Gallery rows: {page_info.gallery_rows}")
+
+        geo_assets = []
+        for i, geo_asset in enumerate(page_info.map_assets):
+            geo_item = dict(
+                photo="assets/" + str(geo_asset.path).split("/")[-1],
+                thumbnail="assets/" + str(geo_asset.path).split("/")[-1],
+                lat=geo_asset.latitude,
+                lng=geo_asset.longitude,
+                index=i + len(page_info.gallery_assets),
+                quality=geo_asset.quality,
             )
+            geo_assets.append(geo_item)
+
+        # The overview track, statistics and time span are prepared by
+        # the GPX stage; tracks are loaded by the map in multiple
+        # resolutions, only waypoints and routes are embedded into the page.
+        overview = self.get_overview_data()  # type: ignore[attr-defined]
+        if overview is not None and overview["bounds"] is not None:
+            track_levels = {
+                "bounds": overview["bounds"],
+                "levels": overview["levels"],
+            }
+            gpx_data = overview["gpx_data"]
+        else:
+            track_levels = None
+            gpx_data = None
+
+        # Only include statistics if we have meaningful data
+        track_statistics = (
+            overview["statistics"]
+            if overview is not None and overview["statistics"].distance > 0
+            else None
+        )
 
-            gallery_items = []
-            for asset in page_info.gallery_assets + page_info.map_assets:
-                dict_asset = dataclasses.asdict(asset)
-                dict_asset["time"], dict_asset["timezone"] = time_string(
-                    asset,
-                    None,
-                )
-                dict_asset["location"] = location_string(asset)
-                if (
-                    self.config["features"]["poi_detection"]["enabled"]
-                    and asset.latitude is not None
-                    and asset.longitude is not None
-                ):
-                    dict_asset["location_admin"] = (
-                        poiidx.get_administrative_hierarchy_string(
-                            shapely.geometry.Point(asset.longitude, asset.latitude),
-                        )
-                    )
-                else:
-                    dict_asset["location_admin"] = None
-                gallery_items.append(dict_asset)
-
-            with open(index_path, "w") as f:
-                f.write(
-                    self.template(
-                        "index.j2",
-                        gallery_images=gallery_items,
-                        map_images=geo_assets,
-                        with_map=page_info.with_map,
-                        gallery_rows=page_info.gallery_rows,
-                        gpx_data=gpx_data,
-                        track_statistics=track_statistics,
-                    ),
-                )
+        gallery_items = []
+        for asset in page_info.gallery_assets + page_info.map_assets:
+            dict_asset = dataclasses.asdict(asset)
+            dict_asset["time"], dict_asset["timezone"] = time_string(
+                asset,
+                None,
+            )
+            dict_asset["location"] = location_string(asset)
+            dict_asset["location_admin"] = self.location_admin(asset)
+            gallery_items.append(dict_asset)
+
+        with open(index_path, "w") as f:
+            f.write(
+                self.template(
+                    "index.j2",
+                    gallery_images=gallery_items,
+                    map_images=geo_assets,
+                    with_map=page_info.with_map,
+                    gallery_rows=page_info.gallery_rows,
+                    gpx_data=gpx_data,
+                    track_levels=track_levels,
+                    track_statistics=track_statistics,
+                ),
+            )
 
+    @create_after("end_postprocessing")
+    def task_build_index_page(self) -> dict[str, Any]:
+        images = self.db.get_assets_by_type("image")
+        page_fingerprint = self.page_fingerprint(
+            ("features", "site", "strings"),
+            assets_fingerprint(images),
+            self.get_overview_data(),  # type: ignore[attr-defined]
+        )
         return dict(
-            actions=[_generate_index_page],
-            file_dep=[str(asset.path) for asset in self.db.get_all_assets()],
-            calc_dep=["get_gpx_deps"],
+            actions=[self._generate_index_page],
+            file_dep=[str(asset.path) for asset in images],
             task_dep=[
                 f"create_directory:{self.dirs.dist_dir}",
             ],
             targets=[self.dirs.docs_dir / "index.md"],
-            uptodate=[False],
+            uptodate=[config_changed(page_fingerprint)],
         )
 
     def task_compile_css(self) -> dict[str, Any]:
@@ -308,6 +259,15 @@ class SiteTask(HttpRequest):
             ],
         }
 
+    def _build_site(self, config_file: pathlib.Path) -> None:
+        from ..lib.siteBuild import build_site
+
+        stats = build_site(config_file, self.dirs.build_dir / "site_manifest.json")
+        logger.info(
+            f"Rendered {stats.rendered} of {stats.pages} pages, "
+            f"linked {stats.linked} files, removed {stats.removed} stale files"
+        )
+
     @create_after("end_postprocessing")
     def task_build_site(self) -> dict[str, Any]:
         """Build the mkdocs site."""
@@ -324,11 +284,15 @@ class SiteTask(HttpRequest):
             for asset in self.__simple_assets:
                 yield self.dirs.docs_dir / asset
 
+        config_file = self.dirs.build_dir / "mkdocs.yml"
+
+        if self.config["site"]["incremental"]:
+            action: Any = (self._build_site, (config_file,))
+        else:
+            action = "mkdocs build --clean --config-file " + str(config_file)
+
         return dict(
-            actions=[
-                "mkdocs build --clean --config-file "
-                + str(self.dirs.build_dir / "mkdocs.yml"),
-            ],
+            actions=[action],
             file_dep=list(_generate_file_deps()),
             task_dep=[
                 f"create_directory:{self.dirs.dist_dir}",
@@ -2,6 +2,8 @@ import logging
 from collections.abc import Callable
 from typing import Any
 
+from mkmapdiary.lib.metrics import get_metrics
+
 logger = logging.getLogger(__name__)
 
 
@@ -19,6 +21,7 @@ def with_cache(
     assert callable(compute_func), "compute_func must be callable"
 
     if bypass_cache:
+        _count(key, "bypass")
         return compute_func(*args)
 
     if cache_args is None:
@@ -29,9 +32,17 @@ def with_cache(
     try:
         value = cache[full_key]
         logger.debug(f"Cache hit for key: {full_key}")
+        _count(key, "hit")
         return value
     except KeyError:
+        _count(key, "miss")
         value = compute_func(*args)
         cache[full_key] = value
         logger.debug(f"Cache miss for key: {full_key}. Computed and cached new value.")
         return value
+
+
+def _count(key: str, result: str) -> None:
+    get_metrics().counter(
+        "cache_requests_total", "Lookups of cached values", key=key, result=result
+    ).inc()
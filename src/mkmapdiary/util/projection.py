@@ -1,43 +1,62 @@
 import math
-from typing import Any
+import threading
+from typing import TYPE_CHECKING, Any
 
 import numpy as np
-from pyproj import CRS, Transformer
-from shapely.ops import transform
+import shapely
+
+if TYPE_CHECKING:
+    from pyproj import Transformer
+
+WGS84_EPSG = 4326
+
+# pyproj transformers must not be shared between threads, so every thread
+# keeps its own cache of transformer pairs, keyed by EPSG code.
+_transformers = threading.local()
+
+
+def _get_transformers(epsg: int) -> tuple["Transformer", "Transformer"]:
+    """Return the cached (to local, to WGS84) transformer pair for an EPSG code."""
+    cache: dict[int, tuple[Transformer, Transformer]] | None = getattr(
+        _transformers, "cache", None
+    )
+    if cache is None:
+        cache = _transformers.cache = {}
+
+    if epsg not in cache:
+        import pyproj
+
+        crs_proj = pyproj.CRS.from_epsg(epsg)
+        cache[epsg] = (
+            pyproj.Transformer.from_crs(WGS84_EPSG, crs_proj, always_xy=True),
+            pyproj.Transformer.from_crs(crs_proj, WGS84_EPSG, always_xy=True),
+        )
+    return cache[epsg]
 
 
 class LocalProjection:
     @staticmethod
-    def __get_local_projection(lon: float, lat: float) -> CRS:
+    def __get_local_projection(lon: float, lat: float) -> int:
         # Interface uses (lon, lat) format for consistency with GeoJSON and web standards
         # UPS zones
         if lat >= 84:
-            return CRS.from_epsg(32661)  # UPS North
+            return 32661  # UPS North
         elif lat <= -80:
-            return CRS.from_epsg(32761)  # UPS South
+            return 32761  # UPS South
 
         # UTM zones
         zone = int(math.floor((lon + 180) / 6) + 1)
         hemisphere = "north" if lat >= 0 else "south"
-        epsg_code = 32600 + zone if hemisphere == "north" else 32700 + zone
-        return CRS.from_epsg(epsg_code)
+        return 32600 + zone if hemisphere == "north" else 32700 + zone
 
     def __init__(self, shape: Any) -> None:
         centroid = shape.centroid
 
         # pick CRS dynamically - centroid.x is longitude, centroid.y is latitude (Shapely uses (x=lon, y=lat))
-        self.__crs_proj = self.__get_local_projection(centroid.x, centroid.y)
-        self.__crs_wgs = "EPSG:4326"
+        self.epsg = self.__get_local_projection(centroid.x, centroid.y)
 
-        self.__transformer_to_proj = Transformer.from_crs(
-            self.__crs_wgs,
-            self.__crs_proj,
-            always_xy=True,
-        )
-        self.__transformer_to_wgs = Transformer.from_crs(
-            self.__crs_proj,
-            self.__crs_wgs,
-            always_xy=True,
+        self.__transformer_to_proj, self.__transformer_to_wgs = _get_transformers(
+            self.epsg
         )
 
     def to_local_np(self, lonlat_array: np.ndarray) -> np.ndarray:
@@ -55,7 +74,7 @@ class LocalProjection:
         return np.column_stack((lon_array, lat_array))  # shape (n, 2)
 
     def to_local(self, shape: Any) -> Any:
-        return transform(self.__transformer_to_proj.transform, shape)
+        return shapely.transform(shape, self.to_local_np)
 
     def to_wgs(self, shape: Any) -> Any:
-        return transform(self.__transformer_to_wgs.transform, shape)
+        return shapely.transform(shape, self.to_wgs_np)
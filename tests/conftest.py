@@ -0,0 +1,123 @@
+import datetime
+import json
+import pathlib
+import platform
+import statistics
+import time
+from collections.abc import Callable
+from typing import Any
+
+import pytest
+from tabulate import tabulate
+
+BENCHMARK_FORMAT = 1
+_results = pytest.StashKey[dict[str, dict[str, Any]]]()
+
+
+def pytest_addoption(parser: pytest.Parser) -> None:
+    parser.addoption(
+        "--benchmark",
+        action="store_true",
+        default=False,
+        help="Run the benchmarks; add -m benchmark to run nothing else.",
+    )
+    parser.addoption(
+        "--benchmark-json",
+        metavar="PATH",
+        default=None,
+        help="Write the results of the benchmarks (run with --benchmark) to PATH.",
+    )
+
+
+def pytest_configure(config: pytest.Config) -> None:
+    config.stash[_results] = {}
+
+
+def pytest_collection_modifyitems(
+    config: pytest.Config, items: list[pytest.Item]
+) -> None:
+    # Benchmarks take long and only run when asked for
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmarks only run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
+class Benchmark:
+    def __init__(self, name: str, results: dict[str, dict[str, Any]]) -> None:
+        self.__name = name
+        self.__results = results
+
+    def __call__(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        rounds: int = 5,
+        calls: int = 1,
+        setup: Callable[[], tuple[Any, ...]] | None = None,
+    ) -> Any:
+        """Time a function and record the time per call of each round.
+
+        Fast functions need several calls per round to be timed reliably. The
+        setup, if given, provides fresh arguments per round.
+        """
+        times = []
+        result = None
+        for _ in range(rounds):
+            call_args = setup() if setup is not None else args
+            started = time.perf_counter()
+            for _ in range(calls):
+                result = func(*call_args)
+            times.append((time.perf_counter() - started) / calls)
+        self.__results[self.__name] = {
+            "rounds": rounds,
+            "calls": calls,
+            "min": min(times),
+            "median": statistics.median(times),
+            "mean": statistics.fmean(times),
+            "max": max(times),
+        }
+        return result
+
+
+@pytest.fixture
+def benchmark(request: pytest.FixtureRequest) -> Benchmark:
+    return Benchmark(request.node.name, request.config.stash[_results])
+
+
+def pytest_terminal_summary(
+    terminalreporter: Any, exitstatus: int, config: pytest.Config
+) -> None:
+    results = config.stash[_results]
+    if not results:
+        return
+    terminalreporter.section("benchmarks")
+    terminalreporter.write_line(
+        tabulate(
+            [
+                (name, r["rounds"], f"{r['min']:.4f}", f"{r['median']:.4f}")
+                for name, r in sorted(results.items())
+            ],
+            headers=["Benchmark", "Rounds", "Min (s)", "Median (s)"],
+        )
+    )
+
+
+def pytest_sessionfinish(session: pytest.Session, exitstatus: int) -> None:
+    path = session.config.getoption("--benchmark-json")
+    results = session.config.stash[_results]
+    if path is None or not results:
+        return
+    data = {
+        "format": BENCHMARK_FORMAT,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        "machine": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "processor": platform.machine(),
+        },
+        "benchmarks": results,
+    }
+    pathlib.Path(path).write_text(json.dumps(data, indent=2, sort_keys=True) + "\n")
@@ -0,0 +1,95 @@
+import pathlib
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from shapely.geometry import box
+from shapely.geometry.base import BaseGeometry
+
+from mkmapdiary.lib.adminLookup import AdminLookup
+from mkmapdiary.lib.cache import Cache
+from mkmapdiary.lib.poiLookup import MemoryPoiBackend
+
+
+class CountingBackend(MemoryPoiBackend):
+    def __init__(self) -> None:
+        super().__init__(
+            [],
+            [
+                {
+                    "name": "Germany",
+                    "admin_level": 2,
+                    "coordinates": box(5, 47, 15, 55),
+                },
+                {"name": "Hesse", "admin_level": 4, "coordinates": box(8, 49, 10, 51)},
+            ],
+        )
+        self.lookups = 0
+        self.lock = threading.Lock()
+
+    def get_administrative_hierarchy_string(
+        self,
+        shape: BaseGeometry,
+        lang: str | None = None,
+        max_admin_level: int | None = None,
+    ) -> str:
+        with self.lock:
+            self.lookups += 1
+        time.sleep(0.05)
+        return super().get_administrative_hierarchy_string(shape, lang, max_admin_level)
+
+
+def test_nearby_coordinates_share_lookup() -> None:
+    backend = CountingBackend()
+    lookup = AdminLookup(backend=backend)
+
+    assert lookup.get(8.68211, 50.11091) == "Hesse, Germany"
+    assert lookup.get(8.68212, 50.11089) == "Hesse, Germany"
+    assert backend.lookups == 1
+
+    assert lookup.get(7.0, 50.0) == "Germany"
+    assert lookup.get(8.68211, 50.11091, max_admin_level=2) == "Germany"
+    assert backend.lookups == 3
+
+
+def test_concurrent_lookups_are_deduplicated() -> None:
+    backend = CountingBackend()
+    lookup = AdminLookup(backend=backend)
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        results = list(executor.map(lambda _: lookup.get(8.68, 50.11), range(32)))
+
+    assert results == ["Hesse, Germany"] * 32
+    assert backend.lookups == 1
+
+
+def test_results_are_persisted(tmp_path: pathlib.Path) -> None:
+    cache = Cache(tmp_path / "cache.sqlite")
+    backend = CountingBackend()
+    assert AdminLookup(cache, backend).get(8.68, 50.11) == "Hesse, Germany"
+
+    # A new lookup, e.g. in the next build, uses the persisted result
+    assert AdminLookup(cache, backend).get(8.68, 50.11) == "Hesse, Germany"
+    assert backend.lookups == 1
+
+
+def test_failures_are_not_memoized() -> None:
+    class FailingBackend(CountingBackend):
+        def get_administrative_hierarchy_string(
+            self,
+            shape: BaseGeometry,
+            lang: str | None = None,
+            max_admin_level: int | None = None,
+        ) -> str:
+            if self.lookups == 0:
+                self.lookups += 1
+                raise RuntimeError("database unavailable")
+            return super().get_administrative_hierarchy_string(
+                shape, lang, max_admin_level
+            )
+
+    lookup = AdminLookup(backend=FailingBackend())
+    with pytest.raises(RuntimeError):
+        lookup.get(8.68, 50.11)
+    assert lookup.get(8.68, 50.11) == "Hesse, Germany"
@@ -1,10 +1,13 @@
 import dataclasses
 import logging
-from collections.abc import Generator
+import re
+from collections.abc import Callable, Generator
+from concurrent.futures import ThreadPoolExecutor
 
+import llm_dataclass
 import pytest
 
-from mkmapdiary.lib.llm import batch_reduce
+from mkmapdiary.lib.llm import batch_reduce, estimate_tokens, pack_batches
 
 logger = logging.getLogger(__name__)
 
@@ -94,3 +97,100 @@ def test_batch_reduce_large_input() -> None:
     result_ids = [item.id for item in result]
     assert result_ids == expected_ids
     assert llm_callback("") == "done"
+
+
+def selection_callback(keep: int) -> Callable[[str], str]:
+    """LLM stand-in selecting the first `keep` items of every batch."""
+
+    def llm_callback(prompt: str) -> str:
+        ids = re.findall(r"<id>(\d+)</id>", prompt)[:keep]
+        return (
+            "<SelectorClass>"
+            + "".join(f"<id>{i}</id>" for i in ids)
+            + "</SelectorClass>"
+        )
+
+    return llm_callback
+
+
+def test_pack_batches() -> None:
+    assert pack_batches([], 10) == []
+    assert pack_batches([3, 3, 3], 10) == [[0, 1, 2]]
+    # Batches are filled evenly instead of leaving a small remainder
+    assert pack_batches([2] * 6, 10) == [[0, 1, 2], [3, 4, 5]]
+    assert pack_batches([4, 4, 4, 4, 4], 10) == [[0, 1], [2, 3], [4]]
+    # Oversized items get a batch of their own
+    assert pack_batches([1, 20, 1], 10) == [[0], [1], [2]]
+
+
+def test_batch_reduce_measured_batches() -> None:
+    prompts: list[str] = []
+    callback = selection_callback(2)
+
+    def llm_callback(prompt: str) -> str:
+        prompts.append(prompt)
+        return callback(prompt)
+
+    # Two-digit ids give all items the same size
+    input_data = [InputClass(id=i, name=f"Test {i}") for i in range(10, 50)]
+    item_tokens = estimate_tokens(
+        llm_dataclass.Schema(InputClass).dumps(input_data[0]) + "\n"
+    )
+    context = 100 + estimate_tokens("Test prompt\n\n") + 10 * item_tokens
+
+    result = batch_reduce(
+        3,
+        "Test prompt",
+        llm_callback,
+        input_data,
+        SelectorClass,
+        context=context,
+        reserve=100,
+    )
+
+    # Ten items fit into a batch: 40 items in four batches -> 8 -> 2
+    assert len(prompts) == 4 + 1
+    assert all(len(re.findall("<id>", prompt)) == 10 for prompt in prompts[:4])
+    assert [item.id for item in result] == [10, 11]
+
+
+def test_batch_reduce_concurrent() -> None:
+    input_data = [InputClass(id=i, name=f"Test {i}") for i in range(30)]
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        result = batch_reduce(
+            5,
+            "Test prompt",
+            selection_callback(1),
+            input_data,
+            SelectorClass,
+            context=4000,
+            estimate=500,
+            executor=executor,
+        )
+    # Up to 7 items fit into a batch, so 30 items are packed evenly into
+    # five batches; the first item of every batch is kept in batch order
+    assert [item.id for item in result] == [0, 6, 12, 18, 24]
+
+
+def test_batch_reduce_serializes_once(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = 0
+    dumps = llm_dataclass.Schema.dumps
+
+    def counting_dumps(self: llm_dataclass.Schema, obj: object) -> str:
+        nonlocal calls
+        calls += 1
+        return dumps(self, obj)
+
+    monkeypatch.setattr(llm_dataclass.Schema, "dumps", counting_dumps)
+
+    input_data = [InputClass(id=i, name=f"Test {i}") for i in range(20)]
+    batch_reduce(
+        2,
+        "Test prompt",
+        selection_callback(2),
+        input_data,
+        SelectorClass,
+        context=4000,
+        estimate=1000,
+    )
+    assert calls == len(input_data)
@@ -0,0 +1,243 @@
+"""Benchmarks of the hot paths of a build.
+
+Run with ``pytest --benchmark -m benchmark --benchmark-json=results.json`` and compare two
+runs with ``tools/compare_benchmarks.py``. No network is needed.
+"""
+
+import copy
+import functools
+import pathlib
+import shutil
+from typing import Any
+
+import gpxpy.gpx
+import imagehash
+import numpy as np
+import pytest
+import whenever
+
+from mkmapdiary.commands.generate_synthetic import generate_synthetic_data
+from mkmapdiary.lib.asset import AssetRecord
+from mkmapdiary.lib.assetRegistry import AssetRegistry
+from mkmapdiary.lib.cache import Cache
+from mkmapdiary.lib.calibration import Calibration
+from mkmapdiary.lib.geoCluster import GeoCluster
+from mkmapdiary.lib.gpxCreator import GpxCreator
+from mkmapdiary.lib.highlights import Highlights
+from mkmapdiary.lib.statistics import Statistics
+from mkmapdiary.lib.trackProcessing import remove_extremes, simplify_lonlat, smooth
+from mkmapdiary.postprocessors.duplicateDetector import DuplicateDetector
+from mkmapdiary.tasks.base.baseTask import BaseTask
+from mkmapdiary.tasks.base.exifReader import ExifReader
+
+pytestmark = pytest.mark.benchmark
+
+START = whenever.Instant.from_utc(2024, 5, 1, 6)
+DAYS = 30
+
+
+def make_assets(
+    count: int,
+    types: tuple[str, ...] = ("image", "image", "image", "markdown", "audio"),
+) -> list[AssetRecord]:
+    """Assets spread over a month, two thirds of them geotagged."""
+    rng = np.random.default_rng(0)
+    seconds = np.sort(rng.uniform(0, DAYS * 86400, count))
+    latitudes = 47.0 + np.cumsum(rng.normal(0, 1e-3, count))
+    longitudes = 8.0 + np.cumsum(rng.normal(0, 1e-3, count))
+    chosen_types = rng.choice(types, count)
+    assets = []
+    for i in range(count):
+        timestamp = START.add(seconds=float(seconds[i]))
+        geotagged = i % 3 != 0
+        assets.append(
+            AssetRecord(
+                path=pathlib.Path(f"/trip/asset_{i:06d}.jpg"),
+                type=str(chosen_types[i]),
+                timestamp_utc=timestamp,
+                display_date=timestamp.to_tz("UTC").date(),
+                latitude=float(latitudes[i]) if geotagged else None,
+                longitude=float(longitudes[i]) if geotagged else None,
+                quality=float(rng.random()),
+                entropy=float(rng.uniform(6, 8)),
+                image_hash=imagehash.ImageHash(rng.random((8, 8)) > 0.5),
+                color_hash=imagehash.ImageHash(rng.random((14, 3)) > 0.5),
+            )
+        )
+    return assets
+
+
+@functools.cache
+def make_registry(count: int) -> AssetRegistry:
+    registry = AssetRegistry()
+    registry.has_display_date = True
+    for asset in make_assets(count):
+        registry.add_asset(asset)
+    return registry
+
+
+REGISTRY_QUERIES = {
+    "by_id": lambda r, n: r.get_asset_by_id(n),
+    "by_path": lambda r, n: r.get_asset_by_path(f"/trip/asset_{n - 1:06d}.jpg"),
+    "by_type": lambda r, n: r.get_assets_by_type("image"),
+    "by_date": lambda r, n: r.get_assets_by_date("2024-05-15", ["image", "audio"]),
+    "all_dates": lambda r, n: r.get_all_dates(),
+    "geotagged": lambda r, n: r.get_geotagged_assets("image"),
+    "unpositioned": lambda r, n: r.get_unpositioned_assets(),
+    "update": lambda r, n: r.update_asset({"id": n, "is_duplicate": False}),
+}
+
+
+@pytest.mark.parametrize("query", REGISTRY_QUERIES)
+@pytest.mark.parametrize("count", [10_000, 100_000])
+def test_asset_registry(benchmark: Any, count: int, query: str) -> None:
+    registry = make_registry(count)
+    # Queries take about a millisecond per 10,000 assets
+    benchmark(
+        REGISTRY_QUERIES[query], registry, count, rounds=15, calls=200_000 // count
+    )
+
+
+def test_cache(benchmark: Any, tmp_path: pathlib.Path) -> None:
+    cache = Cache(tmp_path / "cache.sqlite")
+    keys = [("section", (i, f"parameter {i}")) for i in range(1000)]
+
+    def set_and_get() -> None:
+        for key in keys:
+            cache[key] = {"value": key[1][0]}
+        for key in keys:
+            assert cache[key]["value"] == key[1][0]
+
+    benchmark(set_and_get, rounds=3)
+
+
+@pytest.fixture(scope="module")
+def synthetic_trip(tmp_path_factory: pytest.TempPathFactory) -> pathlib.Path:
+    path = tmp_path_factory.mktemp("trip")
+    generate_synthetic_data(
+        path, days=2, photos=100, points=50_000, notes=0, recordings=0
+    )
+    return path
+
+
+def test_gpx_creator(
+    benchmark: Any, synthetic_trip: pathlib.Path, tmp_path: pathlib.Path
+) -> None:
+    def create() -> GpxCreator:
+        return GpxCreator(
+            {},
+            [pathlib.PosixPath(synthetic_trip / "track.gpx")],
+            AssetRegistry(),
+            tmp_path,
+            priorities={},
+            skip_poi_detection=True,
+        )
+
+    creator = benchmark(create, rounds=1)
+    assert len(creator.get_available_dates()) == 2
+
+
+def test_statistics(benchmark: Any) -> None:
+    rng = np.random.default_rng(0)
+    lon = 8.0 + np.cumsum(rng.normal(0, 2e-5, 10_000))
+    lat = 47.0 + np.cumsum(rng.normal(0, 2e-5, 10_000))
+    ele = 400 + np.cumsum(rng.normal(0, 1, 10_000))
+    times = [START.add(seconds=5 * i) for i in range(10_000)]
+
+    def compute() -> Statistics:
+        statistics = Statistics()
+        for i in range(len(times)):
+            statistics.add_entry(times[i], (lon[i], lat[i]), ele[i])
+        return statistics
+
+    statistics = benchmark(compute, rounds=3)
+    assert statistics.distance > 0
+
+
+@pytest.mark.parametrize("implementation", ["gpxpy", "numpy"])
+def test_track_processing(benchmark: Any, implementation: str) -> None:
+    rng = np.random.default_rng(0)
+    lon = 8.0 + np.cumsum(rng.normal(0, 1e-4, 50_000))
+    lat = 50.0 + np.cumsum(rng.normal(0, 1e-4, 50_000))
+    ele = 200 + np.cumsum(rng.normal(0, 1, 50_000))
+
+    if implementation == "gpxpy":
+        segment = gpxpy.gpx.GPXTrackSegment(
+            [
+                gpxpy.gpx.GPXTrackPoint(latitude=y, longitude=x, elevation=z)
+                for x, y, z in zip(
+                    lon.tolist(), lat.tolist(), ele.tolist(), strict=True
+                )
+            ]
+        )
+
+        def process(segment: gpxpy.gpx.GPXTrackSegment) -> int:
+            segment.smooth(horizontal=True, vertical=True, remove_extremes=True)
+            segment.smooth(horizontal=True, vertical=True)
+            segment.simplify(max_distance=1)
+            return len(segment.points)
+
+        # Smoothing changes the segment in place
+        kept = benchmark(process, rounds=3, setup=lambda: (copy.deepcopy(segment),))
+    else:
+
+        def process_columns() -> int:
+            keep = remove_extremes(lon, lat, ele)
+            s_lon, s_lat, _ = smooth(lon[keep], lat[keep], ele[keep])
+            return len(simplify_lonlat(s_lon, s_lat, 1))
+
+        kept = benchmark(process_columns, rounds=3)
+    assert 0 < kept < len(lon)
+
+
+@pytest.mark.parametrize("count", [1_000, 10_000])
+def test_geo_cluster(benchmark: Any, count: int) -> None:
+    rng = np.random.default_rng(0)
+    locations = list(
+        zip(
+            (8.0 + rng.normal(0, 0.01, count)).tolist(),
+            (47.0 + rng.normal(0, 0.01, count)).tolist(),
+            strict=True,
+        )
+    )
+    cluster = benchmark(GeoCluster, locations, rounds=10)
+    assert cluster.separation_meters > 0
+
+
+@pytest.mark.parametrize("count", [100, 1_000, 10_000])
+def test_highlights(benchmark: Any, count: int) -> None:
+    images = make_assets(count, types=("image",))
+    highlights = benchmark(Highlights, images, {}, rounds=1)
+    assert highlights.map_assets
+
+
+@pytest.mark.parametrize("count", [500, 2_000])
+def test_duplicate_detector(benchmark: Any, count: int) -> None:
+    # Few dates, so that the groups compared with each other are large
+    assets = make_assets(count, types=("image",))
+    for i, asset in enumerate(assets):
+        asset.display_date = whenever.Date(2024, 5, 1 + i % 3)
+    detector = DuplicateDetector(ai=lambda *args, **kwargs: None, config={})
+    benchmark(detector.processAllAssets, assets, rounds=1)
+
+
+class _ExifScanner(ExifReader):
+    calibrate = staticmethod(BaseTask._calibrate)  # type: ignore[assignment]
+
+    def extract_meta_datetime(
+        self, source: pathlib.PosixPath, calibration: Calibration
+    ) -> whenever.Instant | None:
+        return None
+
+
+@pytest.mark.skipif(shutil.which("exiftool") is None, reason="needs exiftool")
+def test_exif_scan(benchmark: Any, synthetic_trip: pathlib.Path) -> None:
+    photos = sorted(pathlib.PosixPath(path) for path in synthetic_trip.glob("*.jpg"))
+    scanner = _ExifScanner()
+    calibration = Calibration("UTC", 0)
+
+    def scan() -> list[Any]:
+        return [scanner.read_exif(photo, calibration) for photo in photos]
+
+    results = benchmark(scan, rounds=1)
+    assert all(result.create_date is not None for result in results)
@@ -0,0 +1,52 @@
+import json
+import pathlib
+
+from mkmapdiary.lib.buildTrace import BuildTrace
+
+
+def make_trace() -> BuildTrace:
+    trace = BuildTrace(clock=lambda: 0.0)
+    # a -> b -> d and a -> c -> d; c is slower than b
+    trace.add_dependencies("convert_image:a", [])
+    trace.add_dependencies("convert_image:b", ["convert_image:a"])
+    trace.add_dependencies("geo_correlation", ["convert_image:a"])
+    trace.add_dependencies("build_site", ["convert_image:b", "geo_correlation"])
+    trace.add_span("convert_image:a", "task", 0.0, 1.0)
+    trace.add_span("convert_image:b", "task", 1.0, 2.0)
+    trace.add_span("geo_correlation", "task", 1.0, 4.0)
+    trace.add_span("build_site", "task", 4.0, 6.0)
+    trace.add_span("build_site _build_site", "action", 4.0, 6.0)
+    return trace
+
+
+def test_summary() -> None:
+    trace = make_trace()
+    assert [span.name for span in trace.slowest(2)] == ["geo_correlation", "build_site"]
+    assert trace.family_totals()[0] == ("geo_correlation", 1, 3.0)
+    assert ("convert_image", 2, 2.0) in trace.family_totals()
+    assert [span.name for span in trace.critical_path()] == [
+        "convert_image:a",
+        "geo_correlation",
+        "build_site",
+    ]
+    assert "Critical path: 6.00s in 3 tasks" in trace.summary()
+
+
+def test_skipped_tasks_connect_the_critical_path() -> None:
+    trace = BuildTrace(clock=lambda: 0.0)
+    trace.add_dependencies("b", ["skipped"])
+    trace.add_dependencies("skipped", ["a"])
+    trace.add_span("a", "task", 0.0, 1.0)
+    trace.add_span("b", "task", 1.0, 2.0)
+    assert [span.name for span in trace.critical_path()] == ["a", "b"]
+
+
+def test_chrome_trace(tmp_path: pathlib.Path) -> None:
+    trace = make_trace()
+    trace.save(tmp_path / "trace.json")
+    events = json.loads((tmp_path / "trace.json").read_text())["traceEvents"]
+    complete = [event for event in events if event["ph"] == "X"]
+    assert len(complete) == 5
+    assert complete[-1]["cat"] == "action"
+    assert complete[-1]["dur"] == 2e6
+    assert any(event["ph"] == "M" for event in events)
@@ -0,0 +1,113 @@
+import importlib.util
+import json
+import pathlib
+from typing import Any
+
+import click
+import pytest
+from click.testing import CliRunner
+
+TOOL = pathlib.Path(__file__).parents[1] / "tools" / "compare_benchmarks.py"
+_spec = importlib.util.spec_from_file_location("compare_benchmarks", TOOL)
+assert _spec is not None and _spec.loader is not None
+compare_benchmarks = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(compare_benchmarks)
+
+
+def write_results(
+    path: pathlib.Path,
+    benchmarks: dict[str, float],
+    version: int = 1,
+    spread: float = 1.0,
+) -> pathlib.Path:
+    """Results with the given fastest rounds, the other rounds take longer."""
+    data: dict[str, Any] = {
+        "format": version,
+        "benchmarks": {
+            name: {
+                "rounds": 5,
+                "calls": 1,
+                "min": value,
+                "median": value * (1 + spread),
+                "mean": value * (1 + spread),
+                "max": value * (1 + 2 * spread),
+            }
+            for name, value in benchmarks.items()
+        },
+    }
+    path.write_text(json.dumps(data))
+    return path
+
+
+def compare(
+    tmp_path: pathlib.Path,
+    baseline: dict[str, float],
+    current: dict[str, float],
+    *args: str,
+) -> Any:
+    return CliRunner().invoke(
+        compare_benchmarks.cli,
+        [
+            *args,
+            str(write_results(tmp_path / "baseline.json", baseline)),
+            str(write_results(tmp_path / "current.json", current)),
+        ],
+    )
+
+
+def test_load(tmp_path: pathlib.Path) -> None:
+    path = write_results(tmp_path / "results.json", {"test_a": 1.0})
+    assert compare_benchmarks.load(path)["test_a"]["min"] == 1.0
+
+    write_results(path, {"test_a": 1.0}, version=2)
+    with pytest.raises(click.ClickException, match="Unsupported benchmark format"):
+        compare_benchmarks.load(path)
+
+
+def test_unchanged(tmp_path: pathlib.Path) -> None:
+    result = compare(tmp_path, {"test_a": 1.0}, {"test_a": 1.0})
+    assert result.exit_code == 0
+    assert "REGRESSION" not in result.output
+
+
+def test_threshold(tmp_path: pathlib.Path) -> None:
+    # Within the default threshold
+    result = compare(tmp_path, {"test_a": 1.0}, {"test_a": 1.5})
+    assert result.exit_code == 0
+    assert "+50.0%" in result.output
+
+    result = compare(tmp_path, {"test_a": 1.0}, {"test_a": 2.0})
+    assert result.exit_code == 1
+    assert "REGRESSION" in result.output
+    assert "1 benchmark(s) slower by more than 75%" in result.output
+
+    result = compare(tmp_path, {"test_a": 1.0}, {"test_a": 1.5}, "--threshold", "0.2")
+    assert result.exit_code == 1
+
+
+def test_faster_new_and_removed(tmp_path: pathlib.Path) -> None:
+    result = compare(
+        tmp_path,
+        {"test_a": 1.0, "test_removed": 1.0},
+        {"test_a": 0.1, "test_new": 1.0},
+    )
+    assert result.exit_code == 0
+    lines = {line.split()[0]: line.split()[-1] for line in result.output.splitlines()}
+    assert lines["test_a"] == "faster"
+    assert lines["test_new"] == "new"
+    assert lines["test_removed"] == "removed"
+
+
+def test_stat(tmp_path: pathlib.Path) -> None:
+    baseline = write_results(tmp_path / "baseline.json", {"test_a": 1.0})
+    current = write_results(tmp_path / "current.json", {"test_a": 1.0}, spread=3.0)
+
+    # Only the slower rounds got slower
+    result = CliRunner().invoke(compare_benchmarks.cli, [str(baseline), str(current)])
+    assert result.exit_code == 0
+
+    result = CliRunner().invoke(
+        compare_benchmarks.cli, ["--stat", "median", str(baseline), str(current)]
+    )
+    assert result.exit_code == 1
+    assert "+100.0%" in result.output
@@ -0,0 +1,46 @@
+import pathlib
+
+import whenever
+
+from mkmapdiary.lib.asset import AssetMetadata, AssetRecord
+from mkmapdiary.lib.fingerprint import assets_fingerprint, fingerprint
+from mkmapdiary.lib.statistics import Statistics
+
+
+def make_asset(**kwargs: object) -> AssetRecord:
+    return AssetRecord(
+        id=1,
+        path=pathlib.Path("/build/docs/assets/a.jpg"),
+        type="image",
+        timestamp_utc=whenever.Instant.from_utc(2024, 5, 1, 12),
+        display_date=whenever.Date(2024, 5, 1),
+        latitude=50.0,
+        longitude=8.0,
+        **kwargs,  # type: ignore[arg-type]
+    )
+
+
+def test_fingerprint_is_stable() -> None:
+    assert fingerprint({"a": 1, "b": [1, 2]}) == fingerprint({"b": [1, 2], "a": 1})
+    assert fingerprint({"a": 1}) != fingerprint({"a": 2})
+    assert assets_fingerprint([make_asset()]) == assets_fingerprint([make_asset()])
+
+
+def test_fingerprint_covers_page_relevant_fields() -> None:
+    base = assets_fingerprint([make_asset()])
+    assert assets_fingerprint([make_asset(quality=0.5)]) != base
+    assert assets_fingerprint([make_asset(is_duplicate=True)]) != base
+    assert (
+        assets_fingerprint([make_asset(metadata=AssetMetadata(title="Title"))]) != base
+    )
+    assert assets_fingerprint([make_asset(), make_asset()]) != base
+
+    # Embeddings are not shown on any page
+    assert assets_fingerprint([make_asset(embedding=[0.1, 0.2])]) == base
+
+
+def test_fingerprint_of_statistics() -> None:
+    statistics = Statistics()
+    base = fingerprint(statistics)
+    statistics.distance = 1000.0
+    assert fingerprint(statistics) != base
@@ -0,0 +1,50 @@
+import pathlib
+
+import gpxpy
+from click.testing import CliRunner
+from PIL import ExifTags, Image
+
+from mkmapdiary.commands.generate_synthetic import (
+    generate_synthetic,
+    generate_synthetic_data,
+)
+
+
+def generate(target: pathlib.Path, seed: int) -> dict[str, bytes]:
+    target.mkdir()
+    generate_synthetic_data(
+        target, days=2, photos=4, points=2000, notes=2, recordings=1, seed=seed
+    )
+    return {path.name: path.read_bytes() for path in sorted(target.iterdir())}
+
+
+def test_deterministic(tmp_path: pathlib.Path) -> None:
+    first = generate(tmp_path / "a", seed=1)
+    assert first == generate(tmp_path / "b", seed=1)
+    assert first != generate(tmp_path / "c", seed=2)
+
+
+def test_trip_contents(tmp_path: pathlib.Path) -> None:
+    files = generate(tmp_path / "trip", seed=0)
+    names = list(files)
+    assert "calibration.yaml" in names
+    assert len([name for name in names if name.startswith("photo_")]) == 8
+    assert len([name for name in names if name.startswith("note_")]) == 4
+    assert len([name for name in names if name.endswith(".wav")]) == 2
+
+    with open(tmp_path / "trip" / "track.gpx") as f:
+        gpx = gpxpy.parse(f)
+    assert [track.name for track in gpx.tracks] == ["2020-06-01", "2020-06-02"]
+    assert sum(len(s.points) for t in gpx.tracks for s in t.segments) <= 4000
+
+    photo = next(name for name in names if name.startswith("photo_"))
+    with Image.open(tmp_path / "trip" / photo) as img:
+        exif = img.getexif().get_ifd(ExifTags.IFD.Exif)
+    timestamp = exif[ExifTags.Base.DateTimeOriginal]
+    assert photo == f"photo_{timestamp.replace(':', '').replace(' ', '_')}.jpg"
+
+
+def test_requires_empty_directory(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "existing.txt").write_text("")
+    result = CliRunner().invoke(generate_synthetic, [str(tmp_path)])
+    assert result.exit_code == 1
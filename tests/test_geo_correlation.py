@@ -0,0 +1,94 @@
+import bisect
+import datetime
+
+import numpy as np
+import pytest
+import whenever
+
+from mkmapdiary.lib.geoCorrelation import GeoCorrelator, epoch_us
+
+SECOND = 1_000_000
+
+
+def test_epoch_us() -> None:
+    dt = datetime.datetime(2024, 5, 1, 12, 0, 0, 250, tzinfo=datetime.timezone.utc)
+    instant = whenever.Instant.from_py_datetime(dt)
+    assert epoch_us(dt) == epoch_us(instant) == int(dt.timestamp()) * SECOND + 250
+
+
+def reference(
+    fixes: list[tuple[int, float, float]], time: int, max_time_diff: float
+) -> tuple[float, float, int] | None:
+    """Nearest-fix lookup as previously done with bisect."""
+    pos = bisect.bisect_left(fixes, time, key=lambda x: x[0])
+    candidates = []
+    if pos > 0:
+        candidates.append(fixes[pos - 1])
+    if pos < len(fixes):
+        candidates.append(fixes[pos])
+    closest = min(candidates, key=lambda x: abs(x[0] - time))
+    diff = closest[0] - time
+    if abs(diff) < max_time_diff * SECOND:
+        return closest[1], closest[2], abs(diff)
+    return None
+
+
+def test_nearest_matches_bisect() -> None:
+    rng = np.random.default_rng(0)
+    times = np.sort(rng.integers(0, 3600 * SECOND, 500))
+    lon = rng.uniform(8, 9, 500)
+    lat = rng.uniform(50, 51, 500)
+    # Duplicate fix
+    times[10], lon[10], lat[10] = times[11], lon[11], lat[11]
+    queries = np.concatenate(
+        [rng.integers(-600 * SECOND, 4200 * SECOND, 1000), times[:20]]
+    )
+
+    # Fixes do not need to be sorted
+    order = rng.permutation(len(times))
+    correlator = GeoCorrelator(times[order], lon[order], lat[order])
+    result = correlator.correlate(queries, 60)
+
+    fixes = list(zip(times.tolist(), lon.tolist(), lat.tolist(), strict=True))
+    for i, query in enumerate(queries.tolist()):
+        expected = reference(fixes, query, 60)
+        if expected is None:
+            assert not result.valid[i]
+        else:
+            assert result.valid[i]
+            assert (result.longitude[i], result.latitude[i]) == expected[:2]
+            assert result.time_diff[i] == expected[2]
+
+
+def test_interpolation() -> None:
+    times = np.array([0, 10, 100]) * SECOND
+    lon = np.array([8.0, 9.0, 10.0])
+    lat = np.array([50.0, 51.0, 50.0])
+    correlator = GeoCorrelator(times, lon, lat)
+
+    queries = np.array([2, 10, 30, 95, 200]) * SECOND
+    result = correlator.correlate(queries, 60, interpolate=True)
+
+    assert result.valid.tolist() == [True, True, True, True, False]
+    # Between two close fixes
+    assert result.longitude[0] == pytest.approx(8.2)
+    assert result.latitude[0] == pytest.approx(50.2)
+    # Exact match
+    assert (result.longitude[1], result.latitude[1]) == (9.0, 51.0)
+    assert result.time_diff[1] == 0
+    # The next fix is too far away: snap to the closest one
+    assert (result.longitude[2], result.latitude[2]) == (9.0, 51.0)
+    assert (result.longitude[3], result.latitude[3]) == (10.0, 50.0)
+
+
+def test_interpolation_across_antimeridian() -> None:
+    correlator = GeoCorrelator(
+        np.array([0, 10]) * SECOND, np.array([179.0, -179.0]), np.array([0.0, 0.0])
+    )
+    result = correlator.correlate(np.array([5 * SECOND]), 60, interpolate=True)
+    assert abs(result.longitude[0]) == pytest.approx(180.0)
+
+
+def test_empty() -> None:
+    correlator = GeoCorrelator(np.array([]), np.array([]), np.array([]))
+    assert not correlator.correlate(np.array([0]), 60).valid.any()
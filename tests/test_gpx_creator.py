@@ -0,0 +1,105 @@
+import datetime
+import pathlib
+
+import gpxpy.gpx
+import numpy as np
+import pytest
+from whenever import Date
+
+from mkmapdiary.lib.assetRegistry import AssetRegistry
+from mkmapdiary.lib.gpxCreator import GpxCreator
+
+
+def write_gpx(path: pathlib.Path, days: int, points_per_day: int = 300) -> None:
+    rng = np.random.default_rng(0)
+    gpx = gpxpy.gpx.GPX()
+    track = gpxpy.gpx.GPXTrack()
+    gpx.tracks.append(track)
+    start = datetime.datetime(2024, 5, 1, 8, tzinfo=datetime.timezone.utc)
+    lat, lon = 50.0, 8.0
+    for day in range(days):
+        segment = gpxpy.gpx.GPXTrackSegment()
+        track.segments.append(segment)
+        for i in range(points_per_day):
+            lat += rng.normal(0, 1e-4) + 5e-5
+            lon += rng.normal(0, 1e-4)
+            segment.points.append(
+                gpxpy.gpx.GPXTrackPoint(
+                    latitude=lat,
+                    longitude=lon,
+                    elevation=200 + i * 0.5,
+                    time=start + datetime.timedelta(days=day, seconds=5 * i),
+                )
+            )
+        gpx.waypoints.append(
+            gpxpy.gpx.GPXWaypoint(
+                latitude=lat,
+                longitude=lon,
+                time=start + datetime.timedelta(days=day, hours=1),
+                name=f"Day {day}",
+            )
+        )
+    path.write_text(gpx.to_xml())
+
+
+@pytest.fixture
+def creator(tmp_path: pathlib.Path) -> GpxCreator:
+    source = pathlib.PosixPath(tmp_path / "track.gpx")
+    write_gpx(source, days=3)
+    return GpxCreator(
+        {},
+        [source],
+        AssetRegistry(),
+        tmp_path,
+        priorities={},
+        skip_poi_detection=True,
+    )
+
+
+def test_overview_combines_dates(creator: GpxCreator) -> None:
+    dates = creator.get_available_dates()
+    assert len(dates) == 3
+
+    overview = creator.get_overview(dates)
+    statistics = creator.get_statistics()
+
+    assert len(overview.lines) == 3
+    assert overview.statistics.distance == pytest.approx(
+        sum(s.distance for s in statistics.values())
+    )
+    assert overview.start is not None and overview.end is not None
+    assert overview.start.format_iso() == "2024-05-01T08:00:00Z"
+    assert overview.end.format_iso() == "2024-05-03T08:24:55Z"
+    assert (
+        overview.statistics.total_time == (overview.end - overview.start).in_seconds()
+    )
+
+    gpx = gpxpy.parse(overview.gpx_data)
+    assert not gpx.tracks
+    assert len(gpx.waypoints) == 3
+
+
+def test_overview_respects_dates(creator: GpxCreator) -> None:
+    overview = creator.get_overview([Date(2024, 5, 2), Date(2024, 6, 1)])
+    assert len(overview.lines) == 1
+    assert overview.start is not None
+    assert overview.start.format_iso() == "2024-05-02T08:00:00Z"
+
+
+def test_track_lines_split_at_gaps() -> None:
+    start = datetime.datetime(2024, 5, 1, tzinfo=datetime.timezone.utc)
+    segment = gpxpy.gpx.GPXTrackSegment()
+    for i, seconds in enumerate([0, 5, 10, 60, 65]):
+        segment.points.append(
+            gpxpy.gpx.GPXTrackPoint(
+                latitude=50 + i * 1e-4,
+                longitude=8.0,
+                time=start + datetime.timedelta(seconds=seconds),
+            )
+        )
+    track = gpxpy.gpx.GPXTrack()
+    track.segments.append(segment)
+
+    lines = GpxCreator.track_lines([track])
+    assert [len(line) for line in lines] == [3, 2]
+    np.testing.assert_array_equal(lines[1][0], [8.0, 50 + 3e-4])
@@ -0,0 +1,187 @@
+import pathlib
+from typing import Any
+
+import pytest
+import requests
+
+from mkmapdiary.lib.cache import Cache
+from mkmapdiary.lib.httpClient import (
+    LEGACY_CACHE_SECTION,
+    HttpClient,
+    OfflineError,
+)
+from mkmapdiary.lib.rateLimiter import RateLimiter
+
+
+class FakeResponse:
+    def __init__(
+        self, status_code: int, body: Any = None, headers: dict | None = None
+    ) -> None:
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def raise_for_status(self) -> None:
+        if self.status_code >= 400:
+            raise RuntimeError(f"HTTP {self.status_code}")
+
+    def json(self) -> Any:
+        return self.body
+
+    @property
+    def text(self) -> str:
+        return str(self.body)
+
+    @property
+    def content(self) -> bytes:
+        return b"" if self.body is None else self.text.encode()
+
+
+class FakeSession:
+    def __init__(self) -> None:
+        self.etag = '"v1"'
+        self.body: Any = {"version": 1}
+        self.requests: list[dict[str, str]] = []
+        self.error: Exception | None = None
+        self.status_code = 200
+
+    def get(self, url: str, headers: dict[str, str], timeout: float) -> FakeResponse:
+        self.requests.append(headers)
+        if self.error is not None:
+            raise self.error
+        if self.status_code != 200:
+            return FakeResponse(self.status_code)
+        if headers.get("If-None-Match") == self.etag:
+            return FakeResponse(304)
+        return FakeResponse(200, self.body, {"ETag": self.etag})
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def cache(tmp_path: pathlib.Path) -> Cache:
+    return Cache(tmp_path / "cache.sqlite")
+
+
+def make_client(cache: Cache, session: FakeSession, **kwargs: Any) -> HttpClient:
+    return HttpClient(
+        cache,
+        session=session,  # type: ignore[arg-type]
+        limiter=RateLimiter({}),
+        **kwargs,
+    )
+
+
+def test_fresh_response_is_cached(cache: Cache) -> None:
+    session = FakeSession()
+    clock = FakeClock()
+    client = make_client(cache, session, freshness=60, clock=clock)
+
+    assert client.get("https://example.org/index.json") == {"version": 1}
+    clock.now += 30
+    assert client.get("https://example.org/index.json") == {"version": 1}
+    assert len(session.requests) == 1
+
+
+def test_revalidation(cache: Cache) -> None:
+    session = FakeSession()
+    clock = FakeClock()
+    client = make_client(cache, session, freshness=60, clock=clock)
+
+    client.get("https://example.org/index.json")
+
+    # Unchanged: the server answers 304 and the cached body is used
+    clock.now += 120
+    assert client.get("https://example.org/index.json") == {"version": 1}
+    assert session.requests[-1]["If-None-Match"] == '"v1"'
+
+    # Revalidation renewed the freshness
+    clock.now += 30
+    client.get("https://example.org/index.json")
+    assert len(session.requests) == 2
+
+    # Changed: the new body replaces the cached one
+    session.etag = '"v2"'
+    session.body = {"version": 2}
+    clock.now += 120
+    assert client.get("https://example.org/index.json") == {"version": 2}
+    assert len(session.requests) == 3
+
+
+def test_stale_response_on_error(cache: Cache) -> None:
+    session = FakeSession()
+    clock = FakeClock()
+    client = make_client(cache, session, freshness=60, clock=clock)
+    client.get("https://example.org/index.json")
+    clock.now += 120
+
+    session.error = requests.ConnectionError("unreachable")
+    assert client.get("https://example.org/index.json") == {"version": 1}
+    with pytest.raises(requests.ConnectionError):
+        client.get("https://example.org/other.json")
+
+    session.error = None
+    session.status_code = 503
+    assert client.get("https://example.org/index.json") == {"version": 1}
+
+    # Client errors are not hidden
+    session.status_code = 404
+    with pytest.raises(RuntimeError):
+        client.get("https://example.org/index.json")
+
+
+def test_legacy_cache_section(cache: Cache) -> None:
+    url = "https://example.org/index.json"
+    cache[(LEGACY_CACHE_SECTION, (url, True))] = {"version": 0}
+    session = FakeSession()
+
+    offline = make_client(cache, session, offline=True)
+    assert offline.get(url) == {"version": 0}
+    assert (LEGACY_CACHE_SECTION, [url, True]) not in list(cache)
+
+    # The migrated response is revalidated when online
+    assert make_client(cache, session).get(url) == {"version": 1}
+    assert len(session.requests) == 1
+
+
+def test_url_freshness(cache: Cache) -> None:
+    client = make_client(
+        cache,
+        FakeSession(),
+        freshness=10,
+        url_freshness={
+            "https://example.org/": 100,
+            "https://example.org/static/": 1000,
+        },
+    )
+    assert client.freshness_for("https://other.org/") == 10
+    assert client.freshness_for("https://example.org/a") == 100
+    assert client.freshness_for("https://example.org/static/a.css") == 1000
+
+
+def test_offline(cache: Cache) -> None:
+    session = FakeSession()
+    clock = FakeClock()
+    make_client(cache, session, clock=clock).get("https://example.org/a")
+
+    offline = make_client(cache, session, freshness=60, offline=True, clock=clock)
+    clock.now += 3600
+    # Stale responses are served without revalidation
+    assert offline.get("https://example.org/a") == {"version": 1}
+    with pytest.raises(OfflineError):
+        offline.get("https://example.org/b")
+    assert len(session.requests) == 1
+
+
+def test_text_and_json_are_cached_separately(cache: Cache) -> None:
+    session = FakeSession()
+    client = make_client(cache, session)
+    assert client.get("https://example.org/a", json=False) == "{'version': 1}"
+    assert client.get("https://example.org/a") == {"version": 1}
+    assert len(session.requests) == 2
@@ -0,0 +1,60 @@
+"""Import time of the command line interface.
+
+Heavy libraries are imported in the code paths using them, so that ``--help``
+and the small commands start quickly. The times are measured with
+``python -X importtime`` in a fresh interpreter.
+"""
+
+import subprocess
+import sys
+
+import pytest
+
+# Cumulative import time of the CLI in seconds. Before the heavy libraries were
+# imported lazily, it took about 3 seconds.
+CLI_IMPORT_BUDGET = 1.0
+
+HEAVY_MODULES = [
+    "exiftool",
+    "hdbscan",
+    "imageio",
+    "mkdocs",
+    "ollama",
+    "poiidx",
+    "pydub",
+    "pyproj",
+    "rawpy",
+    "scipy",
+    "sklearn",
+    "torch",
+    "whisper",
+]
+
+
+def import_times(module: str) -> dict[str, float]:
+    """Cumulative import time in seconds of all modules imported by a module."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        times[name.strip()] = int(cumulative) / 1e6
+    return times
+
+
+@pytest.mark.parametrize("module", ["mkmapdiary.__main__", "mkmapdiary.taskList"])
+def test_no_heavy_imports(module: str) -> None:
+    imported = {name.split(".")[0] for name in import_times(module)}
+    assert sorted(imported & set(HEAVY_MODULES)) == []
+
+
+def test_cli_import_budget() -> None:
+    times = import_times("mkmapdiary.__main__")
+    slowest = sorted(times.items(), key=lambda item: -item[1])[:10]
+    assert times["mkmapdiary.__main__"] < CLI_IMPORT_BUDGET, slowest
@@ -0,0 +1,52 @@
+import pathlib
+import time
+
+from mkmapdiary.lib.llmCache import LlmCache, cache_key
+
+
+def test_cache_key() -> None:
+    key = cache_key("m", {"temperature": 0.2}, "prompt")
+    assert key == cache_key("m", {"temperature": 0.2}, "prompt")
+    assert key != cache_key("m", {"temperature": 0.3}, "prompt")
+    assert key != cache_key("n", {"temperature": 0.2}, "prompt")
+    assert key != cache_key("m", {"temperature": 0.2}, "prompt2")
+    # Option order does not matter
+    assert cache_key("m", {"a": 1, "b": 2}, "p") == cache_key(
+        "m", {"b": 2, "a": 1}, "p"
+    )
+
+
+def test_cache_key_uses_image_content(tmp_path: pathlib.Path) -> None:
+    image = tmp_path / "image.jpg"
+    image.write_bytes(b"first")
+    key = cache_key("m", None, "p", {"images": [str(image)]})
+    assert key == cache_key("m", None, "p", {"images": [b"first"]})
+
+    image.write_bytes(b"second")
+    assert key != cache_key("m", None, "p", {"images": [str(image)]})
+
+
+def test_persistence(tmp_path: pathlib.Path) -> None:
+    db_path = tmp_path / "cache.sqlite"
+    LlmCache(db_path).put("key", "response")
+    cache = LlmCache(db_path)
+    assert cache.get("key") == "response"
+    assert cache.get("other") is None
+    assert len(cache) == 1
+
+
+def test_eviction() -> None:
+    cache = LlmCache(max_entries=2)
+    cache.put("a", "1")
+    time.sleep(0.01)
+    cache.put("b", "2")
+    time.sleep(0.01)
+    # Using "a" makes "b" the least recently used entry
+    assert cache.get("a") == "1"
+    time.sleep(0.01)
+    cache.put("c", "3")
+
+    assert len(cache) == 2
+    assert cache.get("b") is None
+    assert cache.get("a") == "1"
+    assert cache.get("c") == "3"
@@ -0,0 +1,160 @@
+import multiprocessing
+import threading
+import time
+from typing import Any
+
+import pytest
+
+from mkmapdiary.lib.llmScheduler import LlmScheduler, LlmSchedulerManager
+
+
+class FakeChat:
+    def __init__(self, delay: float = 0.0) -> None:
+        self.delay = delay
+        self.calls: list[dict[str, Any]] = []
+        self.running = 0
+        self.max_running = 0
+        self.lock = threading.Lock()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, model: str, messages: list, **params: Any) -> dict:
+        with self.lock:
+            self.calls.append({"model": model, "messages": messages, **params})
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        self.release.wait()
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        return {"message": {"content": messages[0]["content"]}}
+
+
+def run_all(scheduler: LlmScheduler, requests: list[tuple[str, str, int]]) -> None:
+    threads = [
+        threading.Thread(
+            target=scheduler.chat,
+            args=(model, [{"role": "user", "content": content}]),
+            kwargs={"priority": priority},
+        )
+        for model, content, priority in requests
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+
+def test_concurrency_limit_per_model() -> None:
+    chat = FakeChat(delay=0.02)
+    scheduler = LlmScheduler(concurrency=2, model_concurrency={"small": 1}, chat=chat)
+    run_all(scheduler, [("big", str(i), 0) for i in range(6)])
+    assert chat.max_running == 2
+
+    chat.max_running = 0
+    run_all(scheduler, [("small", str(i), 0) for i in range(4)])
+    assert chat.max_running == 1
+
+    stats = scheduler.stats()
+    assert stats["big"].requests == 6
+    assert stats["small"].requests == 4
+    assert stats["big"].running == stats["big"].queued == 0
+    assert scheduler.queue_depth() == 0
+
+
+def test_priorities() -> None:
+    chat = FakeChat()
+    scheduler = LlmScheduler(concurrency=1, chat=chat)
+
+    # Block the model so that all further requests queue up
+    chat.release.clear()
+    blocker = threading.Thread(
+        target=scheduler.chat, args=("m", [{"role": "user", "content": "first"}])
+    )
+    blocker.start()
+    while not chat.calls:
+        time.sleep(0.001)
+
+    requests = [("m", "tags", 10), ("m", "title", 100), ("m", "tags2", 10)]
+    threads = []
+    for model, content, priority in requests:
+        thread = threading.Thread(
+            target=scheduler.chat,
+            args=(model, [{"role": "user", "content": content}]),
+            kwargs={"priority": priority},
+        )
+        thread.start()
+        threads.append(thread)
+        while scheduler.queue_depth("m") < len(threads):
+            time.sleep(0.001)
+
+    assert scheduler.stats()["m"].max_queue_depth == 3
+    chat.release.set()
+    blocker.join()
+    for thread in threads:
+        thread.join()
+
+    order = [call["messages"][0]["content"] for call in chat.calls]
+    assert order == ["first", "title", "tags", "tags2"]
+
+    # Models stay loaded while requests are queued, the last one lets go
+    keep_alive = [call["keep_alive"] for call in chat.calls]
+    assert keep_alive == ["15s", "5m", "5m", "15s"]
+
+
+def test_chat_passes_parameters() -> None:
+    chat = FakeChat()
+    scheduler = LlmScheduler(chat=chat)
+    response = scheduler.chat(
+        "m", [{"role": "user", "content": "hello"}], options={"temperature": 0.2}
+    )
+    assert response["message"]["content"] == "hello"
+    assert chat.calls[0]["options"] == {"temperature": 0.2}
+    assert chat.calls[0]["keep_alive"] == "15s"
+
+
+# Requests running in the manager's server process
+server_lock = threading.Lock()
+server_running = 0
+
+
+def counting_chat(model: str, messages: list, **params: Any) -> dict:
+    global server_running
+    with server_lock:
+        server_running += 1
+        running = server_running
+    time.sleep(0.02)
+    with server_lock:
+        server_running -= 1
+    return {"message": {"content": str(running)}}
+
+
+def send_requests(scheduler: LlmScheduler, results: Any) -> None:
+    for i in range(3):
+        response = scheduler.chat("m", [{"role": "user", "content": str(i)}])
+        results.put(response["message"]["content"])
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="Needs the fork start method",
+)
+def test_shared_between_processes() -> None:
+    context = multiprocessing.get_context("fork")
+    with LlmSchedulerManager(ctx=context) as manager:
+        scheduler = manager.scheduler(concurrency=1, chat=counting_chat)
+        results = context.Queue()
+        processes = [
+            context.Process(target=send_requests, args=(scheduler, results))
+            for _ in range(2)
+        ]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            assert process.exitcode == 0
+
+        # The limit applies to both processes, the statistics cover them
+        assert [results.get() for _ in range(6)] == ["1"] * 6
+        assert scheduler.stats()["m"].requests == 6
+        assert scheduler.limit("m") == 1
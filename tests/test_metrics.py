@@ -0,0 +1,58 @@
+import json
+import pathlib
+
+import pytest
+
+from mkmapdiary.lib.metrics import MetricsRegistry
+from mkmapdiary.util.cache import with_cache
+
+
+def test_counters_and_timers(tmp_path: pathlib.Path) -> None:
+    ticks = iter([0.0, 0.25, 1.0, 3.0])
+    metrics = MetricsRegistry(clock=lambda: next(ticks))
+    metrics.counter("requests_total", "Requests", result="hit").inc()
+    metrics.counter("requests_total", result="hit").inc(2)
+    metrics.counter("requests_total", result="miss").inc()
+    timer = metrics.timer("request_seconds", "Duration")
+    with timer.time():
+        pass
+    with timer.time():
+        pass
+
+    data = metrics.to_dict()
+    assert data["requests_total"] == [
+        {"labels": {"result": "hit"}, "value": 3.0},
+        {"labels": {"result": "miss"}, "value": 1.0},
+    ]
+    assert data["request_seconds"][0]["count"] == 2
+    assert data["request_seconds"][0]["sum"] == 2.25
+
+    metrics.save_json(tmp_path / "metrics.json")
+    assert json.loads((tmp_path / "metrics.json").read_text()) == data
+
+
+def test_prometheus_format() -> None:
+    metrics = MetricsRegistry()
+    metrics.counter("requests_total", "Requests", host='a"b').inc()
+    metrics.histogram("size_bytes", buckets=(10, 100)).observe(50)
+    text = metrics.to_prometheus()
+    assert "# HELP requests_total Requests\n" in text
+    assert "# TYPE requests_total counter\n" in text
+    assert 'requests_total{host="a\\"b"} 1\n' in text
+    assert 'size_bytes_bucket{le="10"} 0\n' in text
+    assert 'size_bytes_bucket{le="100"} 1\n' in text
+    assert 'size_bytes_bucket{le="+Inf"} 1\n' in text
+    assert "size_bytes_count 1\n" in text
+
+
+def test_with_cache_counts(monkeypatch: pytest.MonkeyPatch) -> None:
+    metrics = MetricsRegistry()
+    monkeypatch.setattr("mkmapdiary.util.cache.get_metrics", lambda: metrics)
+    cache: dict[object, object] = {}
+    with_cache(cache, "square", lambda x: x * x, 3)
+    with_cache(cache, "square", lambda x: x * x, 3)
+    counts = {
+        entry["labels"]["result"]: entry["value"]
+        for entry in metrics.to_dict()["cache_requests_total"]
+    }
+    assert counts == {"hit": 1.0, "miss": 1.0}
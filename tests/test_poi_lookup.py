@@ -0,0 +1,134 @@
+import datetime
+import pathlib
+
+import gpxpy
+import gpxpy.gpx
+import numpy as np
+import pytest
+from shapely.geometry import Point, box
+from whenever import Date
+
+from mkmapdiary.lib.assetRegistry import AssetRegistry
+from mkmapdiary.lib.gpxCreator import GpxCreator
+from mkmapdiary.lib.poiLookup import MemoryPoiBackend, PoiLookup, PoiQuery
+
+
+def poi(name: str, lon: float, lat: float, symbol: str = "cafe_bar") -> dict:
+    return {
+        "name": name,
+        "symbol": symbol,
+        "rank": 1,
+        "admin_level": None,
+        "coordinates": Point(lon, lat),
+    }
+
+
+BOUNDARIES = [
+    {
+        "name": "Germany",
+        "admin_level": 2,
+        "coordinates": box(5, 47, 15, 55),
+        "localized_names": {"de": "Deutschland"},
+    },
+    {"name": "Hesse", "admin_level": 4, "coordinates": box(7.7, 49.3, 10.3, 51.7)},
+    {"name": "Frankfurt", "admin_level": 6, "coordinates": box(8.4, 50.0, 8.9, 50.3)},
+]
+
+
+@pytest.fixture
+def backend() -> MemoryPoiBackend:
+    return MemoryPoiBackend(
+        [
+            poi("Near A", 8.6821, 50.1109),
+            poi("Also near A", 8.6830, 50.1110),
+            poi("Near B", 8.7000, 50.1200),
+            poi("Far away", 13.4, 52.5),
+        ],
+        BOUNDARIES,
+    )
+
+
+def test_nearby_pois_are_batched(backend: MemoryPoiBackend) -> None:
+    lookup = PoiLookup(backend)
+    queries = [
+        PoiQuery(Point(8.6821, 50.1109), 100),
+        PoiQuery(Point(8.7000, 50.1200), 50),
+        PoiQuery(Point(8.6000, 50.0500), 50),  # Nothing nearby
+        PoiQuery(Point(13.4, 52.5), 10),
+    ]
+    results = lookup.nearby_pois(queries)
+
+    assert [[p["name"] for p in pois] for pois in results] == [
+        ["Near A", "Also near A"],
+        ["Near B"],
+        [],
+        ["Far away"],
+    ]
+    # One query per group of nearby search areas
+    assert len(backend.queries) == 2
+
+    found = results[0][0]
+    assert found["center"].equals_exact(Point(8.6821, 50.1109), 1e-9)
+    assert found["local_center"].distance(queries[0].local_center) < 1e-6
+
+
+def test_radius_is_respected(backend: MemoryPoiBackend) -> None:
+    # "Also near A" is about 65 m east of "Near A"
+    results = PoiLookup(backend).nearby_pois(
+        [PoiQuery(Point(8.6821, 50.1109), 60), PoiQuery(Point(8.6821, 50.1109), 70)]
+    )
+    assert [len(pois) for pois in results] == [1, 2]
+
+
+def test_administrative_hierarchy_strings(backend: MemoryPoiBackend) -> None:
+    lookup = PoiLookup(backend)
+    point = Point(8.68, 50.11)
+    assert lookup.administrative_hierarchy_strings(
+        [point, point, Point(13.4, 52.5)], "de", [None, 4, None]
+    ) == ["Frankfurt, Hesse, Deutschland", "Hesse, Deutschland", "Deutschland"]
+
+
+def test_gpx_creator_adds_poi_near_stay(
+    tmp_path: pathlib.Path, backend: MemoryPoiBackend
+) -> None:
+    # Stay for 30 minutes close to "Near A", walk away and stay elsewhere;
+    # HDBSCAN does not report a single cluster
+    rng = np.random.default_rng(0)
+    segment = gpxpy.gpx.GPXTrackSegment()
+    start = datetime.datetime(2024, 5, 1, 8, tzinfo=datetime.timezone.utc)
+    walk = np.linspace(0, 0.03, 120)
+    lons = np.concatenate([np.full(360, 8.6821), 8.6821 + walk, np.full(360, 8.7121)])
+    lats = np.concatenate(
+        [np.full(360, 50.1109), 50.1109 - walk, np.full(360, 50.0809)]
+    )
+    for i, (lon, lat) in enumerate(zip(lons, lats, strict=True)):
+        segment.points.append(
+            gpxpy.gpx.GPXTrackPoint(
+                latitude=lat + rng.normal(0, 5e-5),
+                longitude=lon + rng.normal(0, 5e-5),
+                time=start + datetime.timedelta(seconds=5 * i),
+            )
+        )
+    gpx = gpxpy.gpx.GPX()
+    gpx.tracks.append(gpxpy.gpx.GPXTrack())
+    gpx.tracks[0].segments.append(segment)
+    source = pathlib.PosixPath(tmp_path / "stay.gpx")
+    source.write_text(gpx.to_xml())
+
+    creator = GpxCreator(
+        {},
+        [source],
+        AssetRegistry(),
+        tmp_path,
+        priorities={"cafe_bar": 10},
+        poi_lookup=PoiLookup(backend),
+    )
+    waypoints = gpxpy.parse(creator.to_xml(Date(2024, 5, 1))).waypoints
+    symbols = [wpt.symbol for wpt in waypoints]
+
+    assert "mkmapdiary|cluster-center" in symbols
+    assert "mkmapdiary|poi|cafe_bar" in symbols
+    poi_waypoint = waypoints[symbols.index("mkmapdiary|poi|cafe_bar")]
+    assert poi_waypoint.name in ("Near A", "Also near A")
+    assert poi_waypoint.description is not None
+    assert "Frankfurt" in poi_waypoint.description
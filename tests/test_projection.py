@@ -0,0 +1,46 @@
+import threading
+
+import numpy as np
+import pytest
+from pyproj import Transformer
+from shapely.geometry import LineString, Point, Polygon
+
+from mkmapdiary.util.projection import LocalProjection, _get_transformers
+
+
+@pytest.mark.parametrize(
+    "lon,lat,epsg",
+    [
+        (8.68, 50.11, 32632),
+        (-70.6, -33.4, 32719),
+        (10.0, 85.0, 32661),
+        (10.0, -85.0, 32761),
+    ],
+)
+def test_epsg_selection(lon: float, lat: float, epsg: int) -> None:
+    assert LocalProjection(Point(lon, lat)).epsg == epsg
+
+
+def test_matches_pyproj() -> None:
+    projection = LocalProjection(Point(8.68, 50.11))
+    reference = Transformer.from_crs(4326, 32632, always_xy=True)
+    polygon = Polygon([(8.6, 50.0), (8.7, 50.0), (8.7, 50.2), (8.6, 50.1)])
+
+    local = projection.to_local(polygon)
+    coords = np.asarray(polygon.exterior.coords)
+    expected = np.column_stack(reference.transform(coords[:, 0], coords[:, 1]))
+    np.testing.assert_allclose(np.asarray(local.exterior.coords), expected)
+
+    line = LineString([(8.6, 50.0), (8.7, 50.1)])
+    roundtrip = projection.to_wgs(projection.to_local(line))
+    np.testing.assert_allclose(np.asarray(roundtrip.coords), np.asarray(line.coords))
+
+
+def test_transformers_are_cached_per_thread() -> None:
+    assert _get_transformers(32632) is _get_transformers(32632)
+
+    results = []
+    thread = threading.Thread(target=lambda: results.append(_get_transformers(32632)))
+    thread.start()
+    thread.join()
+    assert results[0] is not _get_transformers(32632)
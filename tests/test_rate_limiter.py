@@ -0,0 +1,81 @@
+import threading
+
+from mkmapdiary.lib.rateLimiter import RateLimiter, TokenBucket
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float) -> None:
+        self.now += seconds
+
+
+def test_token_bucket_burst_and_refill() -> None:
+    clock = FakeClock()
+    bucket = TokenBucket(rate=2.0, capacity=2, clock=clock)
+
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    # Reservations queue up behind each other
+    assert bucket.reserve() == 0.5
+    assert bucket.reserve() == 1.0
+
+    clock.now = 10.0
+    # Refill is capped at the capacity
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.0
+    assert bucket.reserve() == 0.5
+
+
+def test_rate_limiter_per_host() -> None:
+    clock = FakeClock()
+    limiter = RateLimiter(
+        {"slow.example.org": (1.0, 1)}, clock=clock, sleep=clock.sleep
+    )
+
+    for _ in range(3):
+        limiter.acquire("https://slow.example.org/search?q=a")
+        limiter.acquire("https://fast.example.org/")
+
+    # Only the limited host waits: one second per request after the first
+    assert clock.now == 2.0
+
+    stats = limiter.stats()
+    assert stats["slow.example.org"].requests == 3
+    assert stats["slow.example.org"].delayed == 2
+    assert stats["slow.example.org"].wait_time == 2.0
+    assert stats["slow.example.org"].max_wait == 1.0
+    assert stats["fast.example.org"].requests == 3
+    assert stats["fast.example.org"].delayed == 0
+
+
+def test_rate_limiter_default_limit() -> None:
+    clock = FakeClock()
+    limiter = RateLimiter({}, default=(4.0, 1), clock=clock, sleep=clock.sleep)
+    limiter.acquire("https://a.example.org/")
+    assert limiter.acquire("https://a.example.org/") == 0.25
+    assert limiter.acquire("https://b.example.org/") == 0.0
+
+
+def test_rate_limiter_concurrent() -> None:
+    waits: list[float] = []
+    limiter = RateLimiter(
+        {"example.org": (1.0, 1)}, sleep=lambda seconds: waits.append(seconds)
+    )
+
+    threads = [
+        threading.Thread(target=limiter.acquire, args=("https://example.org/",))
+        for _ in range(5)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # Every caller reserved its own slot
+    assert sorted(round(wait) for wait in waits) == [1, 2, 3, 4]
+    assert limiter.stats()["example.org"].requests == 5
@@ -0,0 +1,131 @@
+import pathlib
+import time
+
+import pytest
+
+from mkmapdiary.lib.reverseGeocoder import (
+    ReverseGeocoder,
+    build_index,
+    find_extracts,
+    index_path_for,
+)
+
+# Two nested boundaries (closed ways) and three places; the outer boundary
+# has a cut corner, so its bounding box is larger than its area
+OSM_XML = """<?xml version="1.0" encoding="UTF-8"?>
+<osm version="0.6" generator="test">
+  <node id="1" version="1" lat="49.0" lon="7.0"/>
+  <node id="2" version="1" lat="49.0" lon="11.0"/>
+  <node id="3" version="1" lat="53.0" lon="9.0"/>
+  <node id="4" version="1" lat="53.0" lon="7.0"/>
+  <node id="5" version="1" lat="50.0" lon="8.0"/>
+  <node id="6" version="1" lat="50.0" lon="9.0"/>
+  <node id="7" version="1" lat="51.0" lon="9.0"/>
+  <node id="8" version="1" lat="51.0" lon="8.0"/>
+  <node id="9" version="1" lat="51.0" lon="11.0"/>
+  <node id="10" version="1" lat="50.11" lon="8.68">
+    <tag k="place" v="city"/>
+    <tag k="name" v="Frankfurt am Main"/>
+    <tag k="name:en" v="Frankfurt"/>
+  </node>
+  <node id="11" version="1" lat="50.14" lon="8.60">
+    <tag k="place" v="village"/>
+    <tag k="name" v="Steinbach"/>
+  </node>
+  <node id="12" version="1" lat="51.5" lon="10.0">
+    <tag k="place" v="town"/>
+    <tag k="name" v="Steinbach"/>
+  </node>
+  <way id="100" version="1">
+    <nd ref="1"/><nd ref="2"/><nd ref="9"/><nd ref="3"/><nd ref="4"/><nd ref="1"/>
+    <tag k="boundary" v="administrative"/>
+    <tag k="admin_level" v="4"/>
+    <tag k="name" v="Testland"/>
+  </way>
+  <way id="101" version="1">
+    <nd ref="5"/><nd ref="6"/><nd ref="7"/><nd ref="8"/><nd ref="5"/>
+    <tag k="boundary" v="administrative"/>
+    <tag k="admin_level" v="6"/>
+    <tag k="name" v="Testkreis"/>
+    <tag k="name:en" v="Test County"/>
+  </way>
+</osm>
+"""
+
+
+@pytest.fixture
+def extract(tmp_path: pathlib.Path) -> pathlib.Path:
+    path = tmp_path / "testland-latest.osm"
+    path.write_text(OSM_XML)
+    return path
+
+
+@pytest.fixture
+def geocoder(extract: pathlib.Path, tmp_path: pathlib.Path) -> ReverseGeocoder:
+    index_path = tmp_path / "testland.geocoder"
+    build_index(extract, index_path)
+    return ReverseGeocoder(index_path)
+
+
+def test_reverse(geocoder: ReverseGeocoder) -> None:
+    result = geocoder.reverse(50.12, 8.67, zoom=10)
+    assert result["display_name"] == "Frankfurt am Main, Testkreis, Testland"
+    assert result["address"] == {
+        "city": "Frankfurt am Main",
+        "county": "Testkreis",
+        "state": "Testland",
+    }
+
+    localized = geocoder.reverse(50.12, 8.67, zoom=10, lang="en")
+    assert localized["display_name"] == "Frankfurt, Test County, Testland"
+
+
+def test_reverse_respects_zoom(geocoder: ReverseGeocoder) -> None:
+    assert geocoder.reverse(50.12, 8.67, zoom=8)["display_name"] == (
+        "Testkreis, Testland"
+    )
+    assert geocoder.reverse(50.12, 8.67, zoom=5)["display_name"] == "Testland"
+    # Outside of the inner boundary and far from places
+    assert geocoder.reverse(52.5, 7.5, zoom=10)["display_name"] == "Testland"
+    assert "error" in geocoder.reverse(0.0, 0.0, zoom=10)
+
+
+def test_search(geocoder: ReverseGeocoder) -> None:
+    result = geocoder.search("frankfurt am main")
+    assert len(result) == 1
+    assert result[0]["lat"] == "50.11"
+    assert result[0]["display_name"] == "Frankfurt am Main, Testkreis, Testland"
+
+    # The more important place wins for ambiguous names
+    assert geocoder.search("Steinbach")[0]["type"] == "town"
+    assert geocoder.search("Nowhere") == []
+
+
+def test_covers(geocoder: ReverseGeocoder) -> None:
+    assert geocoder.covers(50.0, 8.0)
+    assert not geocoder.covers(40.0, 8.0)
+    # Within the bounding box, but outside of the boundaries
+    assert geocoder.bounds == [7.0, 49.0, 11.0, 53.0]
+    assert not geocoder.covers(52.5, 10.5)
+
+
+def test_open_builds_index_once(extract: pathlib.Path) -> None:
+    assert index_path_for(extract.with_name("a-latest.osm.pbf")).name == (
+        "a-latest.geocoder"
+    )
+
+    ReverseGeocoder.open(extract)
+    index_path = index_path_for(extract)
+    assert index_path.exists()
+    mtime = index_path.stat().st_mtime
+
+    time.sleep(0.01)
+    ReverseGeocoder.open(extract)
+    assert index_path.stat().st_mtime == mtime
+
+
+def test_find_extracts(tmp_path: pathlib.Path) -> None:
+    assert find_extracts(tmp_path / "missing") == []
+    (tmp_path / "a-latest.osm.pbf").touch()
+    (tmp_path / "notes.txt").touch()
+    assert find_extracts(tmp_path) == [tmp_path / "a-latest.osm.pbf"]
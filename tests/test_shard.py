@@ -0,0 +1,174 @@
+import json
+import pathlib
+
+import gpxpy.gpx
+import numpy as np
+import pytest
+import whenever
+
+from mkmapdiary.lib.asset import AssetRecord
+from mkmapdiary.lib.config import load_config_file
+from mkmapdiary.lib.dirs import Dirs
+from mkmapdiary.lib.shard import (
+    OVERVIEW_LINES_NAME,
+    DateRange,
+    ShardManifest,
+    link_tree,
+    merge_overviews,
+    merge_statistics,
+)
+from mkmapdiary.lib.statistics import Statistics
+from mkmapdiary.lib.trackLevels import level_paths
+from mkmapdiary.taskList import TaskList
+
+
+def test_date_range() -> None:
+    date_range = DateRange.parse("2024-05-01:2024-05-31")
+    assert str(date_range) == "2024-05-01:2024-05-31"
+    assert whenever.Date(2024, 5, 1) in date_range
+    assert whenever.Date(2024, 5, 31) in date_range
+    assert whenever.Date(2024, 6, 1) not in date_range
+    assert "2024-05-02" not in date_range
+
+    # The date shown depends on the local time, one day around the range
+    assert date_range.may_contain(whenever.Instant.from_utc(2024, 4, 30, 22))
+    assert date_range.may_contain(whenever.Instant.from_utc(2024, 6, 1, 3))
+    assert not date_range.may_contain(whenever.Instant.from_utc(2024, 6, 2, 3))
+
+    assert date_range.overlaps(DateRange.parse("2024-05-31:2024-06-30"))
+    assert not date_range.overlaps(DateRange.parse("2024-06-01:2024-06-30"))
+
+    for value in ("2024-05-01", "2024-05-01:june", "2024-05-31:2024-05-01"):
+        with pytest.raises(ValueError):
+            DateRange.parse(value)
+
+
+def test_link_tree(tmp_path: pathlib.Path) -> None:
+    source = tmp_path / "source"
+    (source / "assets").mkdir(parents=True)
+    (source / "2024-05-01.md").write_text("day")
+    (source / "assets" / "photo.webp").write_text("photo")
+    (source / "assets" / "index.z0.js").write_text("overview")
+    destination = tmp_path / "destination"
+    (destination / "assets").mkdir(parents=True)
+    (destination / "assets" / "photo.webp").write_text("previous")
+
+    count = link_tree(source, destination, exclude=("assets/index.z*.js",))
+    assert count == 2
+    assert (destination / "2024-05-01.md").read_text() == "day"
+    assert (destination / "assets" / "photo.webp").samefile(
+        source / "assets" / "photo.webp"
+    )
+    assert not (destination / "assets" / "index.z0.js").exists()
+
+
+def test_manifest(tmp_path: pathlib.Path) -> None:
+    shard_dir = tmp_path / "shard"
+    shard_dir.mkdir()
+    with pytest.raises(ValueError):
+        ShardManifest.load(shard_dir)
+
+    source = tmp_path / "source" / "photo.jpg"
+    assets = [
+        AssetRecord(
+            id=3, path=shard_dir / "docs" / "assets" / "note.md", type="markdown"
+        ),
+        AssetRecord(id=4, path=source, type="image"),
+    ]
+    ShardManifest(
+        DateRange.parse("2024-05-01:2024-05-01"), [whenever.Date(2024, 5, 1)], assets
+    ).save(shard_dir)
+
+    manifest = ShardManifest.load(shard_dir)
+    assert manifest.dates == [whenever.Date(2024, 5, 1)]
+    rebased = manifest.rebased_assets(shard_dir, tmp_path / "merged")
+    assert [asset.id for asset in rebased] == [None, None]
+    assert rebased[0].path == tmp_path / "merged" / "docs" / "assets" / "note.md"
+    assert rebased[1].path == source
+    assert manifest.assets[0].id == 3
+
+
+def write_shard_overview(
+    files_dir: pathlib.Path,
+    line: list[list[float]],
+    start: str,
+    end: str,
+    distance: float,
+) -> None:
+    files_dir.mkdir(parents=True)
+    gpx = gpxpy.gpx.GPX()
+    gpx.waypoints.append(gpxpy.gpx.GPXWaypoint(line[0][1], line[0][0], name=start))
+    statistics = Statistics()
+    statistics.distance = distance
+    statistics.time_moving = 60.0
+    statistics.total_time = 600.0
+    with open(files_dir / "overview.json", "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "gpx_data": gpx.to_xml(),
+                "statistics": statistics.to_dict(),
+                "start": start,
+                "end": end,
+            },
+            f,
+        )
+    np.savez(files_dir / OVERVIEW_LINES_NAME, np.array(line))
+    with open(files_dir / "statistics.json", "w", encoding="utf-8") as f:
+        json.dump({start[:10]: statistics.to_dict()}, f)
+
+
+def test_merge_overviews(tmp_path: pathlib.Path) -> None:
+    one = tmp_path / "one" / "files"
+    two = tmp_path / "two" / "files"
+    write_shard_overview(
+        one,
+        [[13.0, 52.0], [13.1, 52.1]],
+        "2024-05-01T08:00:00Z",
+        "2024-05-01T18:00:00Z",
+        1000.0,
+    )
+    write_shard_overview(
+        two,
+        [[14.0, 53.0], [14.1, 53.1]],
+        "2024-05-02T08:00:00Z",
+        "2024-05-02T18:00:00Z",
+        500.0,
+    )
+    assets_dir = tmp_path / "assets"
+    assets_dir.mkdir()
+
+    overview = merge_overviews([one, two, tmp_path / "empty"], assets_dir)
+    assert overview["start"] == "2024-05-01T08:00:00Z"
+    assert overview["end"] == "2024-05-02T18:00:00Z"
+    assert overview["statistics"]["distance"] == 1500.0
+    assert overview["statistics"]["time_moving"] == 120.0
+    assert overview["statistics"]["total_time"] == 34 * 3600
+    assert overview["bounds"] == [[52.0, 13.0], [53.1, 14.1]]
+    assert all(path.is_file() for path in level_paths(assets_dir, "index"))
+    assert len(gpxpy.parse(overview["gpx_data"]).waypoints) == 2
+
+    assert set(merge_statistics([one, two])) == {"2024-05-01", "2024-05-02"}
+
+
+def test_shard_sources(tmp_path: pathlib.Path) -> None:
+    source = tmp_path / "source"
+    source.mkdir()
+    (source / "note_20240501_100000.md").write_text("# One\n")
+    (source / "note_20240510_100000.md").write_text("# Two\n")
+    config = load_config_file(
+        pathlib.Path(__file__).parent.parent
+        / "src"
+        / "mkmapdiary"
+        / "resources"
+        / "defaults.yaml"
+    )
+    config["site"]["timezone"] = "UTC"
+    dirs = Dirs(source, tmp_path / "build", tmp_path / "dist", create_dirs=False)
+
+    task_list = TaskList(
+        dict(config), dirs, {}, date_range=DateRange.parse("2024-05-10:2024-05-10")
+    )
+    assert len(task_list.sources) == 2
+    (asset,) = task_list.db.assets
+    assert asset.timestamp_utc is not None
+    assert asset.timestamp_utc.format_iso() == "2024-05-10T10:00:00Z"
@@ -0,0 +1,243 @@
+import multiprocessing
+import pathlib
+from collections.abc import Iterator
+from typing import Any
+
+import doit.reporter
+import doit.runner
+import doit.task
+import pytest
+from doit import create_after
+from doit.cmd_base import ModuleTaskLoader
+from doit.doit_cmd import DoitMain
+
+from mkmapdiary.commands.generate_synthetic import generate_synthetic_data
+from mkmapdiary.lib.asset import AssetRecord
+from mkmapdiary.lib.assetRegistry import AssetRegistry
+from mkmapdiary.lib.config import load_config_file
+from mkmapdiary.lib.dirs import Dirs
+from mkmapdiary.lib.httpClient import CACHE_SECTION
+from mkmapdiary.lib.sharedState import (
+    AssetSnapshot,
+    SharedState,
+    fork_workers,
+    share_creator,
+)
+from mkmapdiary.taskList import TaskList
+
+
+def make_registry() -> AssetRegistry:
+    registry = AssetRegistry()
+    for i in range(3):
+        registry.add_asset(
+            AssetRecord(path=pathlib.Path(f"image{i}.jpg"), type="image")
+        )
+    return registry
+
+
+def state(registry: AssetRegistry) -> tuple[list[AssetRecord], bool]:
+    return sorted(registry.assets, key=lambda x: x.id or 0), registry.has_display_date
+
+
+def test_delta() -> None:
+    registry = make_registry()
+    copied = make_registry()
+
+    snapshot = AssetSnapshot(registry)
+    one, two, three = registry.assets
+    one.quality = 0.5
+    registry.update_asset({"id": two.id, "latitude": 1.0, "longitude": 2.0})
+    registry.remove_assets([three.id])
+    registry.add_asset(AssetRecord(path=pathlib.Path("track.gpx"), type="gpx"))
+    registry.has_display_date = True
+
+    delta = snapshot.delta()
+    assert delta.updated == {
+        one.id: {"quality": 0.5},
+        two.id: {"latitude": 1.0, "longitude": 2.0},
+    }
+    assert delta.removed == [three.id]
+    assert [asset.id for asset in delta.added] == [4]
+
+    delta.apply(copied)
+    assert state(copied) == state(registry)
+    assert copied.next_id == registry.next_id
+    assert not AssetSnapshot(registry).delta()
+
+
+def test_scoped_delta() -> None:
+    registry = make_registry()
+    one, two, _ = registry.assets
+    assert one.id is not None
+
+    snapshot = AssetSnapshot(registry, [one.id])
+    one.entropy = 7.0
+    two.entropy = 3.0
+    registry.add_asset(AssetRecord(path=pathlib.Path("track.gpx"), type="gpx"))
+
+    delta = snapshot.delta()
+    assert delta.updated == {one.id: {"entropy": 7.0}}
+    assert not delta.added
+
+
+class Diary:
+    """Minimal task list: a task updating assets and tasks created from them."""
+
+    def __init__(self, path: pathlib.Path) -> None:
+        self.path = path
+        self.db = make_registry()
+        self.shared_state = SharedState(path / "shared_state.db")
+
+    def __reduce__(self) -> tuple[Any, ...]:
+        return _diary, ()
+
+    def _rate(self) -> None:
+        for asset in self.db.assets:
+            asset.quality = (asset.id or 0) / 10
+
+    def task_rate(self) -> dict[str, Any]:
+        return {"actions": [self._rate], "meta": {"updates_assets": True}}
+
+    def _write(self, asset_id: int) -> None:
+        asset = self.db.get_asset_by_id(asset_id)
+        assert asset is not None
+        (self.path / f"{asset_id}.txt").write_text(str(asset.quality))
+
+    @create_after("rate")
+    def task_write(self) -> Iterator[dict[str, Any]]:
+        for asset in self.db.assets:
+            assert asset.quality is not None, "Task created before merge"
+            yield {"name": str(asset.id), "actions": [(self._write, (asset.id,))]}
+
+
+_instance: Diary | None = None
+
+
+def _diary() -> Diary:
+    assert _instance is not None
+    return _instance
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="Needs the fork start method",
+)
+def test_process_build(tmp_path: pathlib.Path) -> None:
+    global _instance
+    diary = _instance = Diary(tmp_path)
+    shared_state = diary.shared_state
+
+    class Reporter(doit.reporter.ConsoleReporter):
+        def add_success(self, task: doit.task.Task) -> None:
+            shared_state.merge(task.name, diary.db)
+            super().add_success(task)
+
+    tasks = {
+        name: share_creator(diary, name, getattr(diary, name))
+        for name in ("task_rate", "task_write")
+    }
+    shared_state.reset()
+    with fork_workers():
+        result = DoitMain(
+            ModuleTaskLoader(tasks),
+            config_filenames=(),
+            extra_config={
+                "GLOBAL": {
+                    "dep_file": str(tmp_path / "doit.db"),
+                    "reporter": Reporter,
+                }
+            },
+        ).run(["--process=2", "--parallel-type=process"])
+    assert doit.runner.MRunner.Child is multiprocessing.Process
+
+    assert result == 0
+    assert [asset.quality for asset in diary.db.assets] == [0.1, 0.2, 0.3]
+    for asset_id in (1, 2, 3):
+        assert (tmp_path / f"{asset_id}.txt").read_text() == str(asset_id / 10)
+
+
+# Tasks up to the pages; building the site needs MkDocs and the network
+PAGE_TASKS = [
+    "end_postprocessing",
+    "build_index_page",
+    "build_day_page",
+    "build_journal",
+    "build_gallery",
+    "build_tags",
+]
+
+
+def build_pages(
+    source: pathlib.Path, build_dir: pathlib.Path, parallel_type: str
+) -> dict[str, bytes]:
+    config = load_config_file(
+        pathlib.Path(__file__).parent.parent
+        / "src"
+        / "mkmapdiary"
+        / "resources"
+        / "defaults.yaml"
+    )
+    config["site"]["timezone"] = "UTC"
+    config["features"]["llms"]["enabled"] = False
+    config["http"]["offline"] = True
+    config["strings"] = {key: value or key for key, value in config["strings"].items()}
+    # No extracts of Geofabrik regions are needed for the synthetic trip
+    cache = {
+        (CACHE_SECTION, ("https://download.geofabrik.de/index-v1.json", True)): {
+            "body": {"type": "FeatureCollection", "features": []},
+            "etag": None,
+            "last_modified": None,
+            "fetched": 0.0,
+        }
+    }
+    dirs = Dirs(source, build_dir, build_dir.with_name("dist"), create_dirs=True)
+    task_list = TaskList(dict(config), dirs, cache)
+
+    shared_state = None
+    if parallel_type == "process":
+        shared_state = SharedState(dirs.shared_state_path, processes=2)
+        task_list.share(shared_state)
+        shared_state.reset()
+
+    class Reporter(doit.reporter.ConsoleReporter):
+        def add_success(self, task: doit.task.Task) -> None:
+            if shared_state is not None:
+                shared_state.merge(task.name, task_list.db)
+            super().add_success(task)
+
+    with fork_workers():
+        result = DoitMain(
+            ModuleTaskLoader(task_list.toDict()),
+            config_filenames=(),
+            extra_config={
+                "GLOBAL": {
+                    "dep_file": str(build_dir / "doit.db"),
+                    "reporter": Reporter,
+                }
+            },
+        ).run(["--process=2", f"--parallel-type={parallel_type}", *PAGE_TASKS])
+    assert result == 0
+
+    return {
+        str(path.relative_to(build_dir)): path.read_bytes()
+        for directory in (dirs.docs_dir, dirs.files_dir)
+        for path in sorted(directory.rglob("*"))
+        if path.is_file()
+    }
+
+
+@pytest.mark.skipif(
+    "fork" not in multiprocessing.get_all_start_methods(),
+    reason="Needs the fork start method",
+)
+def test_process_build_matches_thread_build(tmp_path: pathlib.Path) -> None:
+    source = tmp_path / "source"
+    source.mkdir()
+    generate_synthetic_data(source, days=2, photos=0, points=300, notes=1, recordings=0)
+
+    threads = build_pages(source, tmp_path / "thread" / "build", "thread")
+    processes = build_pages(source, tmp_path / "process" / "build", "process")
+
+    assert "docs/2020-06-01.md" in threads
+    assert "docs/templates/2020-06-02_journal.md" in threads
+    assert processes == threads
@@ -0,0 +1,87 @@
+import os
+import pathlib
+
+import pytest
+
+from mkmapdiary.lib.siteBuild import (
+    SiteBuildStats,
+    build_site,
+    link_file,
+    snippet_paths,
+)
+
+CONFIG = """
+site_name: Test
+docs_dir: docs
+site_dir: site
+use_directory_urls: false
+strict: true
+plugins:
+  - search
+markdown_extensions:
+  - pymdownx.snippets:
+      base_path: [{base_path}]
+"""
+
+
+@pytest.fixture
+def site(tmp_path: pathlib.Path) -> pathlib.Path:
+    docs = tmp_path / "docs"
+    docs.mkdir()
+    (docs / "index.md").write_text("# Index\n\nHello\n")
+    (docs / "day.md").write_text('# Day\n\n--8<-- "docs/snippet.txt"\n')
+    (docs / "snippet.txt").write_text("Snippet one\n")
+    (docs / "photo.jpg").write_bytes(b"jpeg")
+    (tmp_path / "mkdocs.yml").write_text(CONFIG.format(base_path=tmp_path))
+    return tmp_path
+
+
+def build(site: pathlib.Path) -> SiteBuildStats:
+    return build_site(site / "mkdocs.yml", site / "manifest.json")
+
+
+def test_snippet_paths() -> None:
+    markdown = '--8<-- "docs/a.md:1:1"\ntext\n--8<--\ndocs/b.md\n;docs/c.md\n--8<--\n'
+    assert snippet_paths(markdown) == ["docs/a.md", "docs/b.md"]
+
+
+def test_link_file(tmp_path: pathlib.Path) -> None:
+    source = tmp_path / "source"
+    source.write_bytes(b"data")
+    target = tmp_path / "out" / "target"
+    assert link_file(source, target)
+    assert target.read_bytes() == b"data"
+    assert not link_file(source, target)
+
+
+def test_incremental_build(site: pathlib.Path) -> None:
+    stats = build(site)
+    assert (stats.pages, stats.rendered) == (2, 2)
+    assert "Snippet one" in (site / "site" / "day.html").read_text()
+    assert os.path.samefile(site / "docs" / "photo.jpg", site / "site" / "photo.jpg")
+
+    # Nothing changed
+    index_mtime = (site / "site" / "index.html").stat().st_mtime_ns
+    stats = build(site)
+    assert stats.rendered == 0
+    assert stats.linked == 0
+
+    # A changed snippet renders only the page including it
+    (site / "docs" / "snippet.txt").write_text("Snippet two\n")
+    stats = build(site)
+    assert stats.rendered == 1
+    assert "Snippet two" in (site / "site" / "day.html").read_text()
+    assert (site / "site" / "index.html").stat().st_mtime_ns == index_mtime
+    search_index = (site / "site" / "search" / "search_index.json").read_text()
+    assert "Hello" in search_index
+
+    # Removed sources remove their outputs; the navigation changes as well
+    (site / "docs" / "photo.jpg").unlink()
+    (site / "docs" / "day.md").unlink()
+    (site / "site" / "unrelated.txt").write_text("kept")
+    stats = build(site)
+    assert stats.rendered == 1
+    assert stats.removed >= 2
+    assert not (site / "site" / "day.html").exists()
+    assert not (site / "site" / "photo.jpg").exists()
+    assert (site / "site" / "unrelated.txt").exists()
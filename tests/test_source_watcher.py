@@ -0,0 +1,122 @@
+import pathlib
+
+import pytest
+
+from mkmapdiary.lib.config import load_config_file
+from mkmapdiary.lib.dirs import Dirs
+from mkmapdiary.lib.sourceWatcher import SourceWatcher, compare, snapshot
+from mkmapdiary.taskList import TaskList
+
+
+def test_compare(tmp_path: pathlib.Path) -> None:
+    (tmp_path / "a.txt").write_text("a")
+    (tmp_path / "b.txt").write_text("b")
+    (tmp_path / ".a.txt.swp").write_text("ignored")
+    before = snapshot(tmp_path)
+    assert set(before) == {tmp_path / "a.txt", tmp_path / "b.txt"}
+
+    (tmp_path / "a.txt").write_text("changed")
+    (tmp_path / "b.txt").unlink()
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "c.txt").write_text("c")
+    changes = compare(before, snapshot(tmp_path))
+    assert changes.added == [tmp_path / "sub" / "c.txt"]
+    assert changes.modified == [tmp_path / "a.txt"]
+    assert changes.removed == [tmp_path / "b.txt"]
+    assert not compare(before, before)
+
+
+def test_wait_until_quiet(tmp_path: pathlib.Path) -> None:
+    # Every sleep of the watcher performs the next step of a copy
+    steps = [
+        lambda: (tmp_path / "a.txt").write_text("a"),
+        lambda: (tmp_path / "b.txt").write_text("b"),
+        lambda: None,
+    ]
+    sleeps = []
+
+    def sleep(seconds: float) -> None:
+        sleeps.append(seconds)
+        if steps:
+            steps.pop(0)()
+
+    watcher = SourceWatcher(tmp_path, interval=0.5, sleep=sleep)
+    changes = watcher.wait()
+    assert changes.added == [tmp_path / "a.txt", tmp_path / "b.txt"]
+    assert set(sleeps) == {0.5}
+
+
+@pytest.fixture
+def task_list(tmp_path: pathlib.Path) -> TaskList:
+    source = tmp_path / "source"
+    (source / "day2").mkdir(parents=True)
+    (source / "note_20240501_100000.md").write_text("# One\n")
+    (source / "note_20240501_120000.txt").write_text("Two\n")
+    (source / "day2" / "note_20240502_090000.md").write_text("# Three\n")
+    config = load_config_file(
+        pathlib.Path(__file__).parent.parent
+        / "src"
+        / "mkmapdiary"
+        / "resources"
+        / "defaults.yaml"
+    )
+    config["site"]["timezone"] = "UTC"
+    dirs = Dirs(source, tmp_path / "build", tmp_path / "dist", create_dirs=False)
+    return TaskList(dict(config), dirs, {})
+
+
+def test_update_sources(task_list: TaskList) -> None:
+    source = task_list.dirs.source_dir
+    one = source / "note_20240501_100000.md"
+    two = source / "note_20240501_120000.txt"
+    three = source / "day2" / "note_20240502_090000.md"
+    assert len(task_list.sources) == 3
+    ids = {asset.id for asset in task_list.db.assets}
+
+    # Modified files are handled again, removed files are dropped
+    one.write_text("# One again\n")
+    two.unlink()
+    previous = task_list.update_sources([one], [two])
+    assert len(previous) == 2
+    assert sorted(task_list.sources) == sorted([one, three])
+    assert len(task_list.db.assets) == 2
+    (updated,) = task_list.assets_of([one])
+    assert updated.id not in ids
+    assert task_list.derived_paths(one) == {one, updated.path}
+
+    # A new calibration handles the files of its directory again
+    (source / "day2" / "calibration.yaml").write_text(
+        "calibration:\n  timezone: Europe/Berlin\n  offset: 0\n"
+    )
+    task_list.update_sources([source / "day2" / "calibration.yaml"], [])
+    (moved,) = task_list.assets_of([three])
+    assert moved.timestamp_utc is not None
+    assert moved.timestamp_utc.format_iso() == "2024-05-02T07:00:00Z"
+
+
+def test_stale_pages_are_removed(task_list: TaskList) -> None:
+    # Display dates are usually assigned by the geo correlation
+    for asset in task_list.db.assets:
+        assert asset.timestamp_utc is not None
+        asset.display_date = asset.timestamp_utc.to_tz("UTC").date()
+    task_list.db.has_display_date = True
+
+    dirs = task_list.dirs
+    dirs.docs_dir.mkdir(parents=True)
+    dirs.templates_dir.mkdir(parents=True)
+    paths = []
+    for date in ("2024-04-30", "2024-05-01"):
+        paths.append(dirs.docs_dir / f"{date}.md")
+        for part in ("gallery", "journal", "tags"):
+            paths.append(dirs.templates_dir / f"{date}_{part}.md")
+    for path in paths:
+        path.write_text("")
+
+    tasks = list(task_list.task_build_day_page())
+    assert [task["name"] for task in tasks] == ["2024-05-01", "2024-05-02"]
+    assert sorted(path.name for path in paths if path.exists()) == [
+        "2024-05-01.md",
+        "2024-05-01_gallery.md",
+        "2024-05-01_journal.md",
+        "2024-05-01_tags.md",
+    ]
@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+import tzfpy
+import whenever
+
+from mkmapdiary.lib.timezones import TimezoneResolver
+
+
+@pytest.mark.parametrize(
+    "lon,lat",
+    [
+        (8.6821, 50.1109),  # Frankfurt
+        (8.6950, 47.6960),  # Büsingen, German enclave in Switzerland
+        (8.6380, 47.6970),  # Schaffhausen, next to it
+        (-74.0060, 40.7128),  # New York
+        (179.99, -16.5),  # Fiji, near the antimeridian
+        (0.0, 0.0),
+    ],
+)
+def test_matches_exact_lookup(lon: float, lat: float) -> None:
+    resolver = TimezoneResolver()
+    assert resolver.get_tz(lon, lat) == tzfpy.get_tz(lng=lon, lat=lat)
+
+
+@pytest.mark.parametrize(
+    "lon,lat,tz",
+    [
+        # Zone borders crossing a cell between its sample points
+        (-7.2983, 39.4562, "Europe/Lisbon"),
+        (-7.2483, 39.4562, "Europe/Madrid"),
+        (48.5511, 46.6886, "Europe/Astrakhan"),
+        (48.6511, 46.6886, "Asia/Atyrau"),
+        (88.9982, 22.287, "Asia/Dhaka"),
+        (88.8982, 22.287, "Asia/Kolkata"),
+    ],
+)
+def test_border_between_samples(lon: float, lat: float, tz: str) -> None:
+    resolver = TimezoneResolver()
+    assert resolver.get_tz(lon, lat) == tz
+    assert resolver.get_tzs([lon], [lat]) == [tz]
+
+
+def test_bulk_lookup_matches_exact_lookup() -> None:
+    rng = np.random.default_rng(0)
+    # Dense cloud around the German-Swiss border
+    lons = rng.uniform(8.4, 8.9, 2000)
+    lats = rng.uniform(47.5, 47.8, 2000)
+
+    resolver = TimezoneResolver()
+    expected = [
+        tzfpy.get_tz(lng=lon, lat=lat)
+        for lon, lat in zip(lons.tolist(), lats.tolist(), strict=True)
+    ]
+    assert resolver.get_tzs(lons, lats) == expected
+    assert resolver.get_tzs([], []) == []
+
+
+def test_to_local() -> None:
+    resolver = TimezoneResolver()
+    instant = whenever.Instant.from_utc(2024, 7, 1, 12)
+    berlin, tokyo = resolver.to_local([instant, instant], [13.4, 139.7], [52.5, 35.7])
+    assert berlin.tz == "Europe/Berlin"
+    assert berlin.hour == 14
+    assert tokyo.tz == "Asia/Tokyo"
+    assert tokyo.hour == 21
@@ -0,0 +1,65 @@
+import json
+import pathlib
+
+import numpy as np
+
+from mkmapdiary.lib import trackLevels
+
+
+def random_walk(n: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    lon = 8.0 + np.cumsum(rng.normal(0, 1e-4, n))
+    lat = 50.0 + np.cumsum(rng.normal(0, 1e-4, n))
+    return np.column_stack((lon, lat))
+
+
+def test_tolerance_decreases_with_level() -> None:
+    tolerances = [
+        trackLevels.level_tolerance(level, 50.0)
+        for level in range(len(trackLevels.LEVEL_ZOOMS))
+    ]
+    assert tolerances == sorted(tolerances, reverse=True)
+    assert tolerances[-1] < 1.0
+
+
+def test_levels_get_more_detailed() -> None:
+    lines = [random_walk(5000), random_walk(100, seed=1)]
+    levels = trackLevels.build_levels(lines)
+
+    assert len(levels) == len(trackLevels.LEVEL_ZOOMS)
+    counts = [sum(len(line) for line in level) for level in levels]
+    assert counts == sorted(counts)
+    assert counts[0] < counts[-1] <= 5100
+
+
+def test_empty_lines() -> None:
+    levels = trackLevels.build_levels([np.zeros((1, 2))])
+    assert levels == [[] for _ in trackLevels.LEVEL_ZOOMS]
+    assert trackLevels.bounds([]) is None
+
+
+def test_write_track_levels(tmp_path: pathlib.Path) -> None:
+    line = random_walk(1000)
+    result = trackLevels.write_track_levels([line], tmp_path, "2024-01-01")
+
+    (south, west), (north, east) = result["bounds"]
+    assert south == line[:, 1].min() and north == line[:, 1].max()
+    assert west == line[:, 0].min() and east == line[:, 0].max()
+
+    assert [level["zoom"] for level in result["levels"]] == list(
+        trackLevels.LEVEL_ZOOMS
+    )
+    for level, path in zip(
+        result["levels"],
+        trackLevels.level_paths(tmp_path, "2024-01-01"),
+        strict=True,
+    ):
+        assert level["src"] == f"assets/{path.name}"
+        content = path.read_text()
+        prefix = f'mkmapdiary_track_level("{level["src"]}", '
+        assert content.startswith(prefix)
+        geometry = json.loads(content[len(prefix) : -len(");\n")])
+        assert geometry["type"] == "MultiLineString"
+
+    # The track is smaller than a pixel at low zooms, but visible at high ones
+    assert len(geometry["coordinates"]) == 1
@@ -0,0 +1,181 @@
+import copy
+
+import gpxpy.gpx
+import numpy as np
+import pytest
+
+from mkmapdiary.lib import trackProcessing
+
+
+def make_segment(
+    n: int, seed: int = 42, lat0: float = 50.0, lon0: float = 8.0
+) -> gpxpy.gpx.GPXTrackSegment:
+    """Create a noisy random-walk segment with occasional spikes and gaps."""
+    rng = np.random.default_rng(seed)
+    lat = lat0 + np.cumsum(rng.normal(0, 1e-4, n))
+    lon = lon0 + np.cumsum(rng.normal(0, 1e-4, n))
+    ele = 200 + np.cumsum(rng.normal(0, 1, n))
+
+    # Add some spikes and missing elevations
+    spikes = rng.choice(n, size=max(1, n // 50), replace=False)
+    lat[spikes] += rng.normal(0, 5e-3, len(spikes))
+    ele[spikes] += rng.normal(0, 50, len(spikes))
+
+    seg = gpxpy.gpx.GPXTrackSegment()
+    for i in range(n):
+        seg.points.append(
+            gpxpy.gpx.GPXTrackPoint(
+                latitude=float(lat[i]),
+                longitude=float(lon[i]),
+                elevation=None if i % 37 == 5 else float(ele[i]),
+            )
+        )
+    return seg
+
+
+def columns(
+    seg: gpxpy.gpx.GPXTrackSegment,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    lon = np.array([pt.longitude for pt in seg.points])
+    lat = np.array([pt.latitude for pt in seg.points])
+    ele = np.array(
+        [np.nan if pt.elevation is None else pt.elevation for pt in seg.points]
+    )
+    return lon, lat, ele
+
+
+def point_line_distance(xy: np.ndarray, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    direction = b - a
+    length = np.hypot(*direction)
+    offset = xy - a
+    if length == 0:
+        return np.hypot(offset[:, 0], offset[:, 1])
+    return np.abs(direction[0] * offset[:, 1] - direction[1] * offset[:, 0]) / length
+
+
+def test_distance_2d_matches_gpxpy() -> None:
+    seg = make_segment(200)
+    lon, lat, _ = columns(seg)
+    expected = np.array(
+        [a.distance_2d(b) for a, b in zip(seg.points, seg.points[1:], strict=False)],
+        dtype=float,
+    )
+    result = trackProcessing.distance_2d(lon[:-1], lat[:-1], lon[1:], lat[1:])
+    np.testing.assert_allclose(result, expected, rtol=1e-9)
+
+    # Far apart points use haversine
+    far = trackProcessing.distance_2d(
+        np.array([8.0]), np.array([50.0]), np.array([9.0]), np.array([51.0])
+    )
+    expected_far = gpxpy.geo.haversine_distance(50.0, 8.0, 51.0, 9.0)
+    np.testing.assert_allclose(far, [expected_far], rtol=1e-9)
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_remove_extremes_matches_gpxpy(seed: int) -> None:
+    seg = make_segment(500, seed=seed)
+    lon, lat, ele = columns(seg)
+
+    reference = copy.deepcopy(seg)
+    reference.smooth(horizontal=True, vertical=True, remove_extremes=True)
+
+    keep = trackProcessing.remove_extremes(lon, lat, ele)
+    assert keep.sum() < len(keep)
+    np.testing.assert_array_equal(lon[keep], [pt.longitude for pt in reference.points])
+    np.testing.assert_array_equal(lat[keep], [pt.latitude for pt in reference.points])
+
+
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_smooth_matches_gpxpy(seed: int) -> None:
+    seg = make_segment(500, seed=seed)
+    lon, lat, ele = columns(seg)
+
+    reference = copy.deepcopy(seg)
+    reference.smooth(horizontal=True, vertical=True)
+    ref_lon, ref_lat, ref_ele = columns(reference)
+
+    s_lon, s_lat, s_ele = trackProcessing.smooth(lon, lat, ele)
+    np.testing.assert_allclose(s_lon, ref_lon, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(s_lat, ref_lat, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(s_ele, ref_ele, rtol=0, atol=1e-9)
+
+    # Inputs are not modified
+    np.testing.assert_array_equal(lon, columns(seg)[0])
+
+
+def test_short_tracks_are_unchanged() -> None:
+    lon = np.array([8.0, 8.001, 8.002])
+    lat = np.array([50.0, 50.1, 50.0])
+    ele = np.array([100.0, 500.0, 100.0])
+    assert trackProcessing.remove_extremes(lon, lat, ele).all()
+    s_lon, s_lat, s_ele = trackProcessing.smooth(lon, lat, ele)
+    np.testing.assert_array_equal(s_lat, lat)
+    np.testing.assert_array_equal(s_ele, ele)
+
+
+@pytest.mark.parametrize("lat0", [0.0, 50.0, 70.0])
+def test_simplify_matches_gpxpy(lat0: float) -> None:
+    # gpxpy measures distances with a flat-earth approximation while we use a
+    # UTM projection, so decisions right at the tolerance may differ slightly.
+    seg = make_segment(300, seed=7, lat0=lat0, lon0=10.0)
+    lon, lat, _ = columns(seg)
+
+    reference = copy.deepcopy(seg)
+    reference.simplify(max_distance=5)
+    reference_coords = {(pt.longitude, pt.latitude) for pt in reference.points}
+    expected = {i for i in range(len(lon)) if (lon[i], lat[i]) in reference_coords}
+
+    indices = set(trackProcessing.simplify_lonlat(lon, lat, 5).tolist())
+    assert len(indices ^ expected) <= 0.02 * len(expected)
+
+
+@pytest.mark.parametrize("tolerance", [1.0, 10.0, 50.0])
+def test_simplify_respects_tolerance(tolerance: float) -> None:
+    rng = np.random.default_rng(0)
+    xy = np.cumsum(rng.normal(0, 5, (2000, 2)), axis=0)
+
+    indices = trackProcessing.simplify(xy, tolerance)
+
+    assert indices[0] == 0
+    assert indices[-1] == len(xy) - 1
+    assert np.all(np.diff(indices) > 0)
+    assert len(indices) < len(xy)
+
+    for begin, end in zip(indices, indices[1:], strict=False):
+        inner = xy[begin + 1 : end]
+        if len(inner):
+            assert point_line_distance(inner, xy[begin], xy[end]).max() < tolerance
+
+
+def test_simplify_degenerate_inputs() -> None:
+    assert list(trackProcessing.simplify(np.zeros((0, 2)), 1)) == []
+    assert list(trackProcessing.simplify(np.zeros((2, 2)), 1)) == [0, 1]
+    # Closed loop: begin and end coincide
+    loop = np.array([[0, 0], [10, 0], [10, 10], [0, 10], [0, 0]], dtype=float)
+    assert list(trackProcessing.simplify(loop, 1)) == [0, 1, 2, 3, 4]
+    # Straight line collapses to its end points
+    line = np.column_stack((np.arange(10.0), np.zeros(10)))
+    assert list(trackProcessing.simplify(line, 0.1)) == [0, 9]
+
+
+def test_pipeline_matches_gpxpy() -> None:
+    seg = make_segment(5_000)
+    lon, lat, ele = columns(seg)
+
+    reference = copy.deepcopy(seg)
+    reference.smooth(horizontal=True, vertical=True, remove_extremes=True)
+    reference.smooth(horizontal=True, vertical=True)
+    ref_lon, ref_lat, _ = columns(reference)
+    reference.simplify(max_distance=1)
+    reference_coords = {(pt.longitude, pt.latitude) for pt in reference.points}
+    expected = {
+        i for i in range(len(ref_lon)) if (ref_lon[i], ref_lat[i]) in reference_coords
+    }
+
+    keep = trackProcessing.remove_extremes(lon, lat, ele)
+    s_lon, s_lat, _ = trackProcessing.smooth(lon[keep], lat[keep], ele[keep])
+    np.testing.assert_allclose(s_lon, ref_lon, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(s_lat, ref_lat, rtol=0, atol=1e-12)
+
+    indices = set(trackProcessing.simplify_lonlat(s_lon, s_lat, 1).tolist())
+    assert len(indices ^ expected) <= 0.02 * len(expected)
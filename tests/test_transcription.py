@@ -0,0 +1,117 @@
+import threading
+from typing import Any
+
+import numpy as np
+from pydub.generators import Sine
+
+from mkmapdiary.lib import transcription
+from mkmapdiary.lib.transcription import (
+    SAMPLE_RATE,
+    TranscriberPool,
+    find_chunks,
+    merge_segments,
+    to_samples,
+    worker_count,
+)
+
+
+def tone(seconds: float) -> np.ndarray:
+    t = np.arange(int(seconds * SAMPLE_RATE)) / SAMPLE_RATE
+    return (np.sin(2 * np.pi * 440 * t) * 10000).astype(np.int16)
+
+
+def silence(seconds: float) -> np.ndarray:
+    return np.zeros(int(seconds * SAMPLE_RATE), dtype=np.int16)
+
+
+def test_to_samples() -> None:
+    audio = Sine(440).to_audio_segment(duration=1500).set_channels(2)
+    samples = to_samples(audio.set_frame_rate(44100))
+    assert samples.dtype == np.int16
+    assert len(samples) == int(1.5 * SAMPLE_RATE)
+
+
+def test_short_recording_is_one_chunk() -> None:
+    samples = tone(10)
+    assert find_chunks(samples, max_length=60) == [(0, len(samples))]
+
+
+def test_chunks_end_in_pauses() -> None:
+    samples = np.concatenate([tone(40), silence(2), tone(40), silence(2), tone(40)])
+    chunks = find_chunks(samples, max_length=60)
+
+    assert len(chunks) == 3
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(samples)
+    for (_, end), (start, _) in zip(chunks, chunks[1:], strict=False):
+        assert end == start
+    # Cuts lie within the pauses
+    assert 40 * SAMPLE_RATE < chunks[0][1] < 42 * SAMPLE_RATE
+    assert 82 * SAMPLE_RATE < chunks[1][1] < 84 * SAMPLE_RATE
+
+
+def test_chunks_without_pauses_are_cut() -> None:
+    samples = tone(150)
+    chunks = find_chunks(samples, max_length=60)
+    assert [end - start for start, end in chunks] == [
+        60 * SAMPLE_RATE,
+        60 * SAMPLE_RATE,
+        30 * SAMPLE_RATE,
+    ]
+
+
+def test_merge_segments() -> None:
+    chunks = [(0, 10 * SAMPLE_RATE), (10 * SAMPLE_RATE, 15 * SAMPLE_RATE)]
+    results = [
+        {"segments": [{"start": 0.0, "end": 4.0, "text": "a"}]},
+        {
+            "segments": [
+                {"start": 0.0, "end": 5.0, "text": "b"},
+                # Beyond the end of the chunk
+                {"start": 5.0, "end": 8.0, "text": "c"},
+            ]
+        },
+    ]
+    assert merge_segments(results, chunks) == [
+        {"start": 0.0, "end": 4.0, "text": "a"},
+        {"start": 10.0, "end": 15.0, "text": "b"},
+    ]
+
+
+def test_worker_count(monkeypatch: Any) -> None:
+    monkeypatch.setattr(transcription, "available_memory", lambda: 13 * 2**30)
+    assert worker_count(0, model_memory=6 * 2**30) == min(
+        2, transcription.os.cpu_count() or 1
+    )
+    assert worker_count(1, model_memory=6 * 2**30) == 1
+    # Worker processes split the memory
+    assert worker_count(8, model_memory=3 * 2**30) == 4
+    assert worker_count(8, model_memory=3 * 2**30, processes=2) == 2
+
+    monkeypatch.setattr(transcription, "available_memory", lambda: 2**30)
+    assert worker_count(4, model_memory=6 * 2**30) == 1
+
+
+def test_transcriber_pool_loads_one_model_per_worker() -> None:
+    models: list[int] = []
+    lock = threading.Lock()
+
+    class FakeModel:
+        def transcribe(self, audio: np.ndarray) -> dict[str, Any]:
+            assert audio.dtype == np.float32
+            return {
+                "segments": [{"start": 0, "end": len(audio) / SAMPLE_RATE, "text": "x"}]
+            }
+
+    def load_model() -> FakeModel:
+        with lock:
+            models.append(threading.get_ident())
+        return FakeModel()
+
+    pool = TranscriberPool(workers=2, load_model=load_model)
+    futures = [pool.submit(tone(1)) for _ in range(8)]
+    results = [future.result() for future in futures]
+    pool.shutdown()
+
+    assert all(result["segments"][0]["end"] == 1.0 for result in results)
+    assert 1 <= len(models) <= 2
+    assert len(set(models)) == len(models)
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Compare two benchmark runs and flag regressions.
+
+The results are written by ``pytest --benchmark -m benchmark --benchmark-json=PATH``.
+Exits with status 1 if a benchmark got slower by more than the threshold.
+The fastest round is compared by default, as it is the least affected by
+other load on the machine; the default threshold is above the differences
+seen between runs of the same code.
+"""
+
+import json
+import pathlib
+import sys
+from typing import Any
+
+import click
+from tabulate import tabulate
+
+
+def load(path: pathlib.Path) -> dict[str, dict[str, Any]]:
+    data = json.loads(path.read_text())
+    if data.get("format") != 1:
+        raise click.ClickException(f"Unsupported benchmark format in {path}")
+    return data["benchmarks"]
+
+
+@click.command()
+@click.argument("baseline", type=click.Path(exists=True, path_type=pathlib.Path))
+@click.argument("current", type=click.Path(exists=True, path_type=pathlib.Path))
+@click.option(
+    "--threshold",
+    type=float,
+    default=0.75,
+    show_default=True,
+    help="Relative slowdown that counts as regression.",
+)
+@click.option(
+    "--stat",
+    type=click.Choice(["min", "median", "mean"]),
+    default="min",
+    show_default=True,
+    help="Statistic of the rounds to compare.",
+)
+def cli(
+    baseline: pathlib.Path, current: pathlib.Path, threshold: float, stat: str
+) -> None:
+    old = load(baseline)
+    new = load(current)
+
+    rows = []
+    regressions = []
+    for name in sorted(old.keys() | new.keys()):
+        if name not in new:
+            rows.append((name, f"{old[name][stat]:.4f}", "-", "-", "removed"))
+            continue
+        if name not in old:
+            rows.append((name, "-", f"{new[name][stat]:.4f}", "-", "new"))
+            continue
+        before = old[name][stat]
+        after = new[name][stat]
+        change = (after - before) / before if before > 0 else 0.0
+        if change > threshold:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif change < -threshold:
+            status = "faster"
+        else:
+            status = ""
+        rows.append((name, f"{before:.4f}", f"{after:.4f}", f"{change:+.1%}", status))
+
+    click.echo(
+        tabulate(
+            rows, headers=["Benchmark", "Baseline (s)", "Current (s)", "Change", ""]
+        )
+    )
+    if regressions:
+        click.echo(
+            f"\n{len(regressions)} benchmark(s) slower by more than {threshold:.0%}"
+        )
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()